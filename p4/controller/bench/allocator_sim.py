@@ -0,0 +1,407 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from model.ue import UE
+from model.upf import UPF
+from utils.allocator import AllocationStrategy, UPFAllocator
+from utils.data_fetcher import UPFID
+from utils.LLF import LLF
+
+DEFAULT_BLOCK_STEPS = 3600
+SECONDS_PER_DAY = 86400
+UE_IP_BASE = 0x0A0A0000
+
+
+def default_upfs() -> List[UPF]:
+    # Same UPFs the control loop in main.py.bak allocates over
+    return [
+        UPF(UPFID.UPF01, "90:e2:ba:c2:eb:fa", "192.168.43.201", 9, 9500, 10400),
+        UPF(UPFID.UPF02, "90:e2:ba:c2:f6:76", "192.168.43.202", 10, 9500, 10400),
+        UPF(UPFID.UPF03, "00:07:32:9c:69:b1", "192.168.43.203", 131, 0, 900),
+        UPF(UPFID.UPF04, "00:07:32:9c:6a:01", "192.168.43.204", 130, 0, 900),
+    ]
+
+
+def load_upfs(path: str) -> List[UPF]:
+    with open(path) as f:
+        return [
+            UPF(item.get("upfid", item["ip"]), item.get("mac", "00:00:00:00:00:00"), item["ip"], item.get("output_port", 0), item.get("background_loading_in_mbps", 0), item["max_loading_in_mbps"])
+            for item in json.load(f)
+        ]
+
+
+class RateTrace:
+    # Per-UE sending rate in Mbps, one row per sample, NaN while the UE is not attached
+    def __init__(self, rates: np.ndarray, interval: float = 1.0, teids: np.ndarray = None):
+        self.rates = rates
+        self.interval = interval
+        self.teids = teids if teids is not None else np.arange(rates.shape[1])
+
+    @property
+    def steps(self) -> int:
+        return self.rates.shape[0]
+
+    @property
+    def ue_count(self) -> int:
+        return self.rates.shape[1]
+
+    def window(self, start: int, end: int) -> np.ndarray:
+        return np.asarray(self.rates[start:end], dtype=np.float32)
+
+
+class SyntheticTrace(RateTrace):
+    # Lognormal per-UE base rate, a day/night swing and per-sample noise, generated block by
+    # block so a day of samples never has to sit in memory at once
+    def __init__(self, ue_count: int, duration: float = SECONDS_PER_DAY, interval: float = 1.0, mean_mbps: float = 10.0, noise: float = 0.3, session_seconds: float = None, seed: int = 0):
+        self.interval = interval
+        self.teids = np.arange(ue_count)
+        self.noise = noise
+        self.seed = seed
+        self._steps = int(duration / interval)
+        self._ue_count = ue_count
+        self._block = (None, None)
+
+        rng = np.random.default_rng(seed)
+        base = rng.lognormal(0.0, 1.0, ue_count)
+        self.base = (base * mean_mbps / base.mean()).astype(np.float32)
+
+        if session_seconds is None:
+            self.attach = np.zeros(ue_count)
+            self.detach = np.full(ue_count, np.inf)
+        else:
+            self.attach = rng.uniform(-session_seconds, duration, ue_count)
+            self.detach = self.attach + rng.exponential(session_seconds, ue_count)
+
+    @property
+    def steps(self) -> int:
+        return self._steps
+
+    @property
+    def ue_count(self) -> int:
+        return self._ue_count
+
+    def _generate_block(self, block: int) -> np.ndarray:
+        if self._block[0] == block:
+            return self._block[1]
+
+        start = block * DEFAULT_BLOCK_STEPS
+        end = min(self._steps, start + DEFAULT_BLOCK_STEPS)
+        t = np.arange(start, end) * self.interval
+        rng = np.random.default_rng((self.seed, block))
+
+        diurnal = (0.35 + 0.65 * 0.5 * (1 - np.cos(2 * np.pi * t / SECONDS_PER_DAY))).astype(np.float32)
+        rates = rng.standard_normal((end - start, self._ue_count), dtype=np.float32)
+        rates *= self.noise
+        rates -= self.noise * self.noise / 2
+        np.exp(rates, out=rates)
+        rates *= diurnal[:, None]
+        rates *= self.base[None, :]
+        rates[(t[:, None] < self.attach[None, :]) | (t[:, None] >= self.detach[None, :])] = np.nan
+
+        self._block = (block, rates)
+        return rates
+
+    def window(self, start: int, end: int) -> np.ndarray:
+        first_block, last_block = start // DEFAULT_BLOCK_STEPS, (end - 1) // DEFAULT_BLOCK_STEPS
+
+        if first_block == last_block:
+            offset = first_block * DEFAULT_BLOCK_STEPS
+            return self._generate_block(first_block)[start - offset:end - offset]
+        return np.concatenate([self.window(max(start, block * DEFAULT_BLOCK_STEPS), min(end, (block + 1) * DEFAULT_BLOCK_STEPS)) for block in range(first_block, last_block + 1)])
+
+
+def load_trace(path: str, interval: float = 1.0) -> RateTrace:
+    # .npy: samples x UEs in Mbps, memory mapped; .npz: rates, interval and teids arrays;
+    # .csv: one "t,teid,mbps" row per sample, t in seconds from the start of the recording
+    if path.endswith(".npy"):
+        return RateTrace(np.load(path, mmap_mode="r"), interval)
+
+    if path.endswith(".npz"):
+        archive = np.load(path)
+        return RateTrace(archive["rates"], float(archive["interval"]) if "interval" in archive else interval, archive["teids"] if "teids" in archive else None)
+
+    with open(path) as f:
+        rows = np.array([(float(row["t"]), int(row["teid"]), float(row["mbps"])) for row in csv.DictReader(f)])
+
+    steps = (rows[:, 0] / interval).astype(np.int64)
+    teids, columns = np.unique(rows[:, 1].astype(np.int64), return_inverse=True)
+    rates = np.full((steps.max() + 1, len(teids)), np.nan, dtype=np.float32)
+    rates[steps, columns] = rows[:, 2]
+    return RateTrace(rates, interval, teids)
+
+
+def save_trace(path: str, trace: RateTrace):
+    np.savez_compressed(path, rates=trace.window(0, trace.steps), interval=trace.interval, teids=trace.teids)
+
+
+@dataclass
+class Policy:
+    name: str
+    # (upfs, active UEs, demand_fn) -> None, leaves the new placement in ue.binding_upf
+    allocate: Callable[[List[UPF], List[UE], Callable[[UE], float]], None]
+    # (load, capacity) per sample -> samples where running the policy could change something,
+    # None for policies that only place new UEs
+    load_trigger: Callable[[np.ndarray, np.ndarray], np.ndarray] = None
+    # Whole re-packs change placements without a trigger, so they also run every period
+    periodic: bool = False
+
+
+def incremental_policy(high_watermark: float = 0.9, low_watermark: float = 0.7, migration_budget: int = 16) -> Policy:
+    # Nothing moves unless some UPF is over high_watermark and another still has room under low_watermark
+    return Policy("incremental_rebalance",
+        lambda upfs, ues, demand_fn: LLF(upfs).incremental_rebalance(ues, high_watermark, low_watermark, migration_budget, demand_fn),
+        lambda load, capacity: (load > high_watermark * capacity).any(axis=1) & (load < low_watermark * capacity).any(axis=1)
+    )
+
+
+def placement_policy(strategy: AllocationStrategy) -> Policy:
+    return Policy(f"place_{strategy.name.lower()}", lambda upfs, ues, demand_fn: UPFAllocator(upfs, strategy).allocate(ues, demand_fn, keep_existing=True))
+
+
+def repack_policy(strategy: AllocationStrategy, high_watermark: float = 0.9) -> Policy:
+    return Policy(f"repack_{strategy.name.lower()}",
+        lambda upfs, ues, demand_fn: UPFAllocator(upfs, strategy).allocate(ues, demand_fn, keep_existing=False),
+        lambda load, capacity: (load > high_watermark * capacity).any(axis=1),
+        periodic=True
+    )
+
+
+def available_policies() -> Dict[str, Policy]:
+    policies = [incremental_policy()] + [placement_policy(strategy) for strategy in AllocationStrategy] + [repack_policy(strategy) for strategy in AllocationStrategy]
+    return dict((policy.name, policy) for policy in policies)
+
+
+def default_policies() -> List[Policy]:
+    # Re-packing every period costs a full allocation per period, ask for it by name
+    return [policy for policy in available_policies().values() if not policy.periodic]
+
+
+@dataclass
+class SimulationReport:
+    policy: str
+    simulated_seconds: float
+    overload_seconds: float = 0.0
+    upf_overload_seconds: float = 0.0
+    excess_mbit: float = 0.0
+    above_high_watermark_seconds: float = 0.0
+    peak_utilization: float = 0.0
+    mean_jain_fairness: float = 0.0
+    migrations: int = 0
+    placements: int = 0
+    decisions: int = 0
+    allocator_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+
+class _PolicyRun:
+    def __init__(self, policy: Policy, upfs: List[UPF], trace: RateTrace, period_steps: int, min_gap_steps: int, high_watermark: float, default_upf: int):
+        self.policy = policy
+        self.upfs = upfs
+        self.upf_index: Dict[str, int] = dict((upf.get_ip_addr(), index) for (index, upf) in enumerate(upfs))
+        self.capacity = np.array([upf.max_loading_in_mbps - upf.background_loading_in_mbps for upf in upfs], dtype=np.float32)
+        self.high_watermark_load = high_watermark * self.capacity
+        self.interval = trace.interval
+        self.period_steps = period_steps
+        self.min_gap_steps = min_gap_steps
+        self.default_upf = default_upf
+
+        # TEIDs are column numbers inside the simulation, the demand lookup is a plain list index
+        self.ues = [UE(index, UE_IP_BASE + index, "", "", 0) for index in range(trace.ue_count)]
+        self.binding = np.full(trace.ue_count, -1, dtype=np.int64)
+        self.onehot = np.zeros((trace.ue_count, len(upfs)), dtype=np.float32)
+        self.onehot[:, default_upf] = 1
+        self.next_periodic = 0
+        self.last_decision = -min_gap_steps
+        self.unplaced = False
+        self.jain_sum = 0.0
+        self.jain_count = 0
+        self.report = SimulationReport(policy.name, trace.steps * trace.interval)
+
+    def _decide(self, rates: np.ndarray, active: np.ndarray, step: int):
+        report = self.report
+        old_binding = self.binding.copy()
+        # A detached UE loses its route, coming back is a new placement
+        self.binding[~active] = -1
+
+        demand = rates.tolist()
+        active_ues: List[UE] = []
+        for index in np.flatnonzero(active).tolist():
+            ue = self.ues[index]
+            binding = self.binding[index]
+            ue.set_binding_upf(self.upfs[binding].get_ip_addr() if binding >= 0 else None)
+            active_ues.append(ue)
+
+        start = time.perf_counter()
+        self.policy.allocate(self.upfs, active_ues, lambda ue: demand[ue.teid])
+        report.allocator_seconds += time.perf_counter() - start
+
+        for ue in active_ues:
+            self.binding[ue.teid] = self.upf_index.get(ue.get_binding_upf(), -1)
+
+        moved = (old_binding >= 0) & (self.binding >= 0) & (old_binding != self.binding)
+        report.migrations += int(moved.sum())
+        report.placements += int(((old_binding < 0) & (self.binding >= 0)).sum())
+        report.decisions += 1
+
+        # Unrouted UEs fall through to the default route, same as the TEID entries installed at start-up
+        effective = np.where(self.binding >= 0, self.binding, self.default_upf)
+        self.onehot.fill(0)
+        self.onehot[np.arange(len(effective)), effective] = 1
+
+        self.unplaced = bool((active & (self.binding < 0)).any())
+        self.last_decision = step
+        if self.policy.periodic:
+            self.next_periodic = step + self.period_steps
+
+    def _account(self, load: np.ndarray):
+        report = self.report
+        over = load > self.capacity
+        utilization = load / self.capacity
+
+        report.overload_seconds += float(over.any(axis=1).sum()) * self.interval
+        report.upf_overload_seconds += float(over.sum()) * self.interval
+        report.excess_mbit += float(np.clip(load - self.capacity, 0, None).sum()) * self.interval
+        report.above_high_watermark_seconds += float((load > self.high_watermark_load).any(axis=1).sum()) * self.interval
+        if len(utilization) > 0:
+            report.peak_utilization = max(report.peak_utilization, float(utilization.max()))
+
+        # Jain's index over UPF utilization, 1.0 when every UPF is equally loaded
+        total = utilization.sum(axis=1)
+        squares = (utilization * utilization).sum(axis=1)
+        loaded = squares > 0
+        self.jain_sum += float((total[loaded] ** 2 / (len(self.upfs) * squares[loaded])).sum())
+        self.jain_count += int(loaded.sum())
+
+    def run_block(self, start: int, rates: np.ndarray, active: np.ndarray, attach_rows: np.ndarray):
+        filled = np.nan_to_num(rates)
+        position = 0
+
+        while position < len(rates):
+            step = start + position
+            if self.report.decisions == 0 or self.policy.periodic and step >= self.next_periodic:
+                self._decide(filled[position], active[position], step)
+
+            end = min(len(rates), self.next_periodic - start) if self.policy.periodic else len(rates)
+            gap = max(0, self.last_decision + self.min_gap_steps - step)
+
+            # Attaches after the last run are known up front, no need to compute load past the next one
+            pending = attach_rows[np.searchsorted(attach_rows, max(position, self.last_decision - start + 1)):]
+            if len(pending) > 0:
+                end = min(end, max(pending[0], position + gap) + 1)
+            load = filled[position:end] @ self.onehot
+
+            # New UEs with no route yet, or a UPF over the watermark, run the allocator like the
+            # new_ue and load_threshold events do in the control loop
+            if self.policy.load_trigger is not None:
+                triggered = self.policy.load_trigger(load, self.capacity)
+            else:
+                triggered = np.zeros(len(load), dtype=bool)
+            # Every UE active at a decision got a route, so only later attaches come in unrouted
+            triggered[pending[pending < end] - position] = True
+            if self.unplaced:
+                triggered[:] = True
+
+            # A UE that attached too soon after the last run is picked up once the gap is over
+            if triggered[:gap].any() and gap < len(triggered):
+                triggered[gap] = True
+            triggered[:gap] = False
+
+            hits = np.flatnonzero(triggered)
+            if len(hits) > 0:
+                end = position + hits[0]
+                load = load[:hits[0]]
+
+            self._account(load)
+            position = end
+
+            if len(hits) > 0:
+                self._decide(filled[position], active[position], start + position)
+
+    def finish(self) -> SimulationReport:
+        self.report.mean_jain_fairness = self.jain_sum / self.jain_count if self.jain_count > 0 else 1.0
+        return self.report
+
+
+def simulate(trace: RateTrace, upfs: List[UPF], policies: List[Policy] = None, period: float = 5.0, min_gap: float = 5.0, high_watermark: float = 0.9, default_upf: int = 0, block_steps: int = DEFAULT_BLOCK_STEPS) -> List[SimulationReport]:
+    policies = policies if policies is not None else default_policies()
+    runs = [_PolicyRun(policy, upfs, trace, max(1, int(period / trace.interval)), max(1, int(min_gap / trace.interval)), high_watermark, default_upf) for policy in policies]
+    wall = dict((run.policy.name, 0.0) for run in runs)
+
+    previous_active = np.zeros(trace.ue_count, dtype=bool)
+
+    # Each block is read once and replayed through every policy
+    for start in range(0, trace.steps, block_steps):
+        rates = trace.window(start, min(trace.steps, start + block_steps))
+        active = ~np.isnan(rates)
+
+        attached = active.copy()
+        attached[0] &= ~previous_active
+        attached[1:] &= ~active[:-1]
+        attach_rows = np.flatnonzero(attached.any(axis=1))
+        previous_active = active[-1]
+
+        for run in runs:
+            begin = time.perf_counter()
+            run.run_block(start, rates, active, attach_rows)
+            wall[run.policy.name] += time.perf_counter() - begin
+
+    reports: List[SimulationReport] = []
+    for run in runs:
+        report = run.finish()
+        report.wall_seconds = wall[run.policy.name]
+        reports.append(report)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay UE rate traces through the UPF allocator")
+    parser.add_argument("--trace", default=None, help=".npy/.npz/.csv trace, synthetic when omitted")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds per sample")
+    parser.add_argument("--upfs", default=None, help="JSON list of UPFs, the control loop's four when omitted")
+    parser.add_argument("--ues", type=int, default=2000, help="synthetic trace: UE count")
+    parser.add_argument("--duration", type=float, default=SECONDS_PER_DAY, help="synthetic trace: seconds")
+    parser.add_argument("--load-factor", type=float, default=0.8, help="synthetic trace: mean peak demand over total UPF capacity")
+    parser.add_argument("--session-seconds", type=float, default=None, help="synthetic trace: mean session length, UEs stay attached when omitted")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policies", nargs="*", choices=list(available_policies().keys()), default=None, help="every non-periodic policy when omitted")
+    parser.add_argument("--period", type=float, default=5.0, help="seconds between periodic re-packs")
+    parser.add_argument("--min-gap", type=float, default=5.0, help="shortest time between two allocator runs, the allocation phase period by default")
+    parser.add_argument("--high-watermark", type=float, default=0.9)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    upfs = load_upfs(args.upfs) if args.upfs is not None else default_upfs()
+
+    if args.trace is not None:
+        trace = load_trace(args.trace, args.interval)
+    else:
+        capacity = sum(upf.max_loading_in_mbps - upf.background_loading_in_mbps for upf in upfs)
+        trace = SyntheticTrace(args.ues, args.duration, args.interval, args.load_factor * capacity / args.ues, session_seconds=args.session_seconds, seed=args.seed)
+
+    policies = [available_policies()[name] for name in args.policies] if args.policies is not None else None
+    reports = simulate(trace, upfs, policies, period=args.period, min_gap=args.min_gap, high_watermark=args.high_watermark)
+
+    for report in reports:
+        print(f"[SIM] {report.policy} / Overload {report.overload_seconds:.0f}s / Migrations {report.migrations} / Fairness {report.mean_jain_fairness:.3f} / {report.wall_seconds:.2f}s", file=sys.stderr)
+
+    output = json.dumps({
+        "trace": {"ues": trace.ue_count, "steps": trace.steps, "interval": trace.interval, "source": args.trace or "synthetic"},
+        "upfs": [{"ip": upf.get_ip_addr(), "capacity_mbps": upf.max_loading_in_mbps - upf.background_loading_in_mbps} for upf in upfs],
+        "reports": [asdict(report) for report in reports],
+    }, indent=2)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
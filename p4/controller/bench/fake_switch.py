@@ -0,0 +1,459 @@
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from queue import Empty, Queue
+from typing import Any, Dict, Iterator, List, Tuple
+
+from bfrt_grpc.client import BfruntimeReadWriteRpcException
+from pal_rpc.ttypes import pal_fec_type_t, pal_port_speed_t
+
+DEFAULT_TABLE_SIZE = 1024
+
+# Key fields of every table the controller touches, dpi.p4 plus what the initialize modules write
+TABLE_KEYS: Dict[str, List[str]] = {
+    "$PORT": ["$DEV_PORT"],
+    "$pre.node": ["$MULTICAST_NODE_ID"],
+    "$pre.mgid": ["$MGID"],
+    "forward_table": ["hdr.ethernet.dstAddr"],
+    "arp_forward_table": ["hdr.arp.tpa"],
+    "forward_specific_ue_udp_dst_port_packet_table": ["hdr.ipv4.srcAddr", "hdr.ipv4.dstAddr", "hdr.ue_udp.dstPort"],
+    "forward_specific_udp_dst_port_packet_table": ["hdr.ipv4.srcAddr", "hdr.ipv4.dstAddr", "hdr.udp.dstPort"],
+    "forward_valid_dns_packet_to_upf_table": ["ig_intr_md.ingress_port"],
+    "virtual_ip_arp_reply_table": ["hdr.arp.tpa"],
+    "virtual_ip_header_replacement_table": ["ig_intr_md.ingress_port", "hdr.ipv4.dstAddr"],
+    "virtual_ip_hdr_addr_replace_table": ["hdr.ipv4.dstAddr", "hdr.ethernet.dstAddr"],
+    "multicast_ip_replacement_table": ["ig_intr_md.ingress_port"],
+    "upf_source_ip_replacement_table": ["hdr.ipv4.srcAddr"],
+    "record_ue_port_table": ["ig_intr_md.ingress_port"],
+    "ue_packet_transmit_table": ["hdr.gprs.teid", "hdr.ipv4.dstAddr"],
+    "ue_upf_select_table": ["hdr.ipv4.dstAddr"],
+    "ue_upf_profile": ["$ACTION_MEMBER_ID"],
+    "ue_upf_selector": ["$SELECTOR_GROUP_ID"],
+    "teid_slot_table": ["hdr.gprs.teid"],
+    "t": ["hdr.timer.pipe_id", "hdr.timer.app_id", "ig_intr_md.ingress_port"],
+    "tf1.pktgen.app_cfg": ["app_id"],
+    "tf1.pktgen.pkt_buffer": ["pkt_buffer_offset", "pkt_buffer_size"],
+    "tf1.pktgen.port_cfg": ["dev_port"],
+}
+
+TABLE_SIZES: Dict[str, int] = {
+    "ue_packet_transmit_table": 65536,
+    "teid_slot_table": 65536,
+    "$PORT": 512,
+}
+
+REGISTER_SIZES: Dict[str, int] = {
+    "ue_ip_reg": 65536,
+}
+
+COUNTER_SIZES: Dict[str, int] = {
+    "ue_teid_counter": 65536,
+}
+
+# Learn objects of the emulated program; pass learns=[] for one without digests, like dpi.p4
+LEARNS: List[str] = ["ue_teid_digest"]
+
+
+@dataclass
+class FakeP4Error:
+    canonical_code: str
+    message: str
+
+
+class FakeRpcError(BfruntimeReadWriteRpcException):
+    # Same shape the controller reads off a real partial failure: (index in the request, error)
+    def __init__(self, message: str, sub_errors: List[Tuple[int, FakeP4Error]] = None):
+        Exception.__init__(self, message)
+        self.grpc_error = None
+        self.sub_errors = sub_errors if sub_errors is not None else []
+
+    def __str__(self):
+        return self.args[0]
+
+
+class FakeKey:
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def to_dict(self) -> dict:
+        return dict((name, {"value": value}) for (name, value) in self.fields.items())
+
+
+class FakeData:
+    __slots__ = ("fields", "action_name")
+
+    def __init__(self, fields: Dict[str, Any], action_name: str = None):
+        self.fields = fields
+        self.action_name = action_name
+
+    def to_dict(self) -> dict:
+        data_dict = dict(self.fields)
+        if self.action_name is not None:
+            data_dict["action_name"] = self.action_name
+        data_dict["is_default_entry"] = False
+        return data_dict
+
+
+class FakeLearnData:
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def to_dict(self) -> dict:
+        return dict(self.fields)
+
+
+class FakeTableInfo:
+    def __init__(self, key_names: List[str], data_names: List[str], size: int):
+        self.key_names = key_names
+        self.data_names = data_names
+        self.size = size
+
+    def key_field_name_list_get(self) -> List[str]:
+        return list(self.key_names)
+
+    def data_field_name_list_get(self, action_name: str = None) -> List[str]:
+        return list(self.data_names)
+
+    def size_get(self) -> int:
+        return self.size
+
+
+def _data_tuple_value(data_tuple) -> Any:
+    for attr in ("int_arr_val", "bool_arr_val", "bool_val", "float_val", "str_val"):
+        value = getattr(data_tuple, attr, None)
+        if value is not None:
+            return value
+    return getattr(data_tuple, "val", None)
+
+
+class FakeTable:
+    def __init__(self, backend: "FakeSwitchBackend", name: str, key_names: List[str], size: int):
+        self.backend = backend
+        self.name = name
+        self.info = FakeTableInfo(key_names, [], size)
+        self.entries: Dict[tuple, FakeData] = {}
+
+    def make_key(self, key_tuples: list) -> FakeKey:
+        fields = dict((key_tuple.name, key_tuple.value) for key_tuple in key_tuples)
+
+        for name in fields.keys():
+            if name not in self.info.key_names:
+                raise KeyError(f"{self.name} has no key field {name}")
+        return FakeKey(fields)
+
+    def make_data(self, data_tuples: list, action_name: str = None) -> FakeData:
+        return FakeData(dict((data_tuple.name, _data_tuple_value(data_tuple)) for data_tuple in data_tuples), action_name)
+
+    def _index(self, key: FakeKey) -> tuple:
+        return tuple(key.fields.get(name) for name in self.info.key_names)
+
+    def _write(self, key_list: list, apply) -> None:
+        self.backend.rpc(len(key_list))
+        sub_errors: List[Tuple[int, FakeP4Error]] = []
+
+        with self.backend.lock:
+            for index, key in enumerate(key_list):
+                error = apply(index, self._index(key))
+                if error is not None:
+                    sub_errors.append((index, error))
+
+        if len(sub_errors) > 0:
+            raise FakeRpcError(f"{len(sub_errors)} of {len(key_list)} writes to {self.name} failed", sub_errors)
+
+    def entry_add(self, target, key_list: list, data_list: list) -> None:
+        def apply(index: int, key: tuple):
+            if key in self.entries:
+                return FakeP4Error("ALREADY_EXISTS", f"{self.name} {key} already exists")
+            if len(self.entries) >= self.info.size:
+                return FakeP4Error("RESOURCE_EXHAUSTED", f"{self.name} is full")
+            self.entries[key] = data_list[index]
+
+        self._write(key_list, apply)
+
+    def entry_mod(self, target, key_list: list, data_list: list) -> None:
+        def apply(index: int, key: tuple):
+            if key not in self.entries:
+                return FakeP4Error("NOT_FOUND", f"{self.name} {key} not found")
+            self.entries[key] = data_list[index]
+
+        self._write(key_list, apply)
+
+    def entry_del(self, target, key_list: list) -> None:
+        def apply(index: int, key: tuple):
+            if self.entries.pop(key, None) is None:
+                return FakeP4Error("NOT_FOUND", f"{self.name} {key} not found")
+
+        self._write(key_list, apply)
+
+    def entry_get(self, target, key_list: list = None, flags: dict = None, required_data=None) -> Iterator[Tuple[FakeData, FakeKey]]:
+        self.backend.rpc(len(key_list) if key_list is not None else 1)
+
+        with self.backend.lock:
+            if key_list is None:
+                items = list(self.entries.items())
+            else:
+                items = []
+                for key in key_list:
+                    index = self._index(key)
+                    if index not in self.entries:
+                        raise FakeRpcError(f"{self.name} {index} not found")
+                    items.append((index, self.entries[index]))
+
+        return iter([(data, FakeKey(dict(zip(self.info.key_names, index)))) for (index, data) in items])
+
+    def operations_execute(self, target, operation: str) -> None:
+        self.backend.rpc(1)
+
+
+class FakeRegister(FakeTable):
+    # Every index always exists; reads answer with one value per pipe like the real register does
+    def __init__(self, backend: "FakeSwitchBackend", name: str, size: int, pipes: int = 1):
+        super().__init__(backend, name, ["$REGISTER_INDEX"], size)
+        self.field_name = f"{name}.f1"
+        self.info.data_names = [self.field_name]
+        self.pipes = pipes
+        self.values = array("Q", [0]) * size
+
+    def _check(self, index: int):
+        if not 0 <= index < self.info.size:
+            return FakeP4Error("OUT_OF_RANGE", f"{self.name} index {index} out of range")
+
+    def entry_add(self, target, key_list: list, data_list: list) -> None:
+        self.entry_mod(target, key_list, data_list)
+
+    def entry_mod(self, target, key_list: list, data_list: list) -> None:
+        def apply(index: int, key: tuple):
+            error = self._check(key[0])
+            if error is None:
+                self.values[key[0]] = data_list[index].fields[self.field_name]
+            return error
+
+        self._write(key_list, apply)
+
+    def entry_del(self, target, key_list: list) -> None:
+        def apply(index: int, key: tuple):
+            error = self._check(key[0])
+            if error is None:
+                self.values[key[0]] = 0
+            return error
+
+        self._write(key_list, apply)
+
+    def entry_get(self, target, key_list: list = None, flags: dict = None, required_data=None) -> Iterator[Tuple[FakeData, FakeKey]]:
+        self.backend.rpc(len(key_list) if key_list is not None else 1)
+        indexes = range(self.info.size) if key_list is None else [key.fields["$REGISTER_INDEX"] for key in key_list]
+
+        for index in indexes:
+            if not 0 <= index < self.info.size:
+                raise FakeRpcError(f"{self.name} index {index} out of range")
+
+        with self.backend.lock:
+            values = self.values
+            return iter([(FakeData({self.field_name: [values[index]] * self.pipes}), FakeKey({"$REGISTER_INDEX": index})) for index in indexes])
+
+    def set_values(self, values: Dict[int, int]):
+        with self.backend.lock:
+            for index, value in values.items():
+                self.values[index] = value
+
+
+class FakeCounter(FakeTable):
+    # Indirect counter, every index always exists and counts bytes and packets
+    def __init__(self, backend: "FakeSwitchBackend", name: str, size: int):
+        super().__init__(backend, name, ["$COUNTER_INDEX"], size)
+        self.info.data_names = ["$COUNTER_SPEC_BYTES", "$COUNTER_SPEC_PKTS"]
+        self.byte_counts = array("Q", [0]) * size
+        self.packet_counts = array("Q", [0]) * size
+
+    def entry_get(self, target, key_list: list = None, flags: dict = None, required_data=None) -> Iterator[Tuple[FakeData, FakeKey]]:
+        self.backend.rpc(len(key_list) if key_list is not None else 1)
+        indexes = range(self.info.size) if key_list is None else [key.fields["$COUNTER_INDEX"] for key in key_list]
+
+        with self.backend.lock:
+            return iter([
+                (FakeData({"$COUNTER_SPEC_BYTES": self.byte_counts[index], "$COUNTER_SPEC_PKTS": self.packet_counts[index]}), FakeKey({"$COUNTER_INDEX": index}))
+                for index in indexes
+            ])
+
+    def entry_add(self, target, key_list: list, data_list: list) -> None:
+        self.entry_mod(target, key_list, data_list)
+
+    def entry_mod(self, target, key_list: list, data_list: list) -> None:
+        def apply(index: int, key: tuple):
+            if not 0 <= key[0] < self.info.size:
+                return FakeP4Error("OUT_OF_RANGE", f"{self.name} index {key[0]} out of range")
+            self.byte_counts[key[0]] = data_list[index].fields.get("$COUNTER_SPEC_BYTES", 0)
+            self.packet_counts[key[0]] = data_list[index].fields.get("$COUNTER_SPEC_PKTS", 0)
+
+        self._write(key_list, apply)
+
+    def count(self, traffic: Dict[int, Tuple[int, int]]):
+        # index -> (bytes, packets) seen since the last call
+        with self.backend.lock:
+            for index, (byte_count, packet_count) in traffic.items():
+                self.byte_counts[index] += byte_count
+                self.packet_counts[index] += packet_count
+
+
+class FakeLearnInfo:
+    def __init__(self, learn_id: int):
+        self.learn_id = learn_id
+
+    def id_get(self) -> int:
+        return self.learn_id
+
+
+class FakeLearn:
+    def __init__(self, learn_id: int):
+        self.info = FakeLearnInfo(learn_id)
+
+    def make_data_list(self, digest: "FakeDigest") -> List[FakeLearnData]:
+        return [FakeLearnData(fields) for fields in digest.data]
+
+
+@dataclass
+class FakeDigest:
+    # The fields of bfruntime_pb2.DigestList the controller reads
+    digest_id: int
+    data: List[dict]
+
+
+class FakeBfrtInfo:
+    def __init__(self, backend: "FakeSwitchBackend"):
+        self.backend = backend
+        self.table_dict: Dict[str, FakeTable] = {}
+        self.learns: Dict[str, FakeLearn] = {}
+
+    def table_get(self, table_name: str) -> FakeTable:
+        table = self.table_dict.get(table_name)
+        if table is None:
+            raise KeyError(f"Table {table_name} not found")
+        return table
+
+    def learn_get(self, learn_name: str) -> FakeLearn:
+        learn = self.learns.get(learn_name)
+        if learn is None:
+            raise KeyError(f"Learn {learn_name} not found")
+        return learn
+
+
+class FakeClientInterface:
+    def __init__(self, backend: "FakeSwitchBackend"):
+        self.backend = backend
+        self.digests: Queue = Queue()
+
+    def bind_pipeline_config(self, p4_name: str):
+        self.backend.p4_name = p4_name
+
+    def bfrt_info_get(self, p4_name: str = None) -> FakeBfrtInfo:
+        self.backend.rpc(1)
+        return self.backend.bfrt_info
+
+    def digest_get(self, timeout: float = 1):
+        # The real client swallows queue.Empty and raises this instead
+        try:
+            return self.digests.get(timeout=timeout)
+        except Empty:
+            raise RuntimeError("Digest list not received")
+
+
+class FakePal:
+    def __init__(self, backend: "FakeSwitchBackend"):
+        self.backend = backend
+
+    def _port_table(self) -> FakeTable:
+        return self.backend.bfrt_info.table_get("$PORT")
+
+    def pal_port_add(self, device: int, dev_port: int, ps, fec):
+        self.backend.rpc(1)
+        with self.backend.lock:
+            # By name, like the $PORT table of the real switch
+            self._port_table().entries[(dev_port,)] = FakeData({"$SPEED": pal_port_speed_t._VALUES_TO_NAMES[ps], "$FEC": pal_fec_type_t._VALUES_TO_NAMES[fec], "$PORT_ENABLE": False})
+
+    def pal_port_enable(self, device: int, dev_port: int):
+        self.backend.rpc(1)
+        with self.backend.lock:
+            self._port_table().entries[(dev_port,)].fields["$PORT_ENABLE"] = True
+
+    def pal_port_dis(self, device: int, dev_port: int):
+        self.backend.rpc(1)
+        with self.backend.lock:
+            self._port_table().entries[(dev_port,)].fields["$PORT_ENABLE"] = False
+
+    def pal_port_del(self, device: int, dev_port: int):
+        self.backend.rpc(1)
+        with self.backend.lock:
+            self._port_table().entries.pop((dev_port,), None)
+
+
+class FakeConnMgr:
+    def client_init(self) -> int:
+        return 1
+
+
+class FakeMc:
+    def mc_create_session(self) -> int:
+        return 1
+
+
+class FakeSwitchBackend:
+    def __init__(self, latency: float = 0.0, batch_limit: int = None, table_sizes: Dict[str, int] = None, register_sizes: Dict[str, int] = None, counter_sizes: Dict[str, int] = None, learns: List[str] = None):
+        self.latency = latency
+        self.batch_limit = batch_limit
+        self.p4_name = None
+        self.lock = threading.Lock()
+        self.rpc_count = 0
+        self.rpc_entries = 0
+
+        table_sizes = dict(TABLE_SIZES, **(table_sizes or {}))
+        register_sizes = dict(REGISTER_SIZES, **(register_sizes or {}))
+        counter_sizes = dict(COUNTER_SIZES, **(counter_sizes or {}))
+
+        self.bfrt_info = FakeBfrtInfo(self)
+        for table_name, key_names in TABLE_KEYS.items():
+            self.bfrt_info.table_dict[table_name] = FakeTable(self, table_name, key_names, table_sizes.get(table_name, DEFAULT_TABLE_SIZE))
+        for register_name, size in register_sizes.items():
+            self.bfrt_info.table_dict[register_name] = FakeRegister(self, register_name, size)
+        for counter_name, size in counter_sizes.items():
+            self.bfrt_info.table_dict[counter_name] = FakeCounter(self, counter_name, size)
+        for learn_id, learn_name in enumerate(learns if learns is not None else LEARNS, start=1):
+            self.bfrt_info.learns[learn_name] = FakeLearn(learn_id)
+
+        self.client_interface = FakeClientInterface(self)
+        self.pal = FakePal(self)
+        self.conn_mgr = FakeConnMgr()
+        self.mc = FakeMc()
+
+    def rpc(self, entries: int = 1):
+        if self.batch_limit is not None and entries > self.batch_limit:
+            raise FakeRpcError(f"Batch of {entries} entries is over the limit of {self.batch_limit}")
+
+        with self.lock:
+            self.rpc_count += 1
+            self.rpc_entries += entries
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def get_table(self, table_name: str) -> FakeTable:
+        return self.bfrt_info.table_get(table_name)
+
+    def push_digest(self, records: List[dict], learn_name: str = "ue_teid_digest"):
+        self.client_interface.digests.put(FakeDigest(self.bfrt_info.learn_get(learn_name).info.id_get(), records))
+
+    def reset_stats(self):
+        with self.lock:
+            self.rpc_count = 0
+            self.rpc_entries = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "rpcs": self.rpc_count,
+            "rpc_entries": self.rpc_entries,
+            "entries": dict((name, len(table.entries)) for (name, table) in self.bfrt_info.table_dict.items() if not isinstance(table, (FakeRegister, FakeCounter))),
+        }
@@ -0,0 +1,321 @@
+import argparse
+import contextlib
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from bench.fake_switch import FakeSwitchBackend
+from core.switch_controller import DEFAULT_BATCH_SIZE, SwitchController
+from core.switch_reconciler import SwitchPlan, compile_plan, reconcile
+from core.upf_selector import UPFSelector
+from initialize import config_switch_07, config_switch_08
+from model.data import Data
+from model.table_entry import TableEntry
+from model.ue import UE
+from model.upf import UPF
+from utils.allocator import AllocationStrategy, UPFAllocator
+from utils.hex_converter import ip_to_hex, mac_to_hex
+from utils.LLF import LLF
+from utils.ue_registry import UERegistry
+
+P4_NAME = "l2fwd"
+VIRTUAL_IP = "192.168.43.200"
+UE_IP_BASE = ip_to_hex("10.10.0.0")
+
+
+def _summary(samples: List[float]) -> dict:
+    samples = sorted(samples)
+
+    return {
+        "runs": len(samples),
+        "min": samples[0],
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max": samples[-1],
+    }
+
+
+def _measure(fn: Callable[[], object], repeat: int, setup: Callable[[], object] = None) -> List[float]:
+    samples: List[float] = []
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+def _result(name: str, params: dict, samples: List[float], **extra) -> dict:
+    result = {"name": name, "params": params, "seconds": _summary(samples)}
+    result.update(extra)
+    print(f"[BENCH] {name} {params} / p50 {result['seconds']['p50'] * 1e3:.3f} ms", file=sys.stderr)
+    return result
+
+
+def _make_switch(args) -> Tuple[SwitchController, FakeSwitchBackend]:
+    backend = FakeSwitchBackend(latency=args.latency, batch_limit=args.batch_limit, register_sizes={"ue_ip_reg": max(args.teids)})
+    return SwitchController(P4_NAME, None, backend), backend
+
+
+def _make_upfs(count: int, capacity: float) -> List[UPF]:
+    return [
+        UPF(f"UPF{i:03d}", f"02:00:00:00:{i // 256:02x}:{i % 256:02x}", f"192.168.{44 + i // 256}.{i % 256}", i % 64, 0, capacity)
+        for i in range(count)
+    ]
+
+
+def _make_ues(count: int, rng: random.Random) -> List[UE]:
+    return [UE(teid, UE_IP_BASE + teid, f"instance-{teid % 3}", f"dev{teid}", rng.uniform(1, 100)) for teid in range(count)]
+
+
+def _route_entry(teid: int, upf: UPF) -> TableEntry:
+    return TableEntry(table_name="ue_packet_transmit_table",
+        key_names=["hdr.gprs.teid", "hdr.ipv4.dstAddr"],
+        key_vals=[teid, ip_to_hex(VIRTUAL_IP)],
+        data_vals=[
+            Data("dstMacAddr", mac_to_hex(upf.get_mac_addr())),
+            Data("dstIPAddr", ip_to_hex(upf.get_ip_addr())),
+            Data("output_port", upf.get_output_port()),
+        ],
+        action_name="transmit_ue_packet_to_specific_port"
+    )
+
+
+def bench_bringup(args) -> List[dict]:
+    results: List[dict] = []
+
+    for name, config_module in (("init_switch_07", config_switch_07), ("init_switch_08", config_switch_08)):
+        cold: List[float] = []
+        warm: List[float] = []
+        rpcs = {}
+
+        for _ in range(args.repeat):
+            switch, backend = _make_switch(args)
+            plan = compile_plan(config_module.build_config())
+
+            start = time.perf_counter()
+            reconcile(switch, plan, batch_size=args.batch_size)
+            cold.append(time.perf_counter() - start)
+            rpcs["cold"] = backend.rpc_count
+
+            # Restart against a switch that already holds the config
+            switch = SwitchController(P4_NAME, None, backend)
+            backend.reset_stats()
+            start = time.perf_counter()
+            reconcile(switch, compile_plan(config_module.build_config()), batch_size=args.batch_size)
+            warm.append(time.perf_counter() - start)
+            rpcs["warm"] = backend.rpc_count
+
+        params = {"entries": len(plan.entries), "ports": len(plan.ports)}
+        results.append(_result(f"{name}.cold", params, cold, rpcs=rpcs["cold"]))
+        results.append(_result(f"{name}.warm", params, warm, rpcs=rpcs["warm"]))
+
+    return results
+
+
+def bench_discovery(args) -> List[dict]:
+    results: List[dict] = []
+    switch, backend = _make_switch(args)
+    register = backend.get_table("ue_ip_reg")
+
+    for teids in args.teids:
+        rng = random.Random(args.seed)
+        register.set_values(dict((teid, UE_IP_BASE + teid) for teid in range(teids) if rng.random() < 0.5))
+        params = {"teids": teids}
+
+        # The original loop: one register read per TEID
+        backend.reset_stats()
+        samples = _measure(lambda: [switch.get_register_val("ue_ip_reg", ["$REGISTER_INDEX"], [teid]) for teid in range(teids)], max(1, args.repeat // 5))
+        results.append(_result("discovery.register_per_teid", params, samples, rpcs=backend.rpc_count // len(samples)))
+
+        backend.reset_stats()
+        samples = _measure(lambda: switch.get_register_range("ue_ip_reg", 0, teids, batch_size=args.batch_size), args.repeat)
+        results.append(_result("discovery.register_range", params, samples, rpcs=backend.rpc_count // len(samples)))
+
+        def scan_and_index():
+            registry = UERegistry()
+            for teid, ip_hex in enumerate(switch.get_register_range("ue_ip_reg", 0, teids, batch_size=args.batch_size)):
+                if ip_hex != 0:
+                    registry.insert(UE(teid, ip_hex, "", "", 10))
+            return registry
+
+        samples = _measure(scan_and_index, args.repeat)
+        results.append(_result("discovery.range_and_registry", params, samples))
+
+    return results
+
+
+def bench_allocation(args) -> List[dict]:
+    results: List[dict] = []
+
+    for ue_count in args.ues:
+        params = {"ues": ue_count, "upfs": args.upfs}
+        rng = random.Random(args.seed)
+        ues = _make_ues(ue_count, rng)
+        # Enough room in total, so the strategies are compared on placement rather than on overflow
+        upfs = _make_upfs(args.upfs, 1.2 * sum(ue.get_expected_bandwidth() for ue in ues) / args.upfs)
+
+        def unbind():
+            for ue in ues:
+                ue.set_binding_upf(None)
+
+        for strategy in AllocationStrategy:
+            allocator = UPFAllocator(upfs, strategy)
+            samples = _measure(lambda: allocator.allocate(ues, keep_existing=False), args.repeat, unbind)
+            results.append(_result(f"allocation.{strategy.name.lower()}", params, samples))
+
+        llf = LLF(upfs)
+
+        def skew():
+            # A third of the UPFs carry everyone, so rebalance has real work to do
+            hot = upfs[:max(1, args.upfs // 3)]
+            for index, ue in enumerate(ues):
+                ue.set_binding_upf(hot[index % len(hot)].get_ip_addr())
+
+        migrations: List[int] = []
+        samples = _measure(lambda: migrations.append(len(llf.incremental_rebalance(ues, migration_budget=args.migration_budget))), args.repeat, skew)
+        results.append(_result("allocation.incremental_rebalance", dict(params, migration_budget=args.migration_budget), samples, migrations=max(migrations)))
+
+    return results
+
+
+def bench_loop(args) -> List[dict]:
+    results: List[dict] = []
+    teids = max(args.teids)
+    ue_count = min(max(args.ues), teids)
+    params = {"teids": teids, "ues": ue_count, "upfs": args.upfs}
+
+    rng = random.Random(args.seed)
+    switch, backend = _make_switch(args)
+    ues = _make_ues(ue_count, rng)
+    upfs = _make_upfs(args.upfs, 1.2 * sum(ue.get_expected_bandwidth() for ue in ues) / args.upfs)
+    upf_by_ip: Dict[str, UPF] = dict((upf.get_ip_addr(), upf) for upf in upfs)
+    llf = LLF(upfs)
+    registry = UERegistry()
+
+    reconcile(switch, SwitchPlan(entries=[_route_entry(teid, upfs[0]) for teid in range(teids)]), batch_size=args.batch_size)
+    backend.get_table("ue_ip_reg").set_values(dict((ue.get_teid(), ue.get_ip_addr()) for ue in ues))
+
+    def iteration():
+        for teid, ip_hex in enumerate(switch.get_register_range("ue_ip_reg", 0, teids, batch_size=args.batch_size)):
+            if ip_hex != 0 and teid not in registry:
+                registry.insert(ues[teid])
+
+        migrations = llf.incremental_rebalance(registry.get_ues(), migration_budget=args.migration_budget)
+        registry.apply_migrations(migrations)
+        switch.modify_table_records([_route_entry(migration.teid, upf_by_ip[migration.new_upf]) for migration in migrations], args.batch_size)
+
+    def drift():
+        # Traffic moves between iterations, some UEs grow and push their UPF over the watermark
+        for ue in rng.sample(ues, max(1, ue_count // 20)):
+            ue.expected_bandwidth = rng.uniform(1, 200)
+            if ue.get_teid() in registry:
+                registry.update_demand(ue.get_teid())
+
+    backend.reset_stats()
+    samples = _measure(iteration, args.repeat, drift)
+    results.append(_result("loop.iteration", params, samples, rpcs=backend.rpc_count // len(samples), suppressed_writes=switch.shadow.suppressed))
+
+    return results
+
+
+def bench_steering(args) -> List[dict]:
+    # Same drift, steered with per-UE exact routes and with the weighted selector group
+    results: List[dict] = []
+    ue_count = max(args.ues)
+    params = {"ues": ue_count, "upfs": args.upfs}
+
+    for mode in ("exact", "selector"):
+        rng = random.Random(args.seed)
+        switch, backend = _make_switch(args)
+        ues = _make_ues(ue_count, rng)
+        upfs = _make_upfs(args.upfs, 2 * sum(ue.get_expected_bandwidth() for ue in ues) / args.upfs)
+        upf_by_ip: Dict[str, UPF] = dict((upf.get_ip_addr(), upf) for upf in upfs)
+        llf = LLF(upfs)
+        selector = UPFSelector(switch, upfs, VIRTUAL_IP)
+
+        if mode == "exact":
+            llf.incremental_rebalance(ues)
+            reconcile(switch, SwitchPlan(entries=[_route_entry(ue.get_teid(), upf_by_ip[ue.get_binding_upf()]) for ue in ues]), batch_size=args.batch_size)
+        else:
+            plan = llf.selector_rebalance(ues)
+            selector.install(plan.weights)
+            selector.apply(plan)
+
+        def drift():
+            # Background traffic lands on one UPF and pushes it over the watermark, the UEs' own demand moves a little
+            hot = rng.choice(upfs)
+            for upf in upfs:
+                upf.background_loading_in_mbps = 0.5 * upf.max_loading_in_mbps if upf is hot else 0
+            for ue in rng.sample(ues, max(1, ue_count // 20)):
+                ue.expected_bandwidth = rng.uniform(1, 200)
+
+        def steer_exact():
+            migrations = llf.incremental_rebalance(ues, migration_budget=args.migration_budget)
+            with switch.transaction() as transaction:
+                for migration in migrations:
+                    transaction.modify(_route_entry(migration.teid, upf_by_ip[migration.new_upf]))
+
+        def steer_selector():
+            selector.apply(llf.selector_rebalance(ues, overrides=selector.get_overrides()))
+
+        backend.reset_stats()
+        samples = _measure(steer_exact if mode == "exact" else steer_selector, args.repeat, drift)
+        results.append(_result(f"steering.{mode}", params, samples, rpcs=backend.rpc_count // len(samples), entries_written=backend.rpc_entries // len(samples)))
+
+    return results
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "bringup": bench_bringup,
+    "discovery": bench_discovery,
+    "allocation": bench_allocation,
+    "loop": bench_loop,
+    "steering": bench_steering,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controller benchmarks against an in-process fake switch")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS.keys()), default=list(BENCHMARKS.keys()))
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake RPC")
+    parser.add_argument("--batch-limit", type=int, default=None, help="largest batch the fake switch accepts")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="entries per request the controller sends")
+    parser.add_argument("--teids", type=int, nargs="+", default=[1024, 16384])
+    parser.add_argument("--ues", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--upfs", type=int, default=16)
+    parser.add_argument("--migration-budget", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": time.time(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": [],
+    }
+    # The controller reports progress with print, keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in args.only:
+            report["results"].extend(BENCHMARKS[name](args))
+
+    output = json.dumps(report, indent=2)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Callable, Dict, List
+
+from core.switch_controller import DEFAULT_BATCH_SIZE, Fec, Speed, SwitchController, TableWriteError
+from model.data import Data
+from model.table_entry import TableEntry
+
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class AsyncSwitchController:
+    # gRPC calls share the ClientInterface channel and may overlap up to max_in_flight.
+    # The Thrift transport is a single blocking socket, so pal/mc calls go through one thread.
+    # Calls that depend on each other must be awaited in order, nothing here reorders them back.
+    # Writes hold a lock per table, so two writes to one table never race on its shadow entries.
+    def __init__(self, switch: SwitchController, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.switch = switch
+        self.max_in_flight = max_in_flight
+        self.grpc_executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="bfrt")
+        self.thrift_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thrift")
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.table_locks: Dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    async def connect(cls, p4_name: str, host: str, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> "AsyncSwitchController":
+        switch = await asyncio.get_running_loop().run_in_executor(None, SwitchController, p4_name, host)
+        return cls(switch, max_in_flight)
+
+    async def _grpc(self, fn: Callable, *args, **kwargs) -> Any:
+        async with self.in_flight:
+            return await asyncio.get_running_loop().run_in_executor(self.grpc_executor, partial(fn, *args, **kwargs))
+
+    @asynccontextmanager
+    async def _lock_tables(self, table_names: List[str]):
+        async with AsyncExitStack() as stack:
+            # Always taken in name order, two multi-table writes cannot wait on each other
+            for table_name in sorted(set(table_names)):
+                await stack.enter_async_context(self.table_locks.setdefault(table_name, asyncio.Lock()))
+            yield
+
+    async def _write(self, table_names: List[str], fn: Callable, *args, **kwargs) -> Any:
+        async with self._lock_tables(table_names):
+            return await self._grpc(fn, *args, **kwargs)
+
+    async def _thrift(self, fn: Callable, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.thrift_executor, partial(fn, *args, **kwargs))
+
+    async def add_port(self, dev_port: int, speed: Speed, fec: Fec) -> None:
+        await self._thrift(self.switch.add_port, dev_port, speed, fec)
+
+    async def enb_port(self, dev_port: int) -> None:
+        await self._thrift(self.switch.enb_port, dev_port)
+
+    async def dis_port(self, dev_port: int) -> None:
+        await self._thrift(self.switch.dis_port, dev_port)
+
+    async def del_port(self, dev_port: int) -> None:
+        await self._thrift(self.switch.del_port, dev_port)
+
+    async def add_table_record(self, table_name: str, key_names: list, key_vals: list, data_vals: List[Data], action_name: str = None):
+        await self._write([table_name], self.switch.add_table_record, table_name, key_names, key_vals, data_vals, action_name)
+
+    async def modify_table_record(self, table_name: str, key_names: list, key_vals: list, data_vals: List[Data], action_name: str = None):
+        await self._write([table_name], self.switch.modify_table_record, table_name, key_names, key_vals, data_vals, action_name)
+
+    async def delete_table_record(self, table_name: str, key_names: list, key_vals: list):
+        await self._write([table_name], self.switch.delete_table_record, table_name, key_names, key_vals)
+
+    async def add_table_records(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        return await self._write([entry.table_name for entry in entries], self.switch.add_table_records, entries, batch_size)
+
+    async def modify_table_records(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        return await self._write([entry.table_name for entry in entries], self.switch.modify_table_records, entries, batch_size)
+
+    async def delete_table_records(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        return await self._write([entry.table_name for entry in entries], self.switch.delete_table_records, entries, batch_size)
+
+    async def get_register_val(self, register_name: str, key_names: list, key_vals: list):
+        return await self._grpc(self.switch.get_register_val, register_name, key_names, key_vals)
+
+    async def get_register_range(self, register_name: str, start: int, end: int, from_hw: bool = True) -> array:
+        return await self._grpc(self.switch.get_register_range, register_name, start, end, from_hw)
+
+    async def dump_register(self, register_name: str, from_hw: bool = True) -> array:
+        return await self._grpc(self.switch.dump_register, register_name, from_hw)
+
+    async def read_table_entries(self, table_name: str, key_names: list = None, from_hw: bool = False) -> List[TableEntry]:
+        return await self._grpc(self.switch.read_table_entries, table_name, key_names, from_hw)
+
+    async def modify_table_records_pipelined(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        # Independent batches go out together instead of waiting on each other's round trip. The
+        # tables stay locked for the whole set; the batches hold distinct keys, and the shadow
+        # itself is safe for concurrent writers of different keys.
+        batches = [entries[start:start + batch_size] for start in range(0, len(entries), batch_size)]
+        async with self._lock_tables([entry.table_name for entry in entries]):
+            results = await asyncio.gather(*[self._grpc(self.switch.modify_table_records, batch, batch_size) for batch in batches])
+        return [error for errors in results for error in errors]
+
+    def close(self):
+        self.grpc_executor.shutdown(wait=True)
+        self.thrift_executor.shutdown(wait=True)
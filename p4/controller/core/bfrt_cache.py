@@ -0,0 +1,150 @@
+import threading
+from typing import Dict, List, Tuple
+
+from bfrt_grpc.client import ClientInterface, Target
+
+
+class BfrtCache:
+    # Looked up from every thread using the switch; reentrant, the getters call each other on a miss
+    def __init__(self, client_interface: ClientInterface, p4_name: str):
+        self.client_interface = client_interface
+        self.p4_name = p4_name
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._reset()
+
+    def _reset(self):
+        self.bfrt_info = None
+        self.tables: Dict[str, object] = {}
+        self.learns: Dict[str, object] = {}
+        self.key_field_names: Dict[str, List[str]] = {}
+        self.data_field_names: Dict[Tuple[str, str], List[str]] = {}
+        self.table_sizes: Dict[str, int] = {}
+        self.targets: Dict[int, Target] = {}
+
+    def invalidate(self):
+        with self.lock:
+            self.invalidations += 1
+            self._reset()
+
+    def _hit(self):
+        self.hits += 1
+
+    def _miss(self):
+        self.misses += 1
+
+    def get_bfrt_info(self):
+        with self.lock:
+            if self.bfrt_info is None:
+                self._miss()
+                self.bfrt_info = self.client_interface.bfrt_info_get(self.p4_name)
+            else:
+                self._hit()
+            return self.bfrt_info
+
+    def get_table(self, table_name: str):
+        with self.lock:
+            table = self.tables.get(table_name)
+
+            if table is None:
+                self._miss()
+                table = self.get_bfrt_info().table_get(table_name)
+                self.tables[table_name] = table
+            else:
+                self._hit()
+            return table
+
+    def get_learn(self, learn_name: str):
+        with self.lock:
+            learn = self.learns.get(learn_name)
+
+            if learn is None:
+                self._miss()
+                learn = self.get_bfrt_info().learn_get(learn_name)
+                self.learns[learn_name] = learn
+            else:
+                self._hit()
+            return learn
+
+    def has_learn(self, learn_name: str) -> bool:
+        # bfrt_grpc has no lookup that answers no, an unknown learn name raises from learn_get
+        try:
+            self.get_learn(learn_name)
+        except Exception:
+            return False
+        return True
+
+    def get_target(self, pipe_id: int = 0xffff) -> Target:
+        with self.lock:
+            target = self.targets.get(pipe_id)
+
+            if target is None:
+                self._miss()
+                target = Target(device_id=0, pipe_id=pipe_id)
+                self.targets[pipe_id] = target
+            else:
+                self._hit()
+            return target
+
+    def get_key_field_names(self, table_name: str) -> List[str]:
+        with self.lock:
+            names = self.key_field_names.get(table_name)
+
+            if names is None:
+                self._miss()
+                names = self.get_table(table_name).info.key_field_name_list_get()
+                self.key_field_names[table_name] = names
+            else:
+                self._hit()
+            return names
+
+    def get_data_field_names(self, table_name: str, action_name: str = None) -> List[str]:
+        with self.lock:
+            names = self.data_field_names.get((table_name, action_name))
+
+            if names is None:
+                self._miss()
+                table_info = self.get_table(table_name).info
+                if action_name is not None:
+                    names = table_info.data_field_name_list_get(action_name)
+                else:
+                    names = table_info.data_field_name_list_get()
+                self.data_field_names[(table_name, action_name)] = names
+            else:
+                self._hit()
+            return names
+
+    def get_table_size(self, table_name: str) -> int:
+        with self.lock:
+            size = self.table_sizes.get(table_name)
+
+            if size is None:
+                self._miss()
+                size = self.get_table(table_name).info.size_get()
+                self.table_sizes[table_name] = size
+            else:
+                self._hit()
+            return size
+
+    def get_register_field_name(self, register_name: str) -> str:
+        specific_key: str = ""
+
+        for key in self.get_data_field_names(register_name):
+            if "f1" in key:
+                specific_key = key
+
+        return specific_key
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "p4_name": self.p4_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            }
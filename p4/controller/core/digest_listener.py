@@ -0,0 +1,47 @@
+import threading
+from typing import Callable, List
+
+from bfrt_grpc.client import logging
+
+from core.switch_controller import SwitchController
+from utils.log import get_logger, log_event
+
+log = get_logger("digest_listener")
+
+
+class DigestListener:
+    def __init__(self, switch: SwitchController, learn_name: str, callback: Callable[[List[dict]], None], timeout: float = 1):
+        self.switch = switch
+        self.learn_name = learn_name
+        self.callback = callback
+        self.timeout = timeout
+        self.received = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def poll_once(self) -> int:
+        digests = self.switch.get_digest(self.learn_name, self.timeout)
+
+        if len(digests) > 0:
+            self.received += len(digests)
+            self.callback(digests)
+        return len(digests)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                log_event(log, logging.WARNING, "digest_poll_failed", learn=self.learn_name, error=e)
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"digest-{self.learn_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
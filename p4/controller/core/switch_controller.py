@@ -1,5 +1,10 @@
+import threading
+import time
+from array import array
+from collections import deque
 from dataclasses import dataclass
-from typing import Any, List
+from itertools import groupby
+from typing import Any, Deque, Dict, List, Tuple
 
 import pal_rpc.pal as pal_i
 import conn_mgr_pd_rpc.conn_mgr as conn_mgr_client_module
@@ -13,24 +18,100 @@ from res_pd_rpc.ttypes import DevTarget_t
 from thrift.transport import TSocket, TTransport
 from thrift.protocol import TBinaryProtocol, TMultiplexedProtocol
 
+from core.bfrt_cache import BfrtCache
+from core.table_shadow import TableShadow
 from model.data import Data
+from model.table_entry import TableEntry
+from utils.log import get_logger, log_event
+from utils.metrics import SWITCH_REGISTER_READ_SECONDS, SWITCH_RPC_ERRORS, SWITCH_SUPPRESSED_WRITES, SWITCH_TABLE_WRITES, SWITCH_TABLE_WRITE_SECONDS, SWITCH_TRANSACTIONS
 
 logger.setLevel(logging.CRITICAL)
+log = get_logger("switch_controller")
+
+DEFAULT_BATCH_SIZE = 256
+DIGEST_TIMEOUT_MESSAGE = "Digest list not received"
+# Digests of a learn nobody has asked for yet, kept per learn up to this many
+MAX_PENDING_DIGESTS = 1024
 
 class Speed(Enum):
     SPEED_10G = pal_port_speed_t.BF_SPEED_10G
     SPEED_100G = pal_port_speed_t.BF_SPEED_100G
 
+    def get_bfrt_name(self) -> str:
+        # How the $PORT table reports it
+        return pal_port_speed_t._VALUES_TO_NAMES[self.value]
+
 
 class Fec(Enum):
     FEC_NONE = pal_fec_type_t.BF_FEC_TYP_NONE
     FEC_FIRECODE = pal_fec_type_t.BF_FEC_TYP_FIRECODE
     FEC_REED_SOLOMON = pal_fec_type_t.BF_FEC_TYP_REED_SOLOMON
 
+    def get_bfrt_name(self) -> str:
+        return pal_fec_type_t._VALUES_TO_NAMES[self.value]
+
+
+class WriteOp(Enum):
+    ADD = 1
+    MOD = 2
+    DEL = 3
+
+
+@dataclass
+class TableWriteError:
+    op: WriteOp
+    entry: TableEntry
+    message: str
+
+
+class SwitchTransaction:
+    # Collects writes and applies them on commit(), see SwitchController.apply_with_compensation
+    def __init__(self, switch: "SwitchController"):
+        self.switch = switch
+        self.ops: List[Tuple[WriteOp, TableEntry]] = []
+
+    def add(self, entry: TableEntry):
+        self.ops.append((WriteOp.ADD, entry))
+
+    def modify(self, entry: TableEntry):
+        self.ops.append((WriteOp.MOD, entry))
+
+    def delete(self, entry: TableEntry):
+        self.ops.append((WriteOp.DEL, entry))
+
+    def commit(self) -> List[TableWriteError]:
+        ops, self.ops = self.ops, []
+        return self.switch.apply_with_compensation(ops)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Nothing has been written before commit, an exception just drops the collected writes
+        if exc_type is None:
+            self.commit()
+        else:
+            self.ops = []
+
 
 class SwitchController:
-    def __init__(self, p4_name: str, host: str):
-        self.connect(p4_name, host)
+    def __init__(self, p4_name: str, host: str, backend=None):
+        self.bfrt_caches: Dict[str, BfrtCache] = {}
+        self.shadow = TableShadow()
+        self.suppress_noop_writes = True
+        self.pending_digests: Dict[int, Deque] = {}
+        self.digest_lock = threading.Lock()
+
+        # A backend stands in for the gRPC and Thrift clients, e.g. bench.fake_switch.FakeSwitchBackend
+        if backend is not None:
+            backend.client_interface.bind_pipeline_config(p4_name)
+            self.transport = None
+            self.attach(p4_name, backend.client_interface, backend.pal, backend.conn_mgr, backend.mc)
+        else:
+            self.connect(p4_name, host)
         
     def connect(self, p4_name: str, host: str):
         # print ("setting up gRPC client interface...")
@@ -42,9 +123,16 @@ class SwitchController:
         self.transport.open()
         bprotocol = TBinaryProtocol.TBinaryProtocol(self.transport)
 
-        self.pal = pal_i.Client(TMultiplexedProtocol.TMultiplexedProtocol(bprotocol, "pal"))
-        self.conn_mgr = conn_mgr_client_module.Client(TMultiplexedProtocol.TMultiplexedProtocol(bprotocol, "conn_mgr"))
-        self.mc = mc_client_module.Client(TMultiplexedProtocol.TMultiplexedProtocol(bprotocol, "mc"))
+        self.attach(p4_name, client_interface,
+            pal_i.Client(TMultiplexedProtocol.TMultiplexedProtocol(bprotocol, "pal")),
+            conn_mgr_client_module.Client(TMultiplexedProtocol.TMultiplexedProtocol(bprotocol, "conn_mgr")),
+            mc_client_module.Client(TMultiplexedProtocol.TMultiplexedProtocol(bprotocol, "mc"))
+        )
+
+    def attach(self, p4_name: str, client_interface: ClientInterface, pal, conn_mgr, mc):
+        self.pal = pal
+        self.conn_mgr = conn_mgr
+        self.mc = mc
 
         self.sess_hdl = self.conn_mgr.client_init()
         self.mc_sess_hdl = self.mc.mc_create_session()  
@@ -53,72 +141,443 @@ class SwitchController:
         self.p4_name = p4_name
         self.client_interface = client_interface
 
+        # A new ClientInterface means every cached handle belongs to a dead session
+        self.bfrt_caches = {}
+
+    def bind_pipeline_config(self, p4_name: str):
+        self.client_interface.bind_pipeline_config(p4_name)
+        self.p4_name = p4_name
+        self.invalidate_cache(p4_name)
+        # Binding a program resets the pipeline, nothing written before survives it
+        self.shadow.clear()
+
+    def invalidate_cache(self, p4_name: str = None):
+        for name, bfrt_cache in self.bfrt_caches.items():
+            if p4_name is None or name == p4_name:
+                bfrt_cache.invalidate()
+
+    @property
+    def bfrt_cache(self) -> BfrtCache:
+        bfrt_cache = self.bfrt_caches.get(self.p4_name)
+
+        if bfrt_cache is None:
+            bfrt_cache = BfrtCache(self.client_interface, self.p4_name)
+            self.bfrt_caches[self.p4_name] = bfrt_cache
+        return bfrt_cache
+
+    def get_cache_stats(self) -> List[dict]:
+        return [bfrt_cache.get_stats() for bfrt_cache in self.bfrt_caches.values()]
 
     def add_port(self, dev_port: int, speed: Speed, fec: Fec) -> None:
         # print(f"[PORT_ADD] Device Port {dev_port} / Speed {speed.name} / Fec {fec.name}")
-        self.pal.pal_port_add(device=0, dev_port=dev_port, ps=speed.value, fec=fec.value)
+        self._thrift_call("pal_port_add", self.pal.pal_port_add, device=0, dev_port=dev_port, ps=speed.value, fec=fec.value)
 
     def enb_port(self, dev_port: int) -> None:
         # print(f"[PORT_ENB] Device Port {dev_port}")
-        self.pal.pal_port_enable(device=0, dev_port=dev_port)
+        self._thrift_call("pal_port_enable", self.pal.pal_port_enable, device=0, dev_port=dev_port)
 
     def dis_port(self, dev_port: int) -> None:
         # print(f"[PORT_DIS] Device Port {dev_port}")
-        self.pal.pal_port_dis(device=0, dev_port=dev_port)
+        self._thrift_call("pal_port_dis", self.pal.pal_port_dis, device=0, dev_port=dev_port)
 
     def del_port(self, dev_port: int) -> None:
         # print(f"[PORT_DEL] Device Port {dev_port}")
-        self.pal.pal_port_del(device=0, dev_port=dev_port)
+        self._thrift_call("pal_port_del", self.pal.pal_port_del, device=0, dev_port=dev_port)
+
+    def _thrift_call(self, op: str, fn, **kwargs):
+        try:
+            return fn(**kwargs)
+        except Exception:
+            SWITCH_RPC_ERRORS.labels("thrift", op).inc()
+            raise
+
+    def _write_rpc(self, op: WriteOp, table_name: str, table, target, key_list: list, data_list: list = None):
+        try:
+            with SWITCH_TABLE_WRITE_SECONDS.labels(table_name, op.name).time():
+                if op == WriteOp.ADD:
+                    table.entry_add(target, key_list, data_list)
+                elif op == WriteOp.MOD:
+                    table.entry_mod(target, key_list, data_list)
+                else:
+                    table.entry_del(target, key_list)
+        except Exception:
+            SWITCH_RPC_ERRORS.labels("grpc", op.name).inc()
+            raise
+
+        SWITCH_TABLE_WRITES.labels(table_name, op.name).inc(len(key_list))
 
     def get_tables(self) -> list:
-        bfrt_info = self.client_interface.bfrt_info_get(self.p4_name)
+        bfrt_info = self.bfrt_cache.get_bfrt_info()
         return list(bfrt_info.table_dict.keys()); 
     
-    def add_table_record(self, table_name: str, key_names: list, key_vals: list, data_vals: List[Data], action_name: str = None):
-        print(f"[TABLE_ADD] Table Name {table_name} / Key Name {key_names} / Key Value {key_vals} / Action Name {action_name} / Data {data_vals}")
-        bfrt_info = self.client_interface.bfrt_info_get(self.p4_name)
-        target = Target(device_id=0, pipe_id=0xffff)
-        table = bfrt_info.table_get(table_name) 
-        key_list = [table.make_key([KeyTuple(key_name, key_val)]) for (key_name, key_val) in zip(key_names, key_vals)]
+    def _make_key(self, table, key_names: list, key_vals: list):
+        return table.make_key([KeyTuple(key_name, key_val) for (key_name, key_val) in zip(key_names, key_vals)])
+
+    def _make_data(self, table, data_vals: List[Data], action_name: str = None):
         bfrt_data_vals = [data_val.to_bfrt_data() for data_val in data_vals]
 
         if action_name is not None:
-            data_list = [table.make_data(bfrt_data_vals, action_name)]
+            return table.make_data(bfrt_data_vals, action_name)
+        else:
+            return table.make_data(bfrt_data_vals)
+
+    def _is_noop_write(self, op: WriteOp, entry: TableEntry) -> bool:
+        if not self.suppress_noop_writes:
+            return False
+
+        if op == WriteOp.DEL:
+            noop = False
         else:
-            data_list = [table.make_data(bfrt_data_vals)]
+            noop = self.shadow.is_same(entry)
+
+        if noop:
+            self.shadow.count_suppressed()
+            SWITCH_SUPPRESSED_WRITES.labels(entry.table_name).inc()
+        return noop
+
+    def _record_write(self, op: WriteOp, entry: TableEntry):
+        if op == WriteOp.ADD:
+            self.shadow.record_add(entry)
+        elif op == WriteOp.MOD:
+            self.shadow.record_mod(entry)
+        else:
+            self.shadow.record_del(entry)
+
+    def add_table_record(self, table_name: str, key_names: list, key_vals: list, data_vals: List[Data], action_name: str = None):
+        entry = TableEntry(table_name, key_names, key_vals, data_vals, action_name)
+        if self._is_noop_write(WriteOp.ADD, entry):
+            return
+
+        log_event(log, logging.DEBUG, "table_add", table=table_name, key_names=key_names, key_vals=key_vals, action=action_name, data=data_vals)
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(table_name)
+        key_list = [self._make_key(table, key_names, key_vals)]
+        data_list = [self._make_data(table, data_vals, action_name)]
         
-        table.entry_add(target, key_list, data_list)
+        self._write_rpc(WriteOp.ADD, table_name, table, target, key_list, data_list)
+        self._record_write(WriteOp.ADD, entry)
             
 
     def modify_table_record(self, table_name: str, key_names: list, key_vals: list, data_vals: List[Data], action_name: str = None):
-        print(f"[TABLE_MOD] Table Name {table_name} / Key Name {key_names} / Key Value {key_vals} / Action Name {action_name} / Data {data_vals}")
-        bfrt_info = self.client_interface.bfrt_info_get(self.p4_name)
-        target = Target(device_id=0, pipe_id=0xffff)
-        table = bfrt_info.table_get(table_name)
-        key_list = [table.make_key([KeyTuple(key_name, key_val)]) for (key_name, key_val) in zip(key_names, key_vals)]
-        bfrt_data_vals = [data_val.to_bfrt_data() for data_val in data_vals]
+        entry = TableEntry(table_name, key_names, key_vals, data_vals, action_name)
+        if self._is_noop_write(WriteOp.MOD, entry):
+            return
 
-        if action_name is not None:
-            data_list = [table.make_data(bfrt_data_vals, action_name)]
-        else:
-            data_list = [table.make_data(bfrt_data_vals)]
+        log_event(log, logging.DEBUG, "table_mod", table=table_name, key_names=key_names, key_vals=key_vals, action=action_name, data=data_vals)
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(table_name)
+        key_list = [self._make_key(table, key_names, key_vals)]
+        data_list = [self._make_data(table, data_vals, action_name)]
         
-        table.entry_mod(target, key_list, data_list)
+        self._write_rpc(WriteOp.MOD, table_name, table, target, key_list, data_list)
+        self._record_write(WriteOp.MOD, entry)
+
+    def delete_table_record(self, table_name: str, key_names: list, key_vals: list):
+        log_event(log, logging.DEBUG, "table_del", table=table_name, key_names=key_names, key_vals=key_vals)
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(table_name)
+        key_list = [self._make_key(table, key_names, key_vals)]
+
+        self._write_rpc(WriteOp.DEL, table_name, table, target, key_list)
+        self.shadow.discard(table_name, key_vals)
+
+    def add_table_records(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        return self.write_table_records(WriteOp.ADD, entries, batch_size)
+
+    def modify_table_records(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        return self.write_table_records(WriteOp.MOD, entries, batch_size)
+
+    def delete_table_records(self, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        return self.write_table_records(WriteOp.DEL, entries, batch_size)
+
+    def write_table_records(self, op: WriteOp, entries: List[TableEntry], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableWriteError]:
+        target = self.bfrt_cache.get_target()
+        errors: List[TableWriteError] = []
+        entries = [entry for entry in entries if not self._is_noop_write(op, entry)]
+
+        # Consecutive entries of the same table share one request per batch_size entries
+        for table_name, table_entries in groupby(entries, key=lambda entry: entry.table_name):
+            table_entries = list(table_entries)
+            table = self.bfrt_cache.get_table(table_name)
+            log_event(log, logging.DEBUG, "table_batch", op=op.name, table=table_name, entries=len(table_entries))
+
+            for start in range(0, len(table_entries), batch_size):
+                batch = table_entries[start:start + batch_size]
+                key_list = [self._make_key(table, entry.key_names, entry.key_vals) for entry in batch]
+                batch_errors: List[TableWriteError] = []
+
+                try:
+                    if op == WriteOp.DEL:
+                        self._write_rpc(op, table_name, table, target, key_list)
+                    else:
+                        data_list = [self._make_data(table, entry.data_vals, entry.action_name) for entry in batch]
+                        self._write_rpc(op, table_name, table, target, key_list, data_list)
+                except BfruntimeReadWriteRpcException as e:
+                    batch_errors = self._batch_errors(op, batch, e)
+
+                failed = set(id(error.entry) for error in batch_errors)
+                for entry in batch:
+                    if id(entry) not in failed:
+                        self._record_write(op, entry)
+                errors.extend(batch_errors)
+
+        return errors
+
+    def transaction(self) -> SwitchTransaction:
+        return SwitchTransaction(self)
+
+    def apply_with_compensation(self, ops: List[Tuple[WriteOp, TableEntry]]) -> List[TableWriteError]:
+        # Consecutive writes of the same table and op go out as one request. If any entry fails,
+        # what was applied is put back from the pre-images and the errors are returned.
+        # This is not atomic on the device: every request lands as soon as it is sent, so the data
+        # plane runs on the partial state until the failure and again until the compensating writes
+        # are done, and a compensating write that fails itself leaves the partial state in place.
+        ops = [(op, entry) for (op, entry) in ops if not self._is_noop_write(op, entry)]
+        if len(ops) == 0:
+            return []
+
+        before = self._pre_images(ops)
+        target = self.bfrt_cache.get_target()
+        applied: List[Tuple[WriteOp, TableEntry]] = []
+        errors: List[TableWriteError] = []
+
+        for (table_name, op), group in groupby(ops, key=lambda item: (item[1].table_name, item[0])):
+            group_entries = [entry for (_, entry) in group]
+            table = self.bfrt_cache.get_table(table_name)
+            key_list = [self._make_key(table, entry.key_names, entry.key_vals) for entry in group_entries]
+
+            try:
+                if op == WriteOp.DEL:
+                    self._write_rpc(op, table_name, table, target, key_list)
+                else:
+                    data_list = [self._make_data(table, entry.data_vals, entry.action_name) for entry in group_entries]
+                    self._write_rpc(op, table_name, table, target, key_list, data_list)
+            except BfruntimeReadWriteRpcException as e:
+                errors = self._batch_errors(op, group_entries, e)
+
+            failed = set(id(error.entry) for error in errors)
+            for entry in group_entries:
+                if id(entry) not in failed:
+                    self._record_write(op, entry)
+                    applied.append((op, entry))
+
+            if len(errors) > 0:
+                break
+
+        if len(errors) == 0:
+            SWITCH_TRANSACTIONS.labels("committed").inc()
+            log_event(log, logging.DEBUG, "transaction_committed", writes=len(applied))
+            return []
+
+        self._rollback(applied, before)
+        SWITCH_TRANSACTIONS.labels("rolled_back").inc()
+        log_event(log, logging.WARNING, "transaction_rolled_back", writes=len(ops), applied=len(applied), errors=len(errors), first_error=errors[0].message)
+        return errors
+
+    def _pre_images(self, ops: List[Tuple[WriteOp, TableEntry]]) -> Dict[Tuple[str, tuple], TableEntry]:
+        before: Dict[Tuple[str, tuple], TableEntry] = {}
+        unknown: Dict[str, List[TableEntry]] = {}
+
+        for op, entry in ops:
+            key = (entry.table_name, tuple(entry.key_vals))
+            if key in before:
+                continue
+
+            shadow_entry = self.shadow.get(entry.table_name, entry.key_vals)
+            if shadow_entry is not None:
+                # Copied, the shadow updates its entries in place as the writes land
+                before[key] = TableEntry(shadow_entry.table_name, list(shadow_entry.key_names), list(shadow_entry.key_vals), list(shadow_entry.data_vals), shadow_entry.action_name)
+            elif op != WriteOp.ADD:
+                unknown.setdefault(entry.table_name, []).append(entry)
+
+        # Only keys the shadow has never seen cost a read, one per table
+        for table_name, entries in unknown.items():
+            actual = TableShadow()
+            for entry in self.read_table_entries(table_name, entries[0].key_names):
+                actual.record_add(entry)
+
+            for entry in entries:
+                actual_entry = actual.get(table_name, entry.key_vals)
+                if actual_entry is not None:
+                    before[(table_name, tuple(entry.key_vals))] = actual_entry
+
+        return before
+
+    def _rollback(self, applied: List[Tuple[WriteOp, TableEntry]], before: Dict[Tuple[str, tuple], TableEntry]):
+        undo: List[Tuple[WriteOp, TableEntry]] = []
+
+        for op, entry in reversed(applied):
+            previous = before.get((entry.table_name, tuple(entry.key_vals)))
+
+            if op == WriteOp.ADD and previous is None:
+                undo.append((WriteOp.DEL, entry))
+            elif op == WriteOp.DEL and previous is not None:
+                undo.append((WriteOp.ADD, previous))
+            elif previous is not None:
+                undo.append((WriteOp.MOD, previous))
+            else:
+                # No pre-image to go back to, make sure the next write is not suppressed
+                self.shadow.discard(entry.table_name, entry.key_vals)
+
+        for (_, op), group in groupby(undo, key=lambda item: (item[1].table_name, item[0])):
+            group_entries = [entry for (_, entry) in group]
+
+            for error in self.write_table_records(op, group_entries, len(group_entries)):
+                log_event(log, logging.ERROR, "rollback_failed", op=error.op.name, table=error.entry.table_name, key_vals=error.entry.key_vals, error=error.message)
+                self.shadow.discard(error.entry.table_name, error.entry.key_vals)
+
+    def read_table_entries(self, table_name: str, key_names: list = None, from_hw: bool = False) -> List[TableEntry]:
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(table_name)
+        entries: List[TableEntry] = []
+
+        for data, key in table.entry_get(target, None, {"from_hw": from_hw}):
+            key_dict: dict = key.to_dict()
+            data_dict: dict = data.to_dict()
+            action_name = data_dict.pop("action_name", None)
+            data_dict.pop("is_default_entry", None)
+
+            # Line the keys up with the field order the caller writes them with
+            entry_key_names = key_names if key_names is not None else list(key_dict.keys())
+
+            entries.append(TableEntry(
+                table_name=table_name,
+                key_names=list(entry_key_names),
+                key_vals=[key_dict[key_name]["value"] for key_name in entry_key_names],
+                data_vals=[Data.from_value(data_key, data_val) for (data_key, data_val) in data_dict.items()],
+                action_name=action_name.split(".")[-1] if action_name is not None else None
+            ))
+
+        return entries
+
+    def verify_shadow(self, table_names: List[str] = None) -> List[TableEntry]:
+        drifted: List[TableEntry] = []
+
+        for table_name in table_names if table_names is not None else self.shadow.get_table_names():
+            shadow_entries = self.shadow.get_table_entries(table_name)
+            if len(shadow_entries) == 0:
+                continue
+
+            actual_shadow = TableShadow()
+            for entry in self.read_table_entries(table_name, shadow_entries[0].key_names):
+                actual_shadow.record_add(entry)
+
+            for shadow_entry in shadow_entries:
+                actual_entry = actual_shadow.get(table_name, shadow_entry.key_vals)
+                # Drop what no longer matches so the next write to it goes through
+                if actual_entry is None or not actual_shadow.is_same(shadow_entry):
+                    log_event(log, logging.WARNING, "shadow_drift", table=table_name, key_vals=shadow_entry.key_vals)
+                    self.shadow.discard(table_name, shadow_entry.key_vals)
+                    drifted.append(shadow_entry)
+
+        return drifted
+
+    def _batch_errors(self, op: WriteOp, batch: List[TableEntry], e: BfruntimeReadWriteRpcException) -> List[TableWriteError]:
+        sub_errors = getattr(e, "sub_errors", [])
+
+        if len(sub_errors) == 0:
+            return [TableWriteError(op, entry, str(e)) for entry in batch]
+
+        return [TableWriteError(op, batch[index], p4_error.message) for (index, p4_error) in sub_errors if index < len(batch)]
     
     def get_register_val(self, register_name: str, key_names: list, key_vals: list):
-        bfrt_info = self.client_interface.bfrt_info_get(self.p4_name)
-        target = Target(device_id=0, pipe_id=0xffff)
-        table = bfrt_info.table_get(register_name)
-        key_list = [table.make_key([KeyTuple(key_name, key_val)]) for (key_name, key_val) in zip(key_names, key_vals)]
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(register_name)
+        key_list = [self._make_key(table, key_names, key_vals)]
 
-        raw_response_tuple: List = list(table.entry_get(target, key_list))[0]
+        with SWITCH_REGISTER_READ_SECONDS.labels(register_name, "get").time():
+            raw_response_tuple: List = list(table.entry_get(target, key_list))[0]
         raw_data_list: _Data = raw_response_tuple[0]
         data_dict: dict = raw_data_list.to_dict()
 
-        specific_key: str = ""
+        return data_dict[self.bfrt_cache.get_register_field_name(register_name)][0]
+
+    def sync_table(self, table_name: str, operation: str = "Sync"):
+        table = self.bfrt_cache.get_table(table_name)
+        table.operations_execute(self.bfrt_cache.get_target(), operation)
+
+    def get_register_range(self, register_name: str, start: int, end: int, from_hw: bool = True, typecode: str = "I", batch_size: int = DEFAULT_BATCH_SIZE) -> array:
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(register_name)
+        field_name = self.bfrt_cache.get_register_field_name(register_name)
+
+        values = array(typecode, [0]) * (end - start)
+
+        with SWITCH_REGISTER_READ_SECONDS.labels(register_name, "range").time():
+            # One hardware sync, then the whole range is served from the synced software copy
+            if from_hw:
+                self.sync_table(register_name)
+
+            for batch_start in range(start, end, batch_size):
+                key_list = [self._make_key(table, ["$REGISTER_INDEX"], [index]) for index in range(batch_start, min(end, batch_start + batch_size))]
+
+                for data, key in table.entry_get(target, key_list, {"from_hw": False}):
+                    index = key.to_dict()["$REGISTER_INDEX"]["value"]
+                    values[index - start] = data.to_dict()[field_name][0]
+
+        return values
+
+    def dump_register(self, register_name: str, from_hw: bool = True, typecode: str = "I") -> array:
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(register_name)
+        field_name = self.bfrt_cache.get_register_field_name(register_name)
+
+        values = array(typecode, [0]) * self.bfrt_cache.get_table_size(register_name)
+
+        with SWITCH_REGISTER_READ_SECONDS.labels(register_name, "dump").time():
+            if from_hw:
+                self.sync_table(register_name)
+
+            for data, key in table.entry_get(target, None, {"from_hw": False}):
+                index = key.to_dict()["$REGISTER_INDEX"]["value"]
+                values[index] = data.to_dict()[field_name][0]
+
+        return values
+
+    def dump_counter(self, counter_name: str, from_hw: bool = True) -> Tuple[array, array]:
+        target = self.bfrt_cache.get_target()
+        table = self.bfrt_cache.get_table(counter_name)
+
+        size = self.bfrt_cache.get_table_size(counter_name)
+        byte_counts = array("Q", [0]) * size
+        packet_counts = array("Q", [0]) * size
+
+        with SWITCH_REGISTER_READ_SECONDS.labels(counter_name, "dump").time():
+            if from_hw:
+                self.sync_table(counter_name, "SyncCounters")
+
+            for data, key in table.entry_get(target, None, {"from_hw": False}):
+                index = key.to_dict()["$COUNTER_INDEX"]["value"]
+                data_dict = data.to_dict()
+                byte_counts[index] = data_dict["$COUNTER_SPEC_BYTES"]
+                packet_counts[index] = data_dict["$COUNTER_SPEC_PKTS"]
+
+        return byte_counts, packet_counts
+
+    def get_digest(self, learn_name: str, timeout: float = 1) -> List[dict]:
+        # The digest stream is shared by every learn of the program; one that belongs to another
+        # learn is parked for the caller asking for that learn instead of being decoded as this one
+        learn = self.bfrt_cache.get_learn(learn_name)
+        learn_id = learn.info.id_get()
+
+        with self.digest_lock:
+            pending = self.pending_digests.get(learn_id)
+            digest = pending.popleft() if pending else None
+
+        deadline = time.monotonic() + timeout
+        while digest is None:
+            try:
+                received = self.client_interface.digest_get(timeout=max(0.0, deadline - time.monotonic()))
+            except RuntimeError as e:
+                # How bfrt_grpc reports that nothing arrived within timeout
+                if str(e) == DIGEST_TIMEOUT_MESSAGE:
+                    return []
+                raise
 
-        for key in data_dict.keys():
-            if "f1" in key:
-                specific_key = key
+            if received.digest_id == learn_id:
+                digest = received
+            else:
+                with self.digest_lock:
+                    self.pending_digests.setdefault(received.digest_id, deque(maxlen=MAX_PENDING_DIGESTS)).append(received)
 
-        return data_dict[specific_key][0]
\ No newline at end of file
+        return [data.to_dict() for data in learn.make_data_list(digest)]
\ No newline at end of file
@@ -0,0 +1,102 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from bfrt_grpc.client import logging
+
+from core.switch_controller import SwitchController, TableWriteError, WriteOp
+from model.table_entry import TableEntry
+from utils.log import get_logger, log_event
+
+log = get_logger("switch_orchestrator")
+
+@dataclass
+class SwitchTaskResult:
+    name: str
+    ok: bool
+    duration: float
+    value: Any = None
+    error: Exception = None
+
+
+class SwitchOrchestrator:
+    def __init__(self, max_workers: int = 8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="switch")
+        self.switches: Dict[str, SwitchController] = {}
+        self.failed: Dict[str, Exception] = {}
+
+    def get_switch(self, name: str) -> SwitchController:
+        # None for a switch that failed to connect or initialize, see get_failure()
+        return self.switches.get(name)
+
+    def get_failure(self, name: str) -> Exception:
+        return self.failed.get(name)
+
+    def get_switch_names(self) -> List[str]:
+        return list(self.switches.keys())
+
+    def _timed(self, name: str, stage: str, fn: Callable[[], Any]) -> SwitchTaskResult:
+        log_event(log, logging.INFO, "switch_stage_started", stage=stage, switch=name)
+        start = time.perf_counter()
+
+        try:
+            value = fn()
+        except Exception as e:
+            duration = time.perf_counter() - start
+            log_event(log, logging.ERROR, "switch_stage_failed", stage=stage, switch=name, seconds=round(duration, 3), error=e)
+            return SwitchTaskResult(name, False, duration, error=e)
+
+        duration = time.perf_counter() - start
+        log_event(log, logging.INFO, "switch_stage_finished", stage=stage, switch=name, seconds=round(duration, 3))
+        return SwitchTaskResult(name, True, duration, value=value)
+
+    def _run_all(self, stage: str, tasks: Dict[str, Callable[[], Any]], evict: bool = False) -> Dict[str, SwitchTaskResult]:
+        futures = dict((name, self.executor.submit(self._timed, name, stage, task)) for (name, task) in tasks.items())
+        results = dict((name, future.result()) for (name, future) in futures.items())
+
+        # One switch that cannot be brought up must not take the rest of the rack down with it. Once it
+        # is up a failed task is the caller's to handle, the switch itself stays.
+        for name, result in results.items():
+            if evict and not result.ok:
+                self.failed[name] = result.error
+                self.switches.pop(name, None)
+
+        return results
+
+    def connect(self, hosts: Dict[str, Tuple[str, str]], backends: Dict[str, Any] = None) -> Dict[str, SwitchTaskResult]:
+        backends = backends if backends is not None else {}
+        results = self._run_all("CONNECT", dict(
+            (name, lambda p4_name=p4_name, host=host, backend=backends.get(name): SwitchController(p4_name, host, backend)) for (name, (p4_name, host)) in hosts.items()
+        ), evict=True)
+
+        for name, result in results.items():
+            if result.ok:
+                self.switches[name] = result.value
+        return results
+
+    def initialize(self, init_fns: Dict[str, Callable[[SwitchController], Any]]) -> Dict[str, SwitchTaskResult]:
+        return self._run_all("INIT", dict(
+            (name, lambda switch=self.switches[name], init_fn=init_fn: init_fn(switch)) for (name, init_fn) in init_fns.items() if name in self.switches
+        ), evict=True)
+
+    def run(self, fn: Callable[[str, SwitchController], Any], names: List[str] = None) -> Dict[str, SwitchTaskResult]:
+        names = names if names is not None else self.get_switch_names()
+        return self._run_all("RUN", dict(
+            (name, lambda name=name, switch=self.switches[name]: fn(name, switch)) for name in names if name in self.switches
+        ))
+
+    def modify_table_records(self, entries_by_switch: Dict[str, List[TableEntry]]) -> Dict[str, List[TableWriteError]]:
+        results = self.run(lambda name, switch: switch.modify_table_records(entries_by_switch[name]), list(entries_by_switch.keys()))
+
+        # A switch whose write raised gets every entry back as failed rather than no entry at all
+        errors: Dict[str, List[TableWriteError]] = {}
+        for name, result in results.items():
+            if result.ok:
+                errors[name] = result.value
+            else:
+                errors[name] = [TableWriteError(WriteOp.MOD, entry, str(result.error)) for entry in entries_by_switch[name]]
+        return errors
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,232 @@
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Dict, List
+
+from bfrt_grpc.client import BfruntimeRpcException, logging
+
+from core.switch_controller import DEFAULT_BATCH_SIZE, Fec, Speed, SwitchController, TableWriteError
+from core.table_shadow import TableShadow
+from model.data import Data
+from model.port_info import PortInfo
+from model.switch_config import SwitchConfig
+from model.table_entry import TableEntry
+from utils.hex_converter import ip_to_hex, mac_to_hex
+from utils.log import get_logger, log_event
+
+log = get_logger("switch_reconciler")
+
+PKTGEN_HEADER_SIZE = 6
+PORT_SPEED = Speed.SPEED_10G
+PORT_FEC = Fec.FEC_NONE
+
+@dataclass
+class SwitchPlan:
+    ports: List[PortInfo] = field(default_factory=list)
+    entries: List[TableEntry] = field(default_factory=list)
+
+@dataclass
+class ReconcileResult:
+    ports_added: List[int] = field(default_factory=list)
+    ports_modified: List[int] = field(default_factory=list)
+    added: List[TableEntry] = field(default_factory=list)
+    modified: List[TableEntry] = field(default_factory=list)
+    deleted: List[TableEntry] = field(default_factory=list)
+    unchanged: int = 0
+    errors: List[TableWriteError] = field(default_factory=list)
+
+
+def compile_plan(config: SwitchConfig) -> SwitchPlan:
+    plan = SwitchPlan(ports=list(config.port_infos) + list(config.recirculation_ports))
+
+    for port_info in config.port_infos:
+        plan.entries.append(TableEntry(
+            table_name="forward_table",
+            key_names=["hdr.ethernet.dstAddr"],
+            key_vals=[mac_to_hex(port_info.mac_address)],
+            action_name="forward",
+            data_vals=[Data("port", port_info.dev_port)]
+        ))
+
+    for port_info in config.port_infos:
+        plan.entries.append(TableEntry(
+            table_name="arp_forward_table",
+            key_names=["hdr.arp.tpa"],
+            key_vals=[ip_to_hex(port_info.ip_address)],
+            action_name="arp_request_forward",
+            data_vals=[Data("port", port_info.dev_port)]
+        ))
+
+    plan.entries.extend(config.entries)
+
+    for node in config.pre_nodes:
+        plan.entries.append(TableEntry(
+            table_name="$pre.node",
+            key_names=["$MULTICAST_NODE_ID"],
+            key_vals=[node.node_id],
+            data_vals=[
+                Data("$MULTICAST_RID", node.rid),
+                Data("$MULTICAST_LAG_ID", int_arr_val=node.lag_ids),
+                Data("$DEV_PORT", int_arr_val=node.dev_ports)
+            ]
+        ))
+
+    for mgid in config.pre_mgids:
+        plan.entries.append(TableEntry(
+            table_name="$pre.mgid",
+            key_names=["$MGID"],
+            key_vals=[mgid.mgid],
+            data_vals=[
+                Data("$MULTICAST_NODE_ID", int_arr_val=mgid.node_ids),
+                Data("$MULTICAST_NODE_L1_XID_VALID", bool_arr_val=mgid.l1_xid_valid if mgid.l1_xid_valid is not None else [False] * len(mgid.node_ids)),
+                Data("$MULTICAST_NODE_L1_XID", int_arr_val=mgid.l1_xid if mgid.l1_xid is not None else [0] * len(mgid.node_ids))
+            ]
+        ))
+
+    plan.entries.extend(_compile_pktgen(config))
+    return plan
+
+
+def _compile_pktgen(config: SwitchConfig) -> List[TableEntry]:
+    timer_entries: List[TableEntry] = []
+    app_entries: List[TableEntry] = []
+    buffer_entries: Dict[tuple, TableEntry] = {}
+    port_entries: Dict[int, TableEntry] = {}
+
+    for app in config.pktgen_apps:
+        # The first 6 bytes of the packet are replaced by the pktgen header
+        pkt_len = len(app.packet) - PKTGEN_HEADER_SIZE
+
+        timer_entries.append(TableEntry("t",
+            key_names=["hdr.timer.pipe_id", "hdr.timer.app_id", "ig_intr_md.ingress_port"],
+            key_vals=[0, app.app_id, app.pipe_local_source_port],
+            action_name="match",
+            data_vals=[Data("port", app.output_port)]
+        ))
+        # batch_counter, pkt_counter and trigger_counter count on the switch, they are not configuration
+        app_entries.append(TableEntry("tf1.pktgen.app_cfg",
+            key_names=["app_id"],
+            key_vals=[app.app_id],
+            action_name="trigger_timer_periodic",
+            data_vals=[
+                Data('timer_nanosec', app.timer_nanosec),
+                Data('app_enable', bool_val=app.enable),
+                Data('pkt_len', pkt_len),
+                Data('pkt_buffer_offset', app.buffer_offset),
+                Data('pipe_local_source_port', app.pipe_local_source_port),
+                Data('increment_source_port', bool_val=False),
+                Data('batch_count_cfg', 0),
+                Data('packets_per_batch_cfg', 0),
+                Data('ibg', 0),
+                Data('ibg_jitter', 0),
+                Data('ipg', 0),
+                Data('ipg_jitter', 0)
+            ]
+        ))
+        buffer_entries[(app.buffer_offset, pkt_len)] = TableEntry("tf1.pktgen.pkt_buffer",
+            key_names=["pkt_buffer_offset", "pkt_buffer_size"],
+            key_vals=[app.buffer_offset, pkt_len],
+            data_vals=[Data("buffer", bytearray(app.packet[PKTGEN_HEADER_SIZE:]))]
+        )
+        port_entries[app.pipe_local_source_port] = TableEntry("tf1.pktgen.port_cfg",
+            key_names=["dev_port"],
+            key_vals=[app.pipe_local_source_port],
+            data_vals=[Data("pktgen_enable", bool_val=False)]
+        )
+
+    return timer_entries + app_entries + list(buffer_entries.values()) + list(port_entries.values())
+
+
+def _reconcile_ports(switch: SwitchController, plan: SwitchPlan, result: ReconcileResult):
+    if len(plan.ports) == 0:
+        return
+
+    existing_ports: Dict[int, dict] = {}
+
+    try:
+        for entry in switch.read_table_entries("$PORT", ["$DEV_PORT"]):
+            existing_ports[entry.key_vals[0]] = dict(data_val.signature() for data_val in entry.data_vals)
+    except BfruntimeRpcException as e:
+        log_event(log, logging.WARNING, "reconcile_read_failed", table="$PORT", fallback="add_all", error=e)
+
+    for port_info in plan.ports:
+        actual = existing_ports.get(port_info.dev_port)
+
+        if actual is None:
+            switch.add_port(port_info.dev_port, PORT_SPEED, PORT_FEC)
+            switch.enb_port(port_info.dev_port)
+            result.ports_added.append(port_info.dev_port)
+        elif actual.get("$SPEED") != PORT_SPEED.get_bfrt_name() or actual.get("$FEC") != PORT_FEC.get_bfrt_name():
+            # Speed and FEC are fixed when a port is added
+            log_event(log, logging.WARNING, "port_drift", dev_port=port_info.dev_port, speed=actual.get("$SPEED"), fec=actual.get("$FEC"))
+            switch.del_port(port_info.dev_port)
+            switch.add_port(port_info.dev_port, PORT_SPEED, PORT_FEC)
+            switch.enb_port(port_info.dev_port)
+            result.ports_modified.append(port_info.dev_port)
+        elif actual.get("$PORT_ENABLE") is not True:
+            log_event(log, logging.WARNING, "port_drift", dev_port=port_info.dev_port, enabled=actual.get("$PORT_ENABLE"))
+            switch.enb_port(port_info.dev_port)
+            result.ports_modified.append(port_info.dev_port)
+
+        existing_ports[port_info.dev_port] = {"$SPEED": PORT_SPEED.get_bfrt_name(), "$FEC": PORT_FEC.get_bfrt_name(), "$PORT_ENABLE": True}
+
+
+def reconcile(switch: SwitchController, plan: SwitchPlan, prune: bool = False, batch_size: int = DEFAULT_BATCH_SIZE, actual_entries: Dict[str, List[TableEntry]] = None) -> ReconcileResult:
+    # actual_entries: tables the caller has already read from this switch, not read again
+    actual_entries = actual_entries if actual_entries is not None else {}
+    result = ReconcileResult()
+    _reconcile_ports(switch, plan, result)
+
+    to_add: List[TableEntry] = []
+    to_modify: List[TableEntry] = []
+    to_delete: List[TableEntry] = []
+
+    sorted_entries = sorted(enumerate(plan.entries), key=lambda item: item[1].table_name)
+    for table_name, indexed_entries in groupby(sorted_entries, key=lambda item: item[1].table_name):
+        desired = [entry for (_, entry) in indexed_entries]
+        actual = TableShadow()
+
+        try:
+            entries = actual_entries.get(table_name)
+            if entries is None:
+                entries = switch.read_table_entries(table_name, desired[0].key_names)
+
+            for entry in entries:
+                actual.record_add(entry)
+                # What is already on the switch is what later no-op suppression compares against
+                switch.shadow.record_add(entry)
+        except BfruntimeRpcException as e:
+            log_event(log, logging.WARNING, "reconcile_read_failed", table=table_name, fallback="add_all", error=e)
+            to_add.extend(desired)
+            continue
+
+        desired_keys = set()
+        for entry in desired:
+            desired_keys.add(tuple(entry.key_vals))
+            actual_entry = actual.get(table_name, entry.key_vals)
+
+            if actual_entry is None:
+                to_add.append(entry)
+            elif not actual.is_same(entry):
+                to_modify.append(entry)
+            else:
+                result.unchanged += 1
+
+        if prune:
+            to_delete.extend(entry for entry in actual.get_table_entries(table_name) if tuple(entry.key_vals) not in desired_keys)
+
+    # Keep the plan order for writes, $pre.mgid has to follow the nodes it references
+    order = dict((id(entry), index) for (index, entry) in enumerate(plan.entries))
+    to_add.sort(key=lambda entry: order[id(entry)])
+    to_modify.sort(key=lambda entry: order[id(entry)])
+
+    result.errors.extend(switch.delete_table_records(to_delete, batch_size))
+    result.errors.extend(switch.add_table_records(to_add, batch_size))
+    result.errors.extend(switch.modify_table_records(to_modify, batch_size))
+
+    failed = set(id(error.entry) for error in result.errors)
+    result.added = [entry for entry in to_add if id(entry) not in failed]
+    result.modified = [entry for entry in to_modify if id(entry) not in failed]
+    result.deleted = [entry for entry in to_delete if id(entry) not in failed]
+
+    log_event(log, logging.INFO, "reconciled", ports_added=len(result.ports_added), ports_modified=len(result.ports_modified), added=len(result.added), modified=len(result.modified), deleted=len(result.deleted), unchanged=result.unchanged, errors=len(result.errors))
+    return result
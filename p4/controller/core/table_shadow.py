@@ -0,0 +1,74 @@
+import threading
+from typing import Dict, List, Tuple
+
+from model.table_entry import TableEntry
+
+
+class TableShadow:
+    # Shared by every thread that writes through the same SwitchController, so every access holds the lock
+    def __init__(self):
+        self.entries: Dict[Tuple[str, tuple], TableEntry] = {}
+        self.suppressed = 0
+        self.lock = threading.RLock()
+
+    def _key(self, table_name: str, key_vals: list) -> Tuple[str, tuple]:
+        return (table_name, tuple(key_vals))
+
+    def get(self, table_name: str, key_vals: list) -> TableEntry:
+        with self.lock:
+            return self.entries.get(self._key(table_name, key_vals))
+
+    def get_table_entries(self, table_name: str) -> List[TableEntry]:
+        with self.lock:
+            return [entry for (name, _), entry in self.entries.items() if name == table_name]
+
+    def get_table_names(self) -> List[str]:
+        with self.lock:
+            return list(dict.fromkeys(name for (name, _) in self.entries.keys()))
+
+    def is_same(self, entry: TableEntry) -> bool:
+        with self.lock:
+            shadow_entry = self.entries.get(self._key(entry.table_name, entry.key_vals))
+
+            if shadow_entry is None or shadow_entry.action_name != entry.action_name:
+                return False
+
+            # A modify may carry only some of the fields, so compare just those
+            shadow_data = dict(data_val.signature() for data_val in shadow_entry.data_vals)
+        return all(shadow_data.get(key, object()) == value for (key, value) in (data_val.signature() for data_val in entry.data_vals))
+
+    def count_suppressed(self):
+        with self.lock:
+            self.suppressed += 1
+
+    def record_add(self, entry: TableEntry):
+        copy = TableEntry(entry.table_name, list(entry.key_names), list(entry.key_vals), list(entry.data_vals), entry.action_name)
+        with self.lock:
+            self.entries[self._key(entry.table_name, entry.key_vals)] = copy
+
+    def record_mod(self, entry: TableEntry):
+        with self.lock:
+            shadow_entry = self.entries.get(self._key(entry.table_name, entry.key_vals))
+
+            if shadow_entry is None or shadow_entry.action_name != entry.action_name:
+                self.record_add(entry)
+                return
+
+            data_vals = dict((data_val.key, data_val) for data_val in shadow_entry.data_vals)
+            data_vals.update((data_val.key, data_val) for data_val in entry.data_vals)
+            shadow_entry.data_vals = list(data_vals.values())
+
+    def record_del(self, entry: TableEntry):
+        with self.lock:
+            self.entries.pop(self._key(entry.table_name, entry.key_vals), None)
+
+    def discard(self, table_name: str, key_vals: list):
+        with self.lock:
+            self.entries.pop(self._key(table_name, key_vals), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
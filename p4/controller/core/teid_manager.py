@@ -0,0 +1,170 @@
+from typing import Dict, List
+
+from bfrt_grpc.client import BfruntimeRpcException, logging
+
+from core.switch_controller import SwitchController, SwitchTransaction
+from model.data import Data
+from model.table_entry import TableEntry
+from utils.log import get_logger, log_event
+from utils.teid_space import TEIDSlotMap
+
+log = get_logger("teid_manager")
+
+ROUTE_TABLE = "ue_packet_transmit_table"
+SLOT_TABLE = "teid_slot_table"
+SLOT_ACTION = "set_teid_slot"
+COUNTER_NAME = "ue_teid_counter"
+
+
+class TEIDManager:
+    # Live TEIDs only: each one holds a slot in the compacted slot map, written to the switch as a
+    # teid_slot_table entry so per-TEID registers and counters are indexed by slot. Nothing is
+    # installed for a TEID before it is seen, a TEID is refused once a table would overflow, and
+    # deactivate() gives the slot back when its UE goes away.
+    def __init__(self, switch: SwitchController, route_table: str = ROUTE_TABLE, slot_table: str = SLOT_TABLE, counter_name: str = COUNTER_NAME):
+        self.switch = switch
+        self.route_table = route_table
+        self.slot_table = slot_table
+        self.counter_name = counter_name
+
+        self.slots = TEIDSlotMap(switch.bfrt_cache.get_table_size(counter_name))
+        self.rejected = 0
+
+    def __contains__(self, teid: int) -> bool:
+        return teid in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get_slot(self, teid: int) -> int:
+        return self.slots.get(teid)
+
+    def get_slot_map(self) -> TEIDSlotMap:
+        return self.slots
+
+    def get_capacity(self) -> int:
+        # The smallest of what every live TEID takes one entry in
+        return min(self.slots.size, self.switch.bfrt_cache.get_table_size(self.route_table), self.switch.bfrt_cache.get_table_size(self.slot_table))
+
+    def get_free(self) -> int:
+        return self.get_capacity() - len(self.slots)
+
+    def slot_entry(self, teid: int, slot: int) -> TableEntry:
+        return TableEntry(self.slot_table,
+            key_names=["hdr.gprs.teid"],
+            key_vals=[teid],
+            data_vals=[Data("slot", slot)],
+            action_name=SLOT_ACTION
+        )
+
+    def counter_reset_entry(self, slot: int) -> TableEntry:
+        return TableEntry(self.counter_name,
+            key_names=["$COUNTER_INDEX"],
+            key_vals=[slot],
+            data_vals=[Data("$COUNTER_SPEC_BYTES", 0), Data("$COUNTER_SPEC_PKTS", 0)]
+        )
+
+    def restore(self) -> int:
+        # Slots already on the switch keep their index, so counters carry on across a restart
+        try:
+            entries = self.switch.read_table_entries(self.slot_table, ["hdr.gprs.teid"])
+        except BfruntimeRpcException as e:
+            log_event(log, logging.WARNING, "teid_restore_failed", table=self.slot_table, error=e)
+            return 0
+
+        for entry in entries:
+            teid = entry.key_vals[0]
+            slot = dict(data_val.signature() for data_val in entry.data_vals).get("slot")
+            if slot is None or teid in self.slots:
+                continue
+
+            try:
+                self.slots.assign(teid, slot)
+            except (KeyError, IndexError, ValueError) as e:
+                log_event(log, logging.WARNING, "teid_slot_dropped", teid=teid, slot=slot, error=e)
+                continue
+            self.switch.shadow.record_add(entry)
+
+        log_event(log, logging.INFO, "teid_restored", live=len(self.slots), capacity=self.get_capacity())
+        return len(self.slots)
+
+    def activate(self, teids: List[int]) -> List[int]:
+        # Returns the TEIDs that are live afterwards; new ones are written in one transaction
+        free = self.get_free()
+        activated: List[int] = []
+        new_slots: Dict[int, int] = {}
+        rejected: List[int] = []
+
+        for teid in teids:
+            if teid in self.slots:
+                activated.append(teid)
+            elif free <= 0:
+                rejected.append(teid)
+            else:
+                try:
+                    new_slots[teid] = self.slots.assign(teid)
+                except ValueError as e:
+                    log_event(log, logging.WARNING, "teid_invalid", teid=teid, error=e)
+                    continue
+                free -= 1
+
+        if len(rejected) > 0:
+            self.rejected += len(rejected)
+            log_event(log, logging.WARNING, "teid_capacity_exceeded", rejected=len(rejected), first_teid=rejected[0], live=len(self.slots), capacity=self.get_capacity())
+
+        if len(new_slots) == 0:
+            return activated
+
+        # A reused slot still counts for the TEID that had it before, so it is zeroed first. The reset
+        # stays out of the transaction on purpose: the shadow keeps no counter values, so a rollback
+        # would need a read of the whole counter for pre-images, and there is nothing worth restoring.
+        # A reset whose transaction then fails only zeroes a slot that is free again.
+        self.switch.modify_table_records([self.counter_reset_entry(slot) for slot in new_slots.values()])
+        # Counters change on their own, a remembered zero would suppress the next reset of the slot
+        for slot in new_slots.values():
+            self.switch.shadow.discard(self.counter_name, [slot])
+
+        transaction = self.switch.transaction()
+        for teid, slot in new_slots.items():
+            transaction.add(self.slot_entry(teid, slot))
+
+        errors = transaction.commit()
+        if len(errors) > 0:
+            for teid in new_slots.keys():
+                self.slots.release(teid)
+            log_event(log, logging.WARNING, "teid_activate_failed", teids=len(new_slots), errors=len(errors), first_error=errors[0].message)
+            return activated
+
+        return activated + list(new_slots.keys())
+
+    def queue_deactivate(self, transaction: SwitchTransaction, teids: List[int]) -> List[int]:
+        # The slot and the routes of each TEID; the slots stay taken until release() after the commit
+        queued = [teid for teid in teids if teid in self.slots]
+        queued_set = set(queued)
+
+        for teid in queued:
+            transaction.delete(self.slot_entry(teid, self.slots.get(teid)))
+        for route in self.switch.shadow.get_table_entries(self.route_table):
+            if route.key_vals[0] in queued_set:
+                transaction.delete(route)
+
+        return queued
+
+    def release(self, teids: List[int]):
+        for teid in teids:
+            self.slots.release(teid)
+
+    def deactivate(self, teids: List[int]) -> List[int]:
+        transaction = self.switch.transaction()
+        released = self.queue_deactivate(transaction, teids)
+        if len(released) == 0:
+            return []
+
+        errors = transaction.commit()
+        if len(errors) > 0:
+            log_event(log, logging.WARNING, "teid_deactivate_failed", teids=len(released), errors=len(errors), first_error=errors[0].message)
+            return []
+
+        self.release(released)
+        log_event(log, logging.INFO, "teid_deactivated", teids=len(released), live=len(self.slots))
+        return released
@@ -0,0 +1,138 @@
+from typing import Dict, List
+
+from bfrt_grpc.client import logging
+
+from core.switch_controller import SwitchController, TableWriteError
+from core.switch_reconciler import SwitchPlan, reconcile
+from model.data import Data
+from model.table_entry import TableEntry
+from model.upf import UPF
+from utils.hex_converter import ip_to_hex, mac_to_hex
+from utils.LLF import SelectorPlan
+from utils.log import get_logger, log_event
+
+log = get_logger("upf_selector")
+
+ROUTE_TABLE = "ue_packet_transmit_table"
+ROUTE_KEY_NAMES = ["hdr.gprs.teid", "hdr.ipv4.dstAddr"]
+SELECT_TABLE = "ue_upf_select_table"
+PROFILE_TABLE = "ue_upf_profile"
+SELECTOR_TABLE = "ue_upf_selector"
+TRANSMIT_ACTION = "transmit_ue_packet_to_specific_port"
+
+
+class UPFSelector:
+    # UPFs as action profile members of one selector group hashed on TEID. A weight is the number
+    # of member slots a UPF holds in the group, every UPF has slots members installed up front so
+    # reweighting only rewrites the group. UEs with an exact route entry bypass the group.
+    def __init__(self, switch: SwitchController, upfs: List[UPF], virtual_ip: str, slots: int = 64, group_id: int = 1):
+        self.switch = switch
+        self.upfs = upfs
+        self.virtual_ip = virtual_ip
+        self.slots = slots
+        self.group_id = group_id
+
+        self.upf_index: Dict[str, int] = dict((upf.get_ip_addr(), index) for (index, upf) in enumerate(upfs))
+        self.weights: Dict[str, int] = {}
+        self.overrides: Dict[int, str] = {}
+
+    def get_weights(self) -> Dict[str, int]:
+        return dict(self.weights)
+
+    def get_overrides(self) -> Dict[int, str]:
+        return dict(self.overrides)
+
+    def _member_id(self, upf_ip: str, replica: int) -> int:
+        return self.upf_index[upf_ip] * self.slots + replica + 1
+
+    def _transmit_data(self, upf: UPF) -> List[Data]:
+        return [
+            Data("dstMacAddr", mac_to_hex(upf.get_mac_addr())),
+            Data("dstIPAddr", ip_to_hex(upf.get_ip_addr())),
+            Data("output_port", upf.get_output_port()),
+        ]
+
+    def member_entries(self) -> List[TableEntry]:
+        return [
+            TableEntry(PROFILE_TABLE,
+                key_names=["$ACTION_MEMBER_ID"],
+                key_vals=[self._member_id(upf.get_ip_addr(), replica)],
+                data_vals=self._transmit_data(upf),
+                action_name=TRANSMIT_ACTION
+            )
+            for upf in self.upfs for replica in range(self.slots)
+        ]
+
+    def group_entry(self, weights: Dict[str, int]) -> TableEntry:
+        member_ids = [self._member_id(upf.get_ip_addr(), replica) for upf in self.upfs for replica in range(min(self.slots, weights.get(upf.get_ip_addr(), 0)))]
+
+        return TableEntry(SELECTOR_TABLE,
+            key_names=["$SELECTOR_GROUP_ID"],
+            key_vals=[self.group_id],
+            data_vals=[
+                Data("$MAX_GROUP_SIZE", self.slots * len(self.upfs)),
+                Data("$ACTION_MEMBER_ID", int_arr_val=member_ids),
+                Data("$ACTION_MEMBER_STATUS", bool_arr_val=[True] * len(member_ids)),
+            ]
+        )
+
+    def select_entry(self) -> TableEntry:
+        return TableEntry(SELECT_TABLE,
+            key_names=["hdr.ipv4.dstAddr"],
+            key_vals=[ip_to_hex(self.virtual_ip)],
+            data_vals=[Data("$SELECTOR_GROUP_ID", self.group_id)]
+        )
+
+    def override_entry(self, teid: int, upf_ip: str) -> TableEntry:
+        upf = self.upfs[self.upf_index[upf_ip]]
+
+        return TableEntry(ROUTE_TABLE,
+            key_names=ROUTE_KEY_NAMES,
+            key_vals=[teid, ip_to_hex(self.virtual_ip)],
+            data_vals=self._transmit_data(upf),
+            action_name=TRANSMIT_ACTION
+        )
+
+    def install(self, weights: Dict[str, int], overrides: Dict[int, str] = None):
+        # Members before the group that references them, the group before the entry that points at it
+        if len(weights) == 0 or sum(weights.values()) == 0:
+            weights = dict((upf.get_ip_addr(), 1) for upf in self.upfs)
+
+        reconcile(self.switch, SwitchPlan(entries=self.member_entries()))
+        reconcile(self.switch, SwitchPlan(entries=[self.group_entry(weights)]))
+        reconcile(self.switch, SwitchPlan(entries=[self.select_entry()]))
+
+        self.weights = dict(weights)
+        # Exact routes already on the switch stay until the first apply() decides on them
+        self.overrides = dict(overrides) if overrides is not None else {}
+
+    def apply(self, plan: SelectorPlan) -> List[TableWriteError]:
+        # One transaction: new overrides land before the group moves the rest, stale ones go last
+        transaction = self.switch.transaction()
+
+        for teid, upf_ip in plan.overrides.items():
+            if teid not in self.overrides:
+                transaction.add(self.override_entry(teid, upf_ip))
+        for teid, upf_ip in plan.overrides.items():
+            if teid in self.overrides and self.overrides[teid] != upf_ip:
+                transaction.modify(self.override_entry(teid, upf_ip))
+
+        if plan.weights != self.weights:
+            transaction.modify(self.group_entry(plan.weights))
+
+        for teid, upf_ip in self.overrides.items():
+            if teid not in plan.overrides:
+                transaction.delete(self.override_entry(teid, upf_ip))
+
+        if len(transaction) == 0:
+            return []
+
+        writes = len(transaction)
+        errors = transaction.commit()
+        if len(errors) > 0:
+            return errors
+
+        log_event(log, logging.INFO, "selector_updated", writes=writes, weights=plan.weights, overrides=len(plan.overrides))
+        self.weights = dict(plan.weights)
+        self.overrides = dict(plan.overrides)
+        return []
@@ -0,0 +1,54 @@
+from typing import List, Tuple
+
+from core.switch_controller import DEFAULT_BATCH_SIZE, SwitchController, TableWriteError, WriteOp
+from model.table_entry import TableEntry
+
+
+class WriteBuffer:
+    def __init__(self, switch: SwitchController, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.switch = switch
+        self.batch_size = batch_size
+        self.pending: List[Tuple[WriteOp, TableEntry]] = []
+        self.errors: List[TableWriteError] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, entry: TableEntry):
+        self._push(WriteOp.ADD, entry)
+
+    def modify(self, entry: TableEntry):
+        self._push(WriteOp.MOD, entry)
+
+    def delete(self, entry: TableEntry):
+        self._push(WriteOp.DEL, entry)
+
+    def _push(self, op: WriteOp, entry: TableEntry):
+        self.pending.append((op, entry))
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> List[TableWriteError]:
+        # Keep the submission order: consecutive writes of the same kind go out
+        # together, so an add followed by a mod of the same key still lands in order.
+        errors: List[TableWriteError] = []
+        run_op, run_entries = None, []
+
+        for op, entry in self.pending:
+            if op != run_op and len(run_entries) > 0:
+                errors.extend(self.switch.write_table_records(run_op, run_entries, self.batch_size))
+                run_entries = []
+            run_op = op
+            run_entries.append(entry)
+
+        if len(run_entries) > 0:
+            errors.extend(self.switch.write_table_records(run_op, run_entries, self.batch_size))
+
+        self.pending = []
+        self.errors.extend(errors)
+        return errors
@@ -0,0 +1,115 @@
+import ptf.testutils as testutils
+
+from model.data import Data
+from model.port_info import PortInfo
+from model.switch_config import PktgenApp, PreMgid, PreNode, SwitchConfig
+from model.table_entry import TableEntry
+from utils.hex_converter import ip_to_hex, mac_to_hex
+
+def build_config() -> SwitchConfig:
+    config = SwitchConfig(name="sw07")
+
+    config.port_infos = [
+        PortInfo(  8, "192.168.43.11",  "90:e2:ba:c2:e7:76"),
+        PortInfo( 11, "192.168.43.12",  "00:1b:21:bc:aa:36"),
+        PortInfo( 44, "192.168.43.13",  "3c:fd:fe:01:34:46"),
+        PortInfo(  9, "192.168.43.201", "90:e2:ba:c2:eb:fa"),
+        PortInfo( 10, "192.168.43.202", "90:e2:ba:c2:f6:76"),
+        PortInfo(  1, "192.168.43.101", "90:e2:ba:c2:ee:a6"),
+        PortInfo(130, "192.168.43.204", "00:07:32:9c:6a:01"),
+        PortInfo(131, "192.168.43.203", "00:07:32:9c:69:b1"),
+        PortInfo(  2, "192.168.43.14",  "00:1b:21:bc:aa:34"),
+    ]
+
+    config.recirculation_ports = [
+        PortInfo(49), 
+        PortInfo(48), 
+        PortInfo(51), 
+        PortInfo(50),
+        PortInfo(32),
+        PortInfo(33),
+        PortInfo(35),
+        PortInfo(34),
+    ]
+
+    config.entries.append(TableEntry(
+        table_name="virtual_ip_arp_reply_table", 
+        key_names=["hdr.arp.tpa"], 
+        key_vals=[ip_to_hex("192.168.43.200")], 
+        action_name="virtual_ip_arp_reply",
+        data_vals=[
+            Data("replySHA", mac_to_hex("00:1b:21:AA:BB:CC")),
+            Data("replySPA", ip_to_hex("192.168.43.200"))
+        ]
+    ))
+
+    config.entries.append(TableEntry(
+        table_name="virtual_ip_header_replacement_table", 
+        key_names=["ig_intr_md.ingress_port", "hdr.ipv4.dstAddr"], 
+        key_vals=[1, ip_to_hex("192.168.43.200")], 
+        action_name="virtual_ip_ipv4_header_replacement",
+        data_vals=[
+            Data("dstMacAddr", mac_to_hex("90:e2:ba:c2:eb:fa")),
+            Data("dstIPAddr", ip_to_hex("192.168.43.201")),
+            Data("port", 9)
+        ]
+    ))
+
+    # Recirculation port -> UPF it rewrites multicast copies to
+    multicast_replacements = [
+        (49, "90:e2:ba:c2:eb:fa", "192.168.43.201", 9),
+        (51, "90:e2:ba:c2:f6:76", "192.168.43.202", 10),
+        (32, "00:07:32:9c:69:b1", "192.168.43.203", 131),
+        (35, "00:07:32:9c:6a:01", "192.168.43.204", 130),
+    ]
+    for ingress_port, mac_addr, ip_addr, output_port in multicast_replacements:
+        config.entries.append(TableEntry(
+            table_name="multicast_ip_replacement_table", 
+            key_names=["ig_intr_md.ingress_port"], 
+            key_vals=[ingress_port], 
+            action_name="handle_multicast_ip_modify",
+            data_vals=[
+                Data("dstMacAddr", mac_to_hex(mac_addr)),
+                Data("dstIPAddr", ip_to_hex(ip_addr)),
+                Data("output_port", output_port)
+            ]
+        ))
+
+    config.entries.append(TableEntry(
+        table_name="upf_source_ip_replacement_table", 
+        key_names=["hdr.ipv4.srcAddr"], 
+        key_vals=[ip_to_hex("192.168.43.202")], 
+        action_name="handle_upf_soruce_ip_to_virtual_ip",
+        data_vals=[
+            Data("srcMacAddr", mac_to_hex("00:1b:21:AA:BB:CC")),
+            Data("srcIPAddr", ip_to_hex("192.168.43.200")),
+        ]
+    ))
+
+    # UE facing ports report TEIDs
+    for ingress_port in [8, 11, 44, 2]:
+        config.entries.append(TableEntry("record_ue_port_table", 
+            key_names=["ig_intr_md.ingress_port"], 
+            key_vals=[ingress_port], 
+            action_name="record_available_ue_teid",
+            data_vals=[]
+        ))
+
+    config.pre_nodes.append(PreNode(node_id=1, rid=5, dev_ports=[48, 50, 33, 34]))
+    config.pre_mgids.append(PreMgid(mgid=1, node_ids=[1], l1_xid_valid=[False], l1_xid=[0]))
+
+    # Create a simple packet with 192.168.132.48/enp2s0f1 MAC address
+    p = testutils.simple_ipv4ip_packet(
+        eth_src="00:1b:06:AA:BB:CC", 
+        eth_dst="90:e2:ba:c2:eb:fa", 
+        ip_src="192.168.43.200", 
+        ip_dst="192.168.43.201", 
+        inner_frame=("0123456789"*100).encode()
+    )
+
+    config.pktgen_apps = [
+        PktgenApp(app_id=1, packet=bytes(p), output_port=9, timer_nanosec=920, pipe_local_source_port=0x44),
+        PktgenApp(app_id=2, packet=bytes(p), output_port=10, timer_nanosec=920, pipe_local_source_port=0x44),
+    ]
+
+    return config
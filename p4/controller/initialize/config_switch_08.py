@@ -0,0 +1,41 @@
+from model.data import Data
+from model.port_info import PortInfo
+from model.switch_config import SwitchConfig
+from model.table_entry import TableEntry
+from utils.hex_converter import ip_to_hex, mac_to_hex
+
+def build_config() -> SwitchConfig:
+    config = SwitchConfig(name="sw08")
+
+    config.port_infos = [
+        PortInfo( 1, "10.10.216.102", "90:e2:ba:c2:ee:a4"),
+        PortInfo( 8, "10.10.216.201", "90:e2:ba:c2:eb:f8"),
+        PortInfo(10, "10.10.216.101", "00:1b:21:bc:aa:d3"),
+        PortInfo(11, "10.10.216.202", "90:e2:ba:c2:f6:74"),
+        PortInfo(129, "10.10.216.204", "00:07:32:9c:6a:02"),
+        PortInfo(130, "10.10.216.203", "00:07:32:9c:69:b2")
+    ]
+
+    # Virtual IPs handed out to UEs
+    for available_ip in range(32):
+        ip_addr = ip_to_hex("10.10.216.33") + available_ip
+        config.entries.append(TableEntry(table_name="virtual_ip_arp_reply_table",
+            key_names=["hdr.arp.tpa"],
+            key_vals=[ip_addr],
+            data_vals=[
+                Data("replySPA", ip_addr),
+                Data("replySHA", mac_to_hex("00:1b:06:AA:BB:CC")),
+            ],
+            action_name="virtual_ip_arp_reply"
+        ))
+        config.entries.append(TableEntry(table_name="virtual_ip_hdr_addr_replace_table",
+            key_names=["hdr.ipv4.dstAddr", "hdr.ethernet.dstAddr"],
+            key_vals=[ip_addr, mac_to_hex("00:1b:06:AA:BB:CC")],
+            data_vals=[
+                Data("dstAddr", mac_to_hex("90:e2:ba:c2:eb:f8")),
+                Data("port", 8),
+            ],
+            action_name="replace_virtual_ip_hdr_addr_replace"
+        ))
+
+    return config
@@ -22,7 +22,42 @@ class Data:
             return f"Data(key={self.key}, data={self.data})"
         else:
             return f"Data(None())"
-        
+
+    def __eq__(self, value):
+        return isinstance(value, Data) and self.signature() == value.signature()
+
+    def __hash__(self):
+        return hash(self.signature())
+
+    @staticmethod
+    def from_value(key: str, value: Any) -> "Data":
+        if isinstance(value, bool):
+            return Data(key, bool_val=value)
+        elif isinstance(value, list) and len(value) > 0 and all(isinstance(v, bool) for v in value):
+            return Data(key, bool_arr_val=value)
+        elif isinstance(value, list):
+            return Data(key, int_arr_val=value)
+        else:
+            return Data(key, value)
+
+    def get_value(self) -> Any:
+        if self.int_arr_val != None:
+            return self.int_arr_val
+        elif self.bool_arr_val != None:
+            return self.bool_arr_val
+        elif self.bool_val != None:
+            return self.bool_val
+        else:
+            return self.data
+
+    def signature(self) -> tuple:
+        value = self.get_value()
+
+        if isinstance(value, list):
+            value = tuple(value)
+        elif isinstance(value, bytearray):
+            value = bytes(value)
+        return (self.key, value)
     
     def to_bfrt_data(self):
         if self.int_arr_val != None:
@@ -1,8 +1,7 @@
 import json
-from typing import Any
-
-from requests import get
+from typing import Any, Dict, List, Tuple
 
+from utils.data_fetcher import get_telemetry_client
 from utils.hex_converter import ip_to_hex
 
 class RAN:
@@ -16,13 +15,23 @@ class RAN:
     def get_up_ue_list(self):
         return self.up_ue_list
     
-    def fetch_up_ues(self):
-        resp = get(f"http://{self.ip_addr}:48763/")
+    def fetch_up_ues(self, timeout: float = None) -> Tuple[List[dict], List[dict]]:
+        resp = get_telemetry_client().session.get(f"http://{self.ip_addr}:48763/", timeout=timeout)
         json_resp: dict[str, Any] = json.loads(resp.text)
         
+        up_ue_list = []
         for key in json_resp.keys():
             if "uesimtun" in key:
-                self.up_ue_list.append({
+                up_ue_list.append({
                     "device": key,
                     "ip": ip_to_hex(json_resp[key][0])
-                })
\ No newline at end of file
+                })
+
+        # Replace the snapshot instead of appending to it, and report what changed since the last one
+        previous: Dict[tuple, dict] = dict(((ue["device"], ue["ip"]), ue) for ue in self.up_ue_list)
+        current: Dict[tuple, dict] = dict(((ue["device"], ue["ip"]), ue) for ue in up_ue_list)
+        added = [ue for (key, ue) in current.items() if key not in previous]
+        removed = [ue for (key, ue) in previous.items() if key not in current]
+
+        self.up_ue_list = up_ue_list
+        return added, removed
@@ -0,0 +1,93 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, List
+
+from model.data import Data
+from model.port_info import PortInfo
+from model.table_entry import TableEntry
+from utils.hex_converter import ip_to_hex, mac_to_hex
+
+MAC_PATTERN = re.compile(r"[0-9A-Fa-f]{2}(:[0-9A-Fa-f]{2}){5}")
+IPV4_PATTERN = re.compile(r"(25[0-5]|2[0-4][0-9]|1[0-9]{2}|[1-9]?[0-9])(\.(25[0-5]|2[0-4][0-9]|1[0-9]{2}|[1-9]?[0-9])){3}")
+
+@dataclass
+class PreNode:
+    node_id: int
+    rid: int
+    dev_ports: List[int]
+    lag_ids: List[int] = field(default_factory=list)
+
+@dataclass
+class PreMgid:
+    mgid: int
+    node_ids: List[int]
+    l1_xid_valid: List[bool] = None
+    l1_xid: List[int] = None
+
+@dataclass
+class PktgenApp:
+    app_id: int
+    packet: bytes
+    output_port: int
+    timer_nanosec: int
+    pipe_local_source_port: int
+    buffer_offset: int = 0
+    enable: bool = False
+
+@dataclass
+class SwitchConfig:
+    name: str
+    port_infos: List[PortInfo] = field(default_factory=list)
+    recirculation_ports: List[PortInfo] = field(default_factory=list)
+    entries: List[TableEntry] = field(default_factory=list)
+    pre_nodes: List[PreNode] = field(default_factory=list)
+    pre_mgids: List[PreMgid] = field(default_factory=list)
+    pktgen_apps: List[PktgenApp] = field(default_factory=list)
+
+
+def _parse_value(value: Any) -> Any:
+    # Addresses are written the way people read them, "10.10.216.1" / "90:e2:ba:c2:e5:8c";
+    # any other string is passed through as it is
+    if isinstance(value, str) and MAC_PATTERN.fullmatch(value):
+        return mac_to_hex(value)
+    elif isinstance(value, str) and IPV4_PATTERN.fullmatch(value):
+        return ip_to_hex(value)
+    elif isinstance(value, list):
+        return [_parse_value(v) for v in value]
+    else:
+        return value
+
+
+def _port_info_from_dict(port: dict) -> PortInfo:
+    return PortInfo(port["dev_port"], port.get("ip_address"), port.get("mac_address"))
+
+
+def _entry_from_dict(entry: dict) -> TableEntry:
+    keys: dict = entry.get("keys", {})
+    data: dict = entry.get("data", {})
+
+    return TableEntry(
+        table_name=entry["table"],
+        key_names=list(keys.keys()),
+        key_vals=[_parse_value(v) for v in keys.values()],
+        data_vals=[Data.from_value(k, _parse_value(v)) for (k, v) in data.items()],
+        action_name=entry.get("action")
+    )
+
+
+def switch_config_from_dict(config: dict) -> SwitchConfig:
+    return SwitchConfig(
+        name=config["name"],
+        port_infos=[_port_info_from_dict(port) for port in config.get("ports", [])],
+        recirculation_ports=[_port_info_from_dict(port) for port in config.get("recirculation_ports", [])],
+        entries=[_entry_from_dict(entry) for entry in config.get("entries", [])],
+        pre_nodes=[PreNode(**node) for node in config.get("pre_nodes", [])],
+        pre_mgids=[PreMgid(**mgid) for mgid in config.get("pre_mgids", [])],
+        pktgen_apps=[PktgenApp(**{**app, "packet": bytes.fromhex(app["packet"])}) for app in config.get("pktgen_apps", [])],
+    )
+
+
+def load_switch_config(path: str) -> SwitchConfig:
+    with open(path) as f:
+        return switch_config_from_dict(json.load(f))
@@ -0,0 +1,12 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from model.data import Data
+
+@dataclass
+class TableEntry:
+    table_name: str
+    key_names: list
+    key_vals: list
+    data_vals: List[Data] = field(default_factory=list)
+    action_name: str = None
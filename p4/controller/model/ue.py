@@ -1,5 +1,6 @@
 from enum import Enum
 from utils.data_fetcher import fetch_ue_sending_rate
+from utils.telemetry_collector import get_rate_cache
 
 class UEStatus(Enum):
     DISCOVERED = 1
@@ -7,6 +8,8 @@ class UEStatus(Enum):
 
 
 class UE:
+    __slots__ = ("status", "teid", "ip_addr", "instance", "device", "binding_upf", "expected_bandwidth")
+
     def __init__(self, teid, ip_addr, instance, device, expected_bandwidth):
         self.status = UEStatus.DISCOVERED
         self.teid = teid
@@ -19,6 +22,9 @@ class UE:
     def __eq__(self, value):
         return value.teid == self.teid and value.ip_addr == self.ip_addr
 
+    def __hash__(self):
+        return hash((self.teid, self.ip_addr))
+
     def get_teid(self):
         return self.teid
 
@@ -33,9 +39,23 @@ class UE:
     
     def get_expected_bandwidth(self):
         return self.expected_bandwidth
+
+    def set_expected_bandwidth(self, expected_bandwidth):
+        self.expected_bandwidth = expected_bandwidth
     
     def get_sending_rate_in_mbps(self):
-        return fetch_ue_sending_rate(self.instance, self.device) // 1e6
+        # None until the UE has a series
+        rate_cache = get_rate_cache()
+
+        if rate_cache is not None:
+            rate = rate_cache.get_ue_rate(self.instance, self.device, self.teid)
+        else:
+            rate = fetch_ue_sending_rate(self.instance, self.device)
+        return rate // 1e6 if rate is not None else None
+
+    def is_sending_rate_stale(self) -> bool:
+        rate_cache = get_rate_cache()
+        return rate_cache is not None and rate_cache.is_ue_rate_stale(self.instance, self.device, self.teid)
 
     def set_binding_upf(self, upf_ip):
         self.binding_upf = upf_ip
@@ -1,6 +1,9 @@
 from utils.data_fetcher import fetch_tunnel_load_in_bytes, Tunnel
+from utils.telemetry_collector import get_rate_cache
 
 class UPF:
+    __slots__ = ("upfid", "mac_addr", "ip_addr", "output_port", "max_loading_in_mbps", "background_loading_in_mbps")
+
     def __init__(self, upfid, mac_addr, ip_addr, output_port, background_loading_in_mbps, max_loading_in_mbps):
         self.upfid = upfid
         self.mac_addr = mac_addr
@@ -18,8 +21,28 @@ class UPF:
     def get_output_port(self):
         return self.output_port
     
+    def _get_tunnel_load_in_bytes(self, tunnel: Tunnel) -> float:
+        # None while the UPF has no series for the tunnel
+        rate_cache = get_rate_cache()
+
+        if rate_cache is not None:
+            return rate_cache.get_upf_rate(self.upfid, tunnel)
+        try:
+            return fetch_tunnel_load_in_bytes(self.upfid, tunnel)
+        except KeyError:
+            return None
+
+    def _get_sending_rate_in_mbps(self, tunnel: Tunnel) -> float:
+        # Unknown is None, not 0: a UPF without a series must not look idle to the allocator
+        load = self._get_tunnel_load_in_bytes(tunnel)
+        return load // 1e6 - self.background_loading_in_mbps if load is not None else None
+
     def get_N3_sending_rate_in_mbps(self) -> float:
-        return fetch_tunnel_load_in_bytes(self.upfid, Tunnel.N3) // 1e6 - self.background_loading_in_mbps
+        return self._get_sending_rate_in_mbps(Tunnel.N3)
 
     def get_N6_sending_rate_in_mbps(self) -> float:
-        return fetch_tunnel_load_in_bytes(self.upfid, Tunnel.N6) // 1e6 - self.background_loading_in_mbps
\ No newline at end of file
+        return self._get_sending_rate_in_mbps(Tunnel.N6)
+
+    def is_sending_rate_stale(self) -> bool:
+        rate_cache = get_rate_cache()
+        return rate_cache is not None and (rate_cache.is_stale((self.upfid, Tunnel.N3)) or rate_cache.is_stale((self.upfid, Tunnel.N6)))
\ No newline at end of file
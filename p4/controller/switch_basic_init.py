@@ -3,8 +3,10 @@ from typing import Tuple
 from bfrt_grpc.client import DataTuple
 
 from core.switch_controller import Fec, SwitchController, Speed
+from core.write_buffer import WriteBuffer
 from model.port_info import PortInfo
 from model.data import Data
+from model.table_entry import TableEntry
 from utils.hex_converter import ip_to_hex, mac_to_hex
 
 
@@ -14,26 +16,30 @@ def switch_basic_init(switch: SwitchController, port_infos: Tuple[PortInfo]):
         switch.add_port(port_info.dev_port, Speed.SPEED_10G, Fec.FEC_NONE)
         switch.enb_port(port_info.dev_port)
 
-    # Add forward_table record
-    for port_info in port_infos:
-        switch.add_table_record(
-            table_name="forward_table", 
-            key_names=["hdr.ethernet.dstAddr"], 
-            key_vals=[mac_to_hex(port_info.mac_address)], 
-            action_name="forward",
-            data_vals=[
-                Data("port", port_info.dev_port)
-            ]
-        )
-    
-    # Add arp_forward_table record
-    for port_info in port_infos:
-        switch.add_table_record(
-            table_name="arp_forward_table", 
-            key_names=["hdr.arp.tpa"], 
-            key_vals=[ip_to_hex(port_info.ip_address)], 
-            action_name="arp_request_forward",
-            data_vals=[
-                Data("port", port_info.dev_port)
-            ]
-        )
+    with WriteBuffer(switch) as write_buffer:
+        # Add forward_table record
+        for port_info in port_infos:
+            write_buffer.add(TableEntry(
+                table_name="forward_table", 
+                key_names=["hdr.ethernet.dstAddr"], 
+                key_vals=[mac_to_hex(port_info.mac_address)], 
+                action_name="forward",
+                data_vals=[
+                    Data("port", port_info.dev_port)
+                ]
+            ))
+        
+        # Add arp_forward_table record
+        for port_info in port_infos:
+            write_buffer.add(TableEntry(
+                table_name="arp_forward_table", 
+                key_names=["hdr.arp.tpa"], 
+                key_vals=[ip_to_hex(port_info.ip_address)], 
+                action_name="arp_request_forward",
+                data_vals=[
+                    Data("port", port_info.dev_port)
+                ]
+            ))
+
+    for error in write_buffer.errors:
+        print(f"[TABLE_{error.op.name}_FAILED] Table Name {error.entry.table_name} / Key Value {error.entry.key_vals} / {error.message}")
@@ -0,0 +1,47 @@
+from model.ue import UE
+from model.upf import UPF
+from utils.allocator import AllocationStrategy, UPFAllocator
+
+
+def _upfs(*capacities):
+    return [UPF(i, f"00:00:00:00:00:0{i}", f"10.0.0.{i}", i, 0, capacity) for (i, capacity) in enumerate(capacities, 1)]
+
+
+def _ues(*demands):
+    return [UE(2 * (i + 1), i + 1, f"ue{i}", f"dev{i}", demand) for (i, demand) in enumerate(demands)]
+
+
+def test_best_fit_takes_the_tightest_upf_that_fits():
+    upfs = _upfs(100, 30, 50)
+    ues = _ues(25, 40)
+    UPFAllocator(upfs, AllocationStrategy.BEST_FIT).allocate(ues)
+
+    # Largest first: 40 takes the 50, then 25 takes the 30 rather than the 10 left or the 100
+    assert ues[1].get_binding_upf() == "10.0.0.3"
+    assert ues[0].get_binding_upf() == "10.0.0.2"
+
+
+def test_best_fit_spills_onto_the_most_headroom():
+    upfs = _upfs(10, 20)
+    ues = _ues(50)
+    UPFAllocator(upfs, AllocationStrategy.BEST_FIT).allocate(ues)
+
+    assert ues[0].get_binding_upf() == "10.0.0.2"
+
+
+def test_worst_fit_keeps_existing_bindings():
+    upfs = _upfs(100, 100)
+    ues = _ues(60, 30)
+    ues[0].set_binding_upf("10.0.0.1")
+    UPFAllocator(upfs, AllocationStrategy.WORST_FIT).allocate(ues, keep_existing=True)
+
+    assert ues[0].get_binding_upf() == "10.0.0.1"
+    assert ues[1].get_binding_upf() == "10.0.0.2"
+
+
+def test_first_fit_follows_the_upf_order():
+    upfs = _upfs(50, 100)
+    ues = _ues(40, 30, 20)
+    UPFAllocator(upfs, AllocationStrategy.FIRST_FIT_DECREASING).allocate(ues)
+
+    assert [ue.get_binding_upf() for ue in ues] == ["10.0.0.1", "10.0.0.2", "10.0.0.2"]
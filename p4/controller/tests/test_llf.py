@@ -0,0 +1,46 @@
+from model.ue import UE
+from model.upf import UPF
+from utils.allocator import AllocationStrategy
+from utils.LLF import LLF
+
+
+def _upfs():
+    return [
+        UPF(0, "00:00:00:00:00:01", "10.0.0.1", 1, 0, 100),
+        UPF(1, "00:00:00:00:00:02", "10.0.0.2", 2, 0, 100),
+    ]
+
+
+def _ues():
+    # Expected bandwidth says one UE fits each UPF, the measured demand says both fit one
+    return [UE(2, 1, "ue1", "dev1", 90), UE(4, 2, "ue2", "dev2", 90)]
+
+
+def test_allocate_uses_the_configured_demand():
+    ues = _ues()
+    LLF(_upfs(), demand_fn=lambda ue: 10).allocate(ues, AllocationStrategy.BEST_FIT, keep_existing=False)
+
+    assert ues[0].binding_upf == ues[1].binding_upf
+
+
+def test_allocate_without_demand_fn_uses_expected_bandwidth():
+    ues = _ues()
+    LLF(_upfs()).allocate(ues, AllocationStrategy.BEST_FIT, keep_existing=False)
+
+    assert ues[0].binding_upf != ues[1].binding_upf
+
+
+def test_match_paths_use_the_configured_demand():
+    asked = []
+
+    def demand(ue: UE) -> float:
+        asked.append(ue.get_teid())
+        return 10
+
+    llf = LLF(_upfs(), demand_fn=demand)
+    llf.allow_swap_match_lowest_upfs(_ues())
+    assert sorted(set(asked)) == [2, 4]
+
+    asked.clear()
+    llf.match_lowest_upfs(_ues())
+    assert sorted(set(asked)) == [2, 4]
@@ -0,0 +1,50 @@
+from urllib.request import urlopen
+
+from prometheus_client import generate_latest
+
+from utils.metrics import REGISTRY, SWITCH_TABLE_WRITE_SECONDS, SWITCH_TABLE_WRITES, UPF_UE_COUNT, start_metrics_server
+
+
+def _scrape() -> str:
+    return generate_latest(REGISTRY).decode()
+
+
+def test_counter_keeps_its_total_name_without_created_series():
+    SWITCH_TABLE_WRITES.labels("test_counter_table", "ADD").inc(3)
+    text = _scrape()
+
+    assert 'controller_switch_table_writes_total{op="ADD",table="test_counter_table"} 3.0' in text
+    assert "controller_switch_table_writes_created" not in text
+
+
+def test_label_values_are_escaped():
+    UPF_UE_COUNT.labels('a"b\\c\nd').set(2)
+
+    assert 'controller_upf_ue_count{upf="a\\"b\\\\c\\nd"} 2.0' in _scrape()
+
+
+def test_histogram_renders_buckets_sum_and_count():
+    child = SWITCH_TABLE_WRITE_SECONDS.labels("test_histogram_table", "MOD")
+    child.observe(0.002)
+    child.observe(3.0)
+    text = _scrape()
+
+    labels = 'op="MOD",table="test_histogram_table"'
+    assert f'controller_switch_table_write_seconds_bucket{{le="0.001",{labels}}} 0.0' in text
+    assert f'controller_switch_table_write_seconds_bucket{{le="0.0025",{labels}}} 1.0' in text
+    assert f'controller_switch_table_write_seconds_bucket{{le="5.0",{labels}}} 2.0' in text
+    assert f'controller_switch_table_write_seconds_bucket{{le="+Inf",{labels}}} 2.0' in text
+    assert f"controller_switch_table_write_seconds_sum{{{labels}}} 3.002" in text
+    assert f"controller_switch_table_write_seconds_count{{{labels}}} 2.0" in text
+
+
+def test_metrics_server_serves_the_registry():
+    server, thread = start_metrics_server(0, "127.0.0.1")
+    try:
+        UPF_UE_COUNT.labels("test_server_upf").set(1)
+        body = urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5).read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'controller_upf_ue_count{upf="test_server_upf"} 1.0' in body
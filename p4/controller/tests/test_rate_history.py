@@ -0,0 +1,78 @@
+import math
+
+from utils.rate_history import Estimate, RateHistory
+
+
+def test_record_keeps_rows_of_known_series():
+    history = RateHistory(capacity=2, depth=4)
+    history.record({"a": 1.0, "b": 2.0})
+    history.record({"a": 3.0, "b": 4.0})
+
+    assert history.get_series("a") == [1.0, 3.0]
+    assert history.get_series("b") == [2.0, 4.0]
+
+
+def test_new_series_takes_the_row_silent_the_longest():
+    history = RateHistory(capacity=2, depth=4)
+    history.record({"a": 1.0, "b": 2.0})
+    history.record({"b": 2.0})
+    history.record({"c": 5.0})
+
+    assert "a" not in history
+    assert history.get_series("c") == [5.0]
+    assert history.get_series("b") == [2.0, 2.0]
+
+
+def test_more_new_keys_than_capacity_in_one_record():
+    history = RateHistory(capacity=2, depth=4)
+    history.record({"a": 1.0, "b": 2.0, "c": 3.0, "d": 4.0})
+
+    # The first two claim the rows, the rest wait instead of evicting them in the same tick
+    assert history.get("a") == 1.0
+    assert history.get("b") == 2.0
+    assert "c" not in history
+    assert "d" not in history
+    assert history.dropped == 2
+    assert len(history) == 2
+
+
+def test_new_key_does_not_evict_a_series_sampled_in_the_same_record():
+    history = RateHistory(capacity=2, depth=4)
+    history.record({"a": 1.0, "b": 2.0})
+    history.record({"c": 3.0, "a": 1.0, "b": 2.0})
+
+    assert history.get_series("a") == [1.0, 1.0]
+    assert history.get_series("b") == [2.0, 2.0]
+    assert "c" not in history
+    assert history.dropped == 1
+
+
+def test_ewma_and_peak():
+    history = RateHistory(capacity=1, depth=8, alpha=0.5, peak_horizon=2)
+    for rate in (4.0, 8.0, 2.0):
+        history.record({"a": rate})
+
+    assert history.get("a", Estimate.EWMA) == 4.0
+    assert history.get("a", Estimate.PEAK) == 8.0
+
+
+def test_silent_series_reads_as_unknown_not_idle():
+    history = RateHistory(capacity=2, depth=2)
+    history.record({"a": 1.0})
+    history.record({"b": 1.0})
+    history.record({"b": 1.0})
+
+    assert history.get("a", Estimate.PEAK, default=-1.0) == -1.0
+    assert not math.isnan(history.get("b", Estimate.PERCENTILE))
+
+
+def test_forget_keeps_rows_packed():
+    history = RateHistory(capacity=3, depth=4)
+    history.record({"a": 1.0, "b": 2.0, "c": 3.0})
+    history.forget("a")
+
+    assert len(history) == 2
+    assert history.get("c") == 3.0
+    history.record({"d": 4.0})
+    assert history.get("d") == 4.0
+    assert history.get("b") == 2.0
@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+from utils.scheduler import ControlLoopScheduler
+
+
+def _wait_idle(scheduler: ControlLoopScheduler):
+    for future in list(scheduler.running.values()):
+        future.result(timeout=5)
+
+
+def test_overrun_is_logged_and_delays_the_next_run(caplog):
+    scheduler = ControlLoopScheduler()
+    scheduler.add_phase("slow", lambda: time.sleep(0.05), period=0.02, deadline=0.01)
+
+    with caplog.at_level(logging.WARNING):
+        scheduler.run_once()
+        _wait_idle(scheduler)
+    finished = time.monotonic()
+
+    assert scheduler.get_stats()["slow"]["overruns"] == 1
+    assert any("event=phase_overrun" in record.getMessage() and "phase=slow" in record.getMessage() for record in caplog.records)
+    # Not due again right away, a full period after the late run ended
+    assert scheduler.next_run["slow"] >= finished + 0.02 - 0.005
+    scheduler.executor.shutdown(wait=True)
+
+
+def test_run_within_deadline_keeps_its_period():
+    scheduler = ControlLoopScheduler()
+    scheduler.add_phase("fast", lambda: None, period=1.0, deadline=0.5)
+
+    started = time.monotonic()
+    scheduler.run_once()
+    _wait_idle(scheduler)
+
+    assert scheduler.get_stats()["fast"]["overruns"] == 0
+    assert scheduler.next_run["fast"] <= started + 1.0 + 0.05
+    scheduler.executor.shutdown(wait=True)
+
+
+def test_conflicting_phases_never_overlap():
+    scheduler = ControlLoopScheduler()
+    release = threading.Event()
+    ran = []
+
+    scheduler.add_phase("ran", lambda: release.wait(5), period=10.0)
+    scheduler.add_phase("discovery", lambda: ran.append(True), period=0.01, conflicts=["ran"])
+
+    scheduler.run_once()
+    time.sleep(0.02)
+    scheduler.run_once()
+    assert ran == []
+
+    release.set()
+    _wait_idle(scheduler)
+    scheduler.run_once()
+    _wait_idle(scheduler)
+    assert ran == [True]
+    scheduler.executor.shutdown(wait=True)
@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+from utils.state_journal import StateJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "state.db")
+
+
+def _rows(path: str, table: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_reopen_replays_the_journal_over_the_snapshot(path):
+    journal = StateJournal(path)
+    journal.set("binding", 2, ip=101, binding_upf="10.0.0.1")
+    journal.set("binding", 4, ip=102, binding_upf="10.0.0.1")
+    journal.compact()
+
+    journal.put("binding", 2, binding_upf="10.0.0.2")
+    journal.delete("binding", 4)
+    journal.set("ue", 101, teid=2)
+    journal.close()
+
+    state = StateJournal(path).load()
+    assert state == {
+        "binding": {2: {"ip": 101, "binding_upf": "10.0.0.2"}},
+        "ue": {101: {"teid": 2}},
+    }
+
+
+def test_pending_writes_to_one_key_coalesce_into_one_row(path):
+    journal = StateJournal(path)
+    journal.set("binding", 2, ip=101, binding_upf="10.0.0.1")
+    journal.put("binding", 2, binding_upf="10.0.0.2")
+    journal.put("binding", 2, expected_bandwidth=20)
+
+    assert journal.flush() == 1
+    assert _rows(path, "journal") == 1
+    assert journal.load()["binding"][2] == {"ip": 101, "binding_upf": "10.0.0.2", "expected_bandwidth": 20}
+    journal.close()
+
+
+def test_put_after_delete_starts_the_record_over(path):
+    journal = StateJournal(path)
+    journal.set("binding", 2, ip=101, binding_upf="10.0.0.1")
+    journal.flush()
+
+    journal.delete("binding", 2)
+    journal.put("binding", 2, binding_upf="10.0.0.2")
+    journal.flush()
+
+    assert journal.load()["binding"][2] == {"binding_upf": "10.0.0.2"}
+    journal.close()
+
+
+def test_compact_folds_the_journal_into_the_snapshot(path):
+    journal = StateJournal(path)
+    for teid in range(2, 12, 2):
+        journal.set("binding", teid, ip=100 + teid)
+        journal.flush()
+    journal.delete("binding", 2)
+    journal.flush()
+    before = journal.load()
+
+    journal.compact()
+
+    assert _rows(path, "journal") == 0
+    assert _rows(path, "snapshot") == 4
+    assert journal.journal_rows == 0
+    assert journal.load() == before
+    journal.close()
+
+
+def test_flush_compacts_past_compact_every(path):
+    journal = StateJournal(path, compact_every=3)
+    for teid in (2, 4):
+        journal.set("binding", teid, ip=100 + teid)
+        journal.flush()
+    assert _rows(path, "journal") == 2
+
+    journal.set("binding", 6, ip=106)
+    journal.flush()
+
+    assert _rows(path, "journal") == 0
+    assert sorted(journal.load()["binding"].keys()) == [2, 4, 6]
+    journal.close()
@@ -0,0 +1,31 @@
+import pytest
+
+# model.data builds bfrt_grpc data objects
+pytest.importorskip("bfrt_grpc")
+
+from model.switch_config import switch_config_from_dict
+
+
+def _entry(keys: dict, data: dict):
+    config = switch_config_from_dict({"name": "sw", "entries": [{"table": "t", "keys": keys, "data": data, "action": "a"}]})
+    return config.entries[0]
+
+
+def test_addresses_are_parsed():
+    entry = _entry({"hdr.ipv4.dst_addr": "10.10.216.1"}, {"dst_mac": "90:e2:ba:c2:e5:8c"})
+
+    assert entry.key_vals == [0x0A0AD801]
+    assert entry.data_vals[0].data == 0x90E2BAC2E58C
+
+
+def test_other_strings_pass_through():
+    values = ["v1.2", "a:b", "10.10.216", "300.1.1.1", "90:e2:ba:c2:e5", "2001:db8::1", "ue_teid_digest"]
+    entry = _entry(dict((f"k{i}", value) for (i, value) in enumerate(values)), {})
+
+    assert entry.key_vals == values
+
+
+def test_lists_are_parsed_per_value():
+    entry = _entry({"k": ["10.0.0.1", "name.with.dots"]}, {})
+
+    assert entry.key_vals == [[0x0A000001, "name.with.dots"]]
@@ -0,0 +1,103 @@
+import pytest
+
+# The fake switch raises bfrt_grpc's exceptions
+pytest.importorskip("bfrt_grpc")
+
+from bench.fake_switch import FakeData, FakeSwitchBackend
+from core.switch_controller import SwitchController
+from core.teid_manager import TEIDManager
+from model.data import Data
+from model.table_entry import TableEntry
+
+UE_NET = 0x0A000001
+
+
+def _manager(slots: int = 4, **kwargs):
+    backend = FakeSwitchBackend(counter_sizes={"ue_teid_counter": slots}, **kwargs)
+    return backend, TEIDManager(SwitchController("l2fwd", None, backend))
+
+
+def _slot_entries(backend: FakeSwitchBackend) -> dict:
+    return dict((key[0], data.fields["slot"]) for (key, data) in backend.get_table("teid_slot_table").entries.items())
+
+
+def _route(teid: int) -> TableEntry:
+    return TableEntry("ue_packet_transmit_table", ["hdr.gprs.teid", "hdr.ipv4.dstAddr"], [teid, UE_NET], [Data("port", 1)], "forward")
+
+
+def test_activate_writes_one_slot_entry_per_new_teid():
+    backend, manager = _manager()
+
+    assert sorted(manager.activate([100, 200])) == [100, 200]
+    assert _slot_entries(backend) == {100: manager.get_slot(100), 200: manager.get_slot(200)}
+    assert manager.get_free() == 2
+
+
+def test_activate_again_writes_nothing():
+    backend, manager = _manager()
+    manager.activate([100])
+    backend.reset_stats()
+
+    assert manager.activate([100]) == [100]
+    assert backend.rpc_count == 0
+
+
+def test_activate_past_capacity_rejects_the_rest():
+    backend, manager = _manager(slots=2)
+
+    live = manager.activate([1, 2, 3, 4])
+
+    assert sorted(live) == [1, 2]
+    assert manager.rejected == 2
+    assert sorted(_slot_entries(backend).keys()) == [1, 2]
+
+
+def test_reused_slot_has_its_counter_reset():
+    backend, manager = _manager()
+    manager.activate([100])
+    slot = manager.get_slot(100)
+    backend.get_table("ue_teid_counter").count({slot: (5000, 5)})
+
+    manager.deactivate([100])
+    manager.activate([200])
+
+    assert manager.get_slot(200) == slot
+    byte_counts, packet_counts = manager.switch.dump_counter("ue_teid_counter")
+    assert byte_counts[slot] == 0 and packet_counts[slot] == 0
+
+
+def test_failed_activation_gives_the_slots_back():
+    backend, manager = _manager()
+    # Already on the switch but unknown to the manager, the add fails and the transaction rolls back
+    backend.get_table("teid_slot_table").entries[(200,)] = FakeData({"slot": 3}, "set_teid_slot")
+
+    assert manager.activate([100, 200]) == []
+    assert 100 not in manager and 200 not in manager
+    assert manager.get_free() == 4
+    assert list(_slot_entries(backend).keys()) == [200]
+
+
+def test_deactivate_removes_slot_and_routes():
+    backend, manager = _manager()
+    manager.activate([100, 200])
+    manager.switch.add_table_records([_route(100), _route(200)])
+
+    assert manager.deactivate([100, 999]) == [100]
+    assert 100 not in manager
+    assert list(_slot_entries(backend).keys()) == [200]
+    assert list(backend.get_table("ue_packet_transmit_table").entries.keys()) == [(200, UE_NET)]
+
+
+def test_restore_keeps_slots_from_the_switch():
+    backend, manager = _manager()
+    manager.activate([100, 200, 300])
+    manager.deactivate([200])
+
+    restored = TEIDManager(SwitchController("l2fwd", None, backend))
+
+    assert restored.restore() == 2
+    assert restored.get_slot(100) == manager.get_slot(100)
+    assert restored.get_slot(300) == manager.get_slot(300)
+    # The freed slot is the next one handed out
+    assert restored.activate([400]) == [400]
+    assert restored.get_slot(400) == 1
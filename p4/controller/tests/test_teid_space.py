@@ -0,0 +1,73 @@
+import pytest
+
+from utils.teid_space import NO_TEID, TEIDSlotMap
+
+
+def test_assign_packs_slots_from_zero():
+    slots = TEIDSlotMap(4)
+
+    assert [slots.assign(teid) for teid in (100, 7, 2**32 - 1)] == [0, 1, 2]
+    assert slots.get(7) == 1
+    assert slots.get_teid(2) == 2**32 - 1
+    assert len(slots) == 3
+    assert sorted(slots) == [7, 100, 2**32 - 1]
+
+
+def test_assign_is_idempotent():
+    slots = TEIDSlotMap(2)
+
+    assert slots.assign(5) == slots.assign(5) == 0
+    assert len(slots) == 1
+
+
+def test_released_slots_are_reused_lowest_first():
+    slots = TEIDSlotMap(4)
+    for teid in (10, 11, 12, 13):
+        slots.assign(teid)
+
+    assert slots.release(12) == 2
+    assert slots.release(11) == 1
+    assert slots.release(99) is None
+    assert slots.get_teid(1) == NO_TEID
+    assert 11 not in slots
+
+    assert slots.assign(20) == 1
+    assert slots.assign(21) == 2
+
+
+def test_explicit_slot_is_kept_and_skipped_by_the_heap():
+    slots = TEIDSlotMap(4)
+
+    assert slots.assign(50, slot=1) == 1
+    assert [slots.assign(teid) for teid in (51, 52, 53)] == [0, 2, 3]
+    assert slots.is_full()
+
+
+def test_explicit_slot_taken_by_another_teid_is_refused():
+    slots = TEIDSlotMap(4)
+    slots.assign(50, slot=3)
+
+    with pytest.raises(KeyError):
+        slots.assign(51, slot=3)
+    assert slots.get_teid(3) == 50
+
+
+def test_is_full_and_refuses_past_size():
+    slots = TEIDSlotMap(2)
+    slots.assign(1)
+    assert not slots.is_full()
+    slots.assign(2)
+    assert slots.is_full()
+
+    with pytest.raises(KeyError):
+        slots.assign(3)
+
+    slots.release(1)
+    assert not slots.is_full()
+    assert slots.assign(3) == 0
+
+
+@pytest.mark.parametrize("teid", [-1, 2**32])
+def test_teid_outside_32_bits_is_refused(teid):
+    with pytest.raises(ValueError):
+        TEIDSlotMap(2).assign(teid)
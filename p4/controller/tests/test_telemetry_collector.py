@@ -0,0 +1,51 @@
+import pytest
+
+from model.ue import UE
+from model.upf import UPF
+from utils.data_fetcher import Tunnel, UPFID
+from utils.telemetry_collector import RateCache, install_rate_cache
+
+
+@pytest.fixture
+def rate_cache():
+    cache = RateCache()
+    install_rate_cache(cache)
+    yield cache
+    install_rate_cache(None)
+
+
+class _Counters:
+    def __init__(self, rates: dict):
+        self.rates = rates
+
+    def has(self, teid: int) -> bool:
+        return teid in self.rates
+
+    def get_rate(self, teid: int) -> float:
+        return self.rates[teid]
+
+
+def test_missing_series_is_none_not_idle(rate_cache):
+    assert rate_cache.get(("nowhere", "eth0")) is None
+    assert rate_cache.get_upf_rate(UPFID.UPF01, Tunnel.N3) is None
+
+
+def test_first_ue_read_asks_for_tracking(rate_cache):
+    assert rate_cache.get_ue_rate("10.0.0.1:9100", "ue1") is None
+    assert rate_cache.get_wanted_ues() == [("10.0.0.1:9100", "ue1")]
+
+
+def test_upf_without_series_has_no_sending_rate(rate_cache):
+    upf = UPF(UPFID.UPF01, "00:00:00:00:00:01", "10.0.0.1", 1, 100, 1000)
+    assert upf.get_N3_sending_rate_in_mbps() is None
+
+    rate_cache.put((UPFID.UPF01, Tunnel.N3), 300e6)
+    assert upf.get_N3_sending_rate_in_mbps() == 200
+    assert upf.get_N6_sending_rate_in_mbps() is None
+
+
+def test_ue_rate_from_counters_in_bits(rate_cache):
+    rate_cache.install_teid_counters(_Counters({2: 1e6}))
+
+    assert UE(2, 1, "10.0.0.1:9100", "ue1", 10).get_sending_rate_in_mbps() == 8
+    assert UE(4, 2, "10.0.0.1:9100", "ue2", 10).get_sending_rate_in_mbps() is None
@@ -0,0 +1,72 @@
+import pytest
+
+# The fake switch raises bfrt_grpc's exceptions
+pytest.importorskip("bfrt_grpc")
+
+from bench.fake_switch import FakeSwitchBackend
+from core.switch_controller import SwitchController
+from utils.ue_discovery import DigestUEDiscovery, RegisterUEDiscovery, make_ue_discovery
+
+UNKNOWN_IP = 7
+NOT_READY_IP = 8
+
+
+class _UEMgr:
+    # Just what discovery calls; UNKNOWN_IP has no record, NOT_READY_IP has one without a TEID yet
+    def __init__(self):
+        self.teids = {}
+
+    def register_ue_teid(self, ip_hex: int, teid: int):
+        if ip_hex == UNKNOWN_IP:
+            raise KeyError(ip_hex)
+        self.teids[ip_hex] = teid
+
+    def get_ue(self, ip_hex: int):
+        if ip_hex == NOT_READY_IP:
+            raise RuntimeError("UE is not ready yet!")
+        return (self.teids[ip_hex], ip_hex)
+
+
+def _switch(**kwargs) -> SwitchController:
+    return SwitchController("l2fwd", None, FakeSwitchBackend(**kwargs))
+
+
+def test_digest_mode_only_when_the_learn_exists():
+    assert isinstance(make_ue_discovery(_switch(), _UEMgr()), DigestUEDiscovery)
+    assert isinstance(make_ue_discovery(_switch(learns=[]), _UEMgr()), RegisterUEDiscovery)
+
+
+def test_register_poll_skips_bad_ues_and_retries_them():
+    backend = FakeSwitchBackend(learns=[])
+    discovery = make_ue_discovery(SwitchController("l2fwd", None, backend), _UEMgr())
+    register = backend.get_table("ue_ip_reg")
+    # Odd TEIDs are downlink and never polled
+    register.set_values({2: 5, 3: 6, 4: UNKNOWN_IP, 6: NOT_READY_IP, 8: 9})
+
+    assert discovery.poll() == [(2, 5), (8, 9)]
+    assert discovery.known_teids == {2: 5, 8: 9}
+    assert discovery.poll() == []
+
+    # Forgotten TEIDs are learned again
+    discovery.forget(2, 5)
+    assert discovery.poll() == [(2, 5)]
+
+
+def test_digest_poll_records_only_built_ues():
+    switch = _switch()
+    discovery = DigestUEDiscovery(switch, _UEMgr())
+    discovery._on_digest([{"teid": 2, "ue_ip": 5}, {"teid": 4, "ue_ip": UNKNOWN_IP}, {"teid": 6, "ue_ip": NOT_READY_IP}, {"teid": 2, "ue_ip": 5}])
+
+    assert discovery.poll() == [(2, 5)]
+    assert discovery.known_teids == {2: 5}
+
+
+def test_digests_of_another_learn_are_kept_for_it():
+    backend = FakeSwitchBackend(learns=["other_digest", "ue_teid_digest"])
+    switch = SwitchController("l2fwd", None, backend)
+    backend.push_digest([{"teid": 9, "ue_ip": 1}], learn_name="other_digest")
+    backend.push_digest([{"teid": 2, "ue_ip": 5}])
+
+    assert switch.get_digest("ue_teid_digest", timeout=0.5) == [{"teid": 2, "ue_ip": 5}]
+    assert switch.get_digest("other_digest", timeout=0.01) == [{"teid": 9, "ue_ip": 1}]
+    assert switch.get_digest("ue_teid_digest", timeout=0.01) == []
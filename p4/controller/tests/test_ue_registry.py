@@ -0,0 +1,129 @@
+from model.ue import UE
+from utils.LLF import Migration
+from utils.ue_registry import UERegistry
+
+UPF1 = "10.0.0.1"
+UPF2 = "10.0.0.2"
+
+
+def _ue(teid: int, ip: int, bandwidth: float, upf: str = None) -> UE:
+    ue = UE(teid, ip, "10.0.1.1:9100", f"ue{ip}", bandwidth)
+    ue.set_binding_upf(upf)
+    return ue
+
+
+def test_add_indexes_and_loads_the_upf():
+    registry = UERegistry()
+
+    assert registry.insert(_ue(2, 101, 10, UPF1))
+    assert registry.insert(_ue(4, 102, 5, UPF1))
+    assert registry.insert(_ue(6, 103, 7))
+
+    assert len(registry) == 3
+    assert registry.get_by_ip(102).get_teid() == 4
+    assert registry.get_ue_count_of_upf(UPF1) == 2
+    assert registry.get_upf_load(UPF1) == 15
+    # Not bound yet, counted nowhere
+    assert registry.get_ue_count_of_upf(UPF2) == 0
+    assert registry.get_upf_load(UPF2) == 0
+
+
+def test_same_ue_again_is_not_an_insert():
+    registry = UERegistry()
+    registry.insert(_ue(2, 101, 10, UPF1))
+
+    assert not registry.insert(_ue(2, 101, 10, UPF1))
+    assert registry.get_upf_load(UPF1) == 10
+
+
+def test_ue_back_with_a_new_teid_replaces_its_old_record():
+    registry = UERegistry()
+    registry.insert(_ue(2, 101, 10, UPF1))
+    replacement = _ue(8, 101, 4, UPF2)
+
+    assert registry.displaced_by(replacement)[0].get_teid() == 2
+    registry.insert(replacement)
+
+    assert 2 not in registry
+    assert registry.get_by_ip(101).get_teid() == 8
+    assert registry.get_ue_count_of_upf(UPF1) == 0
+    assert registry.get_upf_load(UPF1) == 0
+    assert registry.get_ue_count_of_upf(UPF2) == 1
+    assert registry.get_upf_load(UPF2) == 4
+
+
+def test_teid_handed_to_another_ue_replaces_the_old_record():
+    registry = UERegistry()
+    registry.insert(_ue(2, 101, 10, UPF1))
+    registry.insert(_ue(2, 102, 3, UPF1))
+
+    assert registry.get_by_ip(101) is None
+    assert registry.get_ue_count_of_upf(UPF1) == 1
+    assert registry.get_upf_load(UPF1) == 3
+
+
+def test_rebind_moves_count_and_load():
+    registry = UERegistry()
+    registry.insert(_ue(2, 101, 10, UPF1))
+    registry.insert(_ue(4, 102, 5, UPF1))
+
+    registry.rebind(2, UPF2)
+
+    assert registry.get_by_teid(2).get_binding_upf() == UPF2
+    assert registry.get_ue_count_of_upf(UPF1) == 1
+    assert registry.get_upf_load(UPF1) == 5
+    assert registry.get_ue_count_of_upf(UPF2) == 1
+    assert registry.get_upf_load(UPF2) == 10
+
+
+def test_migrations_skip_removed_ues():
+    registry = UERegistry()
+    registry.insert(_ue(2, 101, 10, UPF1))
+
+    registry.apply_migrations([Migration(2, 101, UPF1, UPF2), Migration(4, 102, UPF1, UPF2)])
+
+    assert registry.get_upf_load(UPF1) == 0
+    assert registry.get_upf_load(UPF2) == 10
+    assert 4 not in registry
+
+
+def test_rebind_picks_up_a_binding_the_allocator_changed_on_the_ue():
+    registry = UERegistry()
+    ue = _ue(2, 101, 10, UPF1)
+    registry.insert(ue)
+
+    # The allocator sets bindings on the UE objects; the registry only follows on rebind
+    ue.set_binding_upf(UPF2)
+    assert registry.get_upf_load(UPF1) == 10
+    registry.rebind(2, UPF2)
+
+    assert registry.get_upf_load(UPF1) == 0
+    assert registry.get_upf_load(UPF2) == 10
+
+
+def test_update_demand_moves_the_upf_load():
+    measured = {2: 10.0}
+    registry = UERegistry(demand_fn=lambda ue: measured.get(ue.get_teid(), ue.get_expected_bandwidth()))
+    registry.insert(_ue(2, 101, 50, UPF1))
+    registry.insert(_ue(4, 102, 5, UPF1))
+    assert registry.get_upf_load(UPF1) == 15
+
+    measured[2] = 30.0
+    registry.update_demand(2)
+    assert registry.get_upf_load(UPF1) == 35
+
+    # Gone by the time its demand is updated
+    registry.remove(4)
+    registry.update_demand(4)
+    assert registry.get_upf_load(UPF1) == 30
+    assert registry.get_ue_count_of_upf(UPF1) == 1
+
+
+def test_update_expected_bandwidth_by_ip():
+    registry = UERegistry()
+    registry.insert(_ue(2, 101, 10, UPF1))
+
+    assert registry.update_expected_bandwidth(101, 25)
+    assert not registry.update_expected_bandwidth(101, 25)
+    assert not registry.update_expected_bandwidth(999, 25)
+    assert registry.get_upf_load(UPF1) == 25
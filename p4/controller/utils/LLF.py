@@ -1,14 +1,38 @@
+import heapq
 import random
-from typing import Callable, Dict, List
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
 from model.ue import UE
 from model.upf import UPF
+from utils.allocator import AllocationStrategy, UPFAllocator
 from utils.data_fetcher import UPFID
 from utils.hex_converter import ip_to_hex
+from utils.metrics import ALLOCATOR_SECONDS
+
+@dataclass
+class Migration:
+    teid: int
+    ue_ip: int
+    old_upf: str
+    new_upf: str
+
+
+@dataclass
+class SelectorPlan:
+    # UPF IP -> member slots in the selector group, and TEID -> UPF IP for UEs that bypass the hash
+    weights: Dict[str, int]
+    overrides: Dict[int, str]
+
 
 # LLF = Least Loading F-what(?)
 class LLF:
-    def __init__(self, upfs: List[UPF]):
+    def __init__(self, upfs: List[UPF], verbose: bool = False, demand_fn: Callable[[UE], float] = None):
         self.upfs = upfs
+        self.verbose = verbose
+        # Bandwidth input of the rebalancers when a call passes none, e.g. RateHistory.demand_fn()
+        self.demand_fn = demand_fn if demand_fn is not None else UE.get_expected_bandwidth
+        self.upf_by_ip: Dict[str, UPF] = dict((upf.get_ip_addr(), upf) for upf in upfs)
     
     def _find_ue_by_ip_addr(self, ues: List[UE], ip_addr: int):
         for ue in ues:
@@ -16,96 +40,149 @@ class LLF:
                 return ue
             
     def _find_upf_by_ip_addr(self, ip_addr: str):
-        for upf in self.upfs:
-            if upf.get_ip_addr() == ip_addr:
-                return upf
+        return self.upf_by_ip.get(ip_addr)
             
     def _find_lowest_index_of_upf_loading_map(self, upf_loading_map: Dict[str, float]):
-        min_loading = 9999
-        min_upf_ip = self.upfs[0].get_ip_addr()
-        
-        for upf_ip, upf_loading in upf_loading_map.items():
-            upf: UPF = self._find_upf_by_ip_addr(upf_ip)
-            print(f"Check min {min_loading}, UPF loading {upf_loading}")
-            if min_loading >= upf_loading:
-                min_loading = upf_loading
-                min_upf_ip = upf.get_ip_addr()
-                
-        return min_upf_ip
+        return min(upf_loading_map.items(), key=lambda item: item[1], default=(self.upfs[0].get_ip_addr(), 0))[0]
+    
+    def allocate(self, ues: List[UE], strategy: AllocationStrategy = AllocationStrategy.WORST_FIT, keep_existing: bool = True, demand_fn: Callable[[UE], float] = None) -> List[UE]:
+        demand_fn = demand_fn if demand_fn is not None else self.demand_fn
+        return UPFAllocator(self.upfs, strategy, self.verbose).allocate(ues, demand_fn=demand_fn, keep_existing=keep_existing)
     
     def allow_swap_match_lowest_upfs(self, ues: List[UE]):
-        upf_available_loading_temp: Dict[str, float] = dict([(upf.ip_addr, upf.max_loading_in_mbps - upf.background_loading_in_mbps) for upf in self.upfs])
-        
-        for ue in ues:
-            ue_ip = ue.get_ip_addr()
-            ue_binding_upf = ue.get_binding_upf()
-            ue_sending_rate = ue.get_expected_bandwidth()
-            
-            if ue.get_binding_upf() == None:
-                continue
-            
-            print(f"Loading information about allocated UE / UE IP {ue_ip} -> UPF IP {ue_binding_upf} / UE Sending Rate {ue_sending_rate} Mbps")
-        
-        key_func: Callable[[UE], int] = lambda u : u.get_expected_bandwidth()
-        ues = sorted(ues, key=key_func, reverse=True)
+        # Re-pack every UE from scratch, first fit over a shuffled UPF order
         upfs = self.upfs.copy()
-        
         random.shuffle(upfs)
         
-        for ue in ues:
-            ue.set_binding_upf(None)
-            
-            for upf in upfs:
-                upf_ip = upf.get_ip_addr()
-                if upf_available_loading_temp[upf_ip] >= ue.expected_bandwidth:
-                    ue.set_binding_upf(upf_ip)
-                    upf_available_loading_temp[upf_ip] -= ue.expected_bandwidth
-                    break
-            if ue.get_binding_upf() == None:
-                maximal = 9999
-                maximal_upf_space = upfs[0].get_ip_addr()
-                for upf in upfs:
-                    upf_ip = upf.get_ip_addr()
-                    if maximal > upf_available_loading_temp[upf_ip]:
-                        maximal = upf_available_loading_temp[upf_ip]
-                        maximal_upf_space = upf_ip
-                ue.set_binding_upf(maximal_upf_space)
-                print(f"Assign UE IP {ue.get_ip_addr()} to {maximal_upf_space} / Expected Bandwidth of UE is {ue.get_expected_bandwidth()} / Outbound UPF bandwidth warning")
-            else:
-                print(f"Assign UE IP {ue.get_ip_addr()} to {upf_ip} / Expected Bandwidth of UE is {ue.get_expected_bandwidth()}")
-                
-        return ues
+        return UPFAllocator(upfs, AllocationStrategy.FIRST_FIT_DECREASING, self.verbose).allocate(ues, demand_fn=self.demand_fn, keep_existing=False)
     
     def match_lowest_upfs(self, ues: List[UE]):
-        upf_available_loading_temp: Dict[str, float] = dict([(upf.ip_addr, upf.max_loading_in_mbps - upf.background_loading_in_mbps) for upf in self.upfs])
-        
-        for ue in ues:
-            ue_ip = ue.get_ip_addr()
-            ue_binding_upf = ue.get_binding_upf()
-            ue_sending_rate = ue.get_expected_bandwidth()
-            
-            if ue.get_binding_upf() == None:
-                continue
-            else:
-                upf_available_loading_temp[ue.get_binding_upf()] -= ue.get_expected_bandwidth()
-                print(f"Loading information about allocated UE / UE IP {ue_ip} -> UPF IP {ue_binding_upf} / UE Sending Rate {ue_sending_rate} Mbps")
-            
-        for upf_ip, sending_rate in upf_available_loading_temp.items():
-            print(f"Now UPF {upf_ip} Backgound Loading {sending_rate}")
+        # Keep existing bindings, place new UEs on the UPF with the most room left
+        return self.allocate(ues, AllocationStrategy.WORST_FIT, keep_existing=True, demand_fn=self.demand_fn)
+
     
+    def incremental_rebalance(self, ues: List[UE], high_watermark: float = 0.9, low_watermark: float = 0.7, migration_budget: int = 16, demand_fn: Callable[[UE], float] = None) -> List[Migration]:
+        with ALLOCATOR_SECONDS.labels("incremental_rebalance").time():
+            return self._incremental_rebalance(ues, high_watermark, low_watermark, migration_budget, demand_fn)
+
+    def _incremental_rebalance(self, ues: List[UE], high_watermark: float, low_watermark: float, migration_budget: int, demand_fn: Callable[[UE], float]) -> List[Migration]:
+        # Only UPFs above high_watermark shed UEs, and only onto UPFs that stay under
+        # low_watermark afterwards, so a UE that just moved is not pushed straight back
+        demand_fn = demand_fn if demand_fn is not None else self.demand_fn
+        capacity: Dict[str, float] = dict((upf.get_ip_addr(), upf.max_loading_in_mbps - upf.background_loading_in_mbps) for upf in self.upfs)
+        load: Dict[str, float] = dict((upf_ip, 0.0) for upf_ip in capacity.keys())
+        bound: Dict[str, List[Tuple[float, int, UE]]] = dict((upf_ip, []) for upf_ip in capacity.keys())
+        migrations: List[Migration] = []
+
+        unbound: List[UE] = []
         for ue in ues:
-            ue_ip = ue.get_ip_addr()
-            if ue.get_binding_upf() == None:
-                maximal = 0
-                maximal_upf_space = self.upfs[0].get_ip_addr()
-                for upf in self.upfs:
-                    upf_ip = upf.get_ip_addr()
-                    if maximal < upf_available_loading_temp[upf_ip]:
-                        maximal = upf_available_loading_temp[upf_ip]
-                        maximal_upf_space = upf_ip
-                ue.set_binding_upf(maximal_upf_space)
-                upf_available_loading_temp[ue.get_binding_upf()] -= ue.get_expected_bandwidth()
-                print(f"Assign UE IP {ue.get_ip_addr()} to {maximal_upf_space} / Expected Bandwidth of UE is {ue.get_expected_bandwidth()}")
-                
-        
-        return ues
\ No newline at end of file
+            upf_ip = ue.get_binding_upf()
+            if upf_ip not in capacity:
+                unbound.append(ue)
+                continue
+            demand = demand_fn(ue)
+            load[upf_ip] += demand
+            bound[upf_ip].append((demand, ue.get_teid(), ue))
+
+        for upf_ip in bound.keys():
+            bound[upf_ip].sort(key=lambda item: (item[0], item[1]))
+
+        heap = [(load[upf_ip] - capacity[upf_ip], upf_ip) for upf_ip in capacity.keys()]
+        heapq.heapify(heap)
+
+        def move(ue: UE, demand: float, old_upf: str, new_upf: str):
+            load[new_upf] += demand
+            heapq.heappush(heap, (load[new_upf] - capacity[new_upf], new_upf))
+            if old_upf is not None:
+                load[old_upf] -= demand
+                heapq.heappush(heap, (load[old_upf] - capacity[old_upf], old_upf))
+            ue.set_binding_upf(new_upf)
+            insort(bound[new_upf], (demand, ue.get_teid(), ue), key=lambda item: (item[0], item[1]))
+            migrations.append(Migration(ue.get_teid(), ue.get_ip_addr(), old_upf, new_upf))
+
+        def most_headroom() -> str:
+            # Lazy heap, drop entries that no longer match the current load
+            while load[heap[0][1]] - capacity[heap[0][1]] != heap[0][0]:
+                heapq.heappop(heap)
+            return heap[0][1]
+
+        # New UEs have no route yet, they are placed regardless of the budget
+        for ue in sorted(unbound, key=demand_fn, reverse=True):
+            move(ue, demand_fn(ue), None, most_headroom())
+
+        overloaded = sorted((upf_ip for upf_ip in capacity.keys() if load[upf_ip] > high_watermark * capacity[upf_ip]), key=lambda upf_ip: load[upf_ip] / capacity[upf_ip], reverse=True)
+
+        for upf_ip in overloaded:
+            while migration_budget > 0 and load[upf_ip] > high_watermark * capacity[upf_ip] and len(bound[upf_ip]) > 0:
+                target = most_headroom()
+                room = low_watermark * capacity[target] - load[target]
+                if target == upf_ip or room <= 0:
+                    break
+
+                excess = load[upf_ip] - high_watermark * capacity[upf_ip]
+                candidates = bound[upf_ip]
+
+                # One UE that covers the whole excess if it fits, else the biggest one that fits
+                index = bisect_left(candidates, excess, key=lambda item: item[0])
+                if index == len(candidates) or candidates[index][0] > room:
+                    index = bisect_right(candidates, room, key=lambda item: item[0]) - 1
+                    if index < 0:
+                        break
+
+                demand, _, ue = candidates.pop(index)
+                move(ue, demand, upf_ip, target)
+                migration_budget -= 1
+
+        if self.verbose:
+            for migration in migrations:
+                print(f"[REBALANCE] TEID {migration.teid} / UE IP {migration.ue_ip} / {migration.old_upf} --> {migration.new_upf}")
+
+        return migrations
+
+    def selector_rebalance(self, ues: List[UE], slots: int = 64, overrides: Dict[int, str] = None, high_watermark: float = 0.9, override_budget: int = 16, demand_fn: Callable[[UE], float] = None) -> SelectorPlan:
+        with ALLOCATOR_SECONDS.labels("selector_rebalance").time():
+            return self._selector_rebalance(ues, slots, overrides if overrides is not None else {}, high_watermark, override_budget, demand_fn)
+
+    def _selector_rebalance(self, ues: List[UE], slots: int, overrides: Dict[int, str], high_watermark: float, override_budget: int, demand_fn: Callable[[UE], float]) -> SelectorPlan:
+        # Hashed UEs split by member slots, so UPFs get slots in proportion to their headroom. A UE
+        # bigger than one slot's worth of traffic skews that split and gets an exact entry instead.
+        demand_fn = demand_fn if demand_fn is not None else self.demand_fn
+        headroom: Dict[str, float] = dict((upf.get_ip_addr(), high_watermark * (upf.max_loading_in_mbps - upf.background_loading_in_mbps)) for upf in self.upfs)
+        demand: Dict[int, float] = dict((ue.get_teid(), demand_fn(ue)) for ue in ues)
+        slot_mbps = sum(demand.values()) / slots
+
+        # Pinned UEs that shrank under half a slot go back to the hash, the gap keeps them from flapping
+        pinned: Dict[int, str] = dict(
+            (teid, upf_ip) for (teid, upf_ip) in overrides.items()
+            if teid in demand and upf_ip in headroom and demand[teid] >= slot_mbps / 2
+        )
+        for teid, upf_ip in pinned.items():
+            headroom[upf_ip] -= demand[teid]
+
+        candidates = sorted((teid for teid in demand.keys() if teid not in pinned and demand[teid] > slot_mbps), key=lambda teid: demand[teid], reverse=True)
+        for teid in candidates[:override_budget]:
+            upf_ip = max(headroom.keys(), key=lambda upf_ip: headroom[upf_ip])
+            pinned[teid] = upf_ip
+            headroom[upf_ip] -= demand[teid]
+
+        weights = self._apportion(dict((upf_ip, max(0.0, room)) for (upf_ip, room) in headroom.items()), slots)
+
+        if self.verbose:
+            print(f"[SELECTOR] Weights {weights} / {len(pinned)} overrides")
+
+        return SelectorPlan(weights, pinned)
+
+    def _apportion(self, shares: Dict[str, float], slots: int) -> Dict[str, int]:
+        # Largest remainder, every slot goes somewhere; no headroom anywhere means an even split
+        total = sum(shares.values())
+        if total <= 0:
+            shares = dict((upf_ip, 1.0) for upf_ip in shares.keys())
+            total = float(len(shares))
+
+        exact = dict((upf_ip, slots * share / total) for (upf_ip, share) in shares.items())
+        weights = dict((upf_ip, int(value)) for (upf_ip, value) in exact.items())
+        by_remainder = sorted(exact.keys(), key=lambda upf_ip: exact[upf_ip] - weights[upf_ip], reverse=True)
+
+        for upf_ip in by_remainder[:slots - sum(weights.values())]:
+            weights[upf_ip] += 1
+        return weights
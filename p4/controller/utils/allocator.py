@@ -0,0 +1,175 @@
+import heapq
+from bisect import bisect_left, insort
+from enum import Enum
+from typing import Callable, Dict, List
+
+from model.ue import UE
+from model.upf import UPF
+from utils.metrics import ALLOCATOR_SECONDS
+
+
+class AllocationStrategy(Enum):
+    LEAST_LOADED = 1
+    FIRST_FIT_DECREASING = 2
+    BEST_FIT = 3
+    WORST_FIT = 4
+
+
+class _MaxSegmentTree:
+    # Max headroom over UPFs in their configured order, so first fit is a descent, not a scan
+    def __init__(self, values: List[float]):
+        self.size = 1
+        while self.size < len(values):
+            self.size *= 2
+        self.tree = [float("-inf")] * (2 * self.size)
+        self.tree[self.size:self.size + len(values)] = values
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def update(self, index: int, value: float):
+        tree = self.tree
+        i = index + self.size
+        tree[i] = value
+        i >>= 1
+        while i >= 1:
+            left, right = tree[2 * i], tree[2 * i + 1]
+            parent = left if left >= right else right
+            # Ancestors above an unchanged node are unchanged too
+            if tree[i] == parent:
+                break
+            tree[i] = parent
+            i >>= 1
+
+    def first_at_least(self, value: float) -> int:
+        if self.tree[1] < value:
+            return -1
+
+        tree = self.tree
+        i = 1
+        while i < self.size:
+            i = 2 * i if tree[2 * i] >= value else 2 * i + 1
+        return i - self.size
+
+    def argmax(self) -> int:
+        i = 1
+        while i < self.size:
+            i = 2 * i if self.tree[2 * i] >= self.tree[2 * i + 1] else 2 * i + 1
+        return i - self.size
+
+
+class UPFAllocator:
+    def __init__(self, upfs: List[UPF], strategy: AllocationStrategy = AllocationStrategy.WORST_FIT, verbose: bool = False):
+        self.upfs = upfs
+        self.strategy = strategy
+        self.verbose = verbose
+        self.upf_index_by_ip: Dict[str, int] = dict((upf.get_ip_addr(), i) for (i, upf) in enumerate(upfs))
+
+    def get_capacities(self) -> List[float]:
+        return [upf.max_loading_in_mbps - upf.background_loading_in_mbps for upf in self.upfs]
+
+    def allocate(self, ues: List[UE], demand_fn: Callable[[UE], float] = None, keep_existing: bool = True) -> List[UE]:
+        with ALLOCATOR_SECONDS.labels(self.strategy.name.lower()).time():
+            return self._allocate(ues, demand_fn, keep_existing)
+
+    def _allocate(self, ues: List[UE], demand_fn: Callable[[UE], float], keep_existing: bool) -> List[UE]:
+        demand_fn = demand_fn if demand_fn is not None else UE.get_expected_bandwidth
+        capacities = self.get_capacities()
+        headroom = list(capacities)
+        pending: List[UE] = []
+
+        for ue in ues:
+            upf_index = self.upf_index_by_ip.get(ue.get_binding_upf()) if keep_existing else None
+            if upf_index is None:
+                pending.append(ue)
+            else:
+                headroom[upf_index] -= demand_fn(ue)
+
+        demands = [(demand_fn(ue), ue) for ue in pending]
+        demands.sort(key=lambda item: item[0], reverse=True)
+
+        if self.strategy == AllocationStrategy.WORST_FIT:
+            assignment = self._worst_fit(demands, headroom)
+        elif self.strategy == AllocationStrategy.LEAST_LOADED:
+            assignment = self._least_loaded(demands, headroom, capacities)
+        elif self.strategy == AllocationStrategy.BEST_FIT:
+            assignment = self._best_fit(demands, headroom)
+        else:
+            assignment = self._first_fit(demands, headroom)
+
+        for (demand, ue), upf_index in zip(demands, assignment):
+            ue.set_binding_upf(self.upfs[upf_index].get_ip_addr())
+            if self.verbose:
+                print(f"Assign UE IP {ue.get_ip_addr()} to {self.upfs[upf_index].get_ip_addr()} / Expected Bandwidth of UE is {demand}")
+
+        if self.verbose:
+            for upf, available in zip(self.upfs, headroom):
+                print(f"Now UPF {upf.get_ip_addr()} Available Loading {available}")
+
+        return ues
+
+    def _worst_fit(self, demands: list, headroom: List[float]) -> List[int]:
+        heap = [(-available, i) for (i, available) in enumerate(headroom)]
+        heapq.heapify(heap)
+        assignment: List[int] = []
+
+        for demand, _ in demands:
+            _, i = heap[0]
+            headroom[i] -= demand
+            heapq.heapreplace(heap, (-headroom[i], i))
+            assignment.append(i)
+
+        return assignment
+
+    def _least_loaded(self, demands: list, headroom: List[float], capacities: List[float]) -> List[int]:
+        def utilization(i):
+            return (capacities[i] - headroom[i]) / capacities[i] if capacities[i] > 0 else float("inf")
+
+        heap = [(utilization(i), i) for i in range(len(headroom))]
+        heapq.heapify(heap)
+        assignment: List[int] = []
+
+        for demand, _ in demands:
+            _, i = heap[0]
+            headroom[i] -= demand
+            heapq.heapreplace(heap, (utilization(i), i))
+            assignment.append(i)
+
+        return assignment
+
+    def _best_fit(self, demands: list, headroom: List[float]) -> List[int]:
+        # The search is a bisect, but pop and insort shift the list, so a placement is O(n) in the
+        # number of UPFs. Neither heap nor segment tree finds the smallest headroom that still fits.
+        ordered = sorted((available, i) for (i, available) in enumerate(headroom))
+        assignment: List[int] = []
+
+        for demand, ue in demands:
+            position = bisect_left(ordered, (demand, -1))
+            if position == len(ordered):
+                # Nothing fits, spill onto the UPF with the most room left
+                position = len(ordered) - 1
+                if self.verbose:
+                    print(f"UE IP {ue.get_ip_addr()} / Expected Bandwidth {demand} / Outbound UPF bandwidth warning")
+
+            _, i = ordered.pop(position)
+            headroom[i] -= demand
+            insort(ordered, (headroom[i], i))
+            assignment.append(i)
+
+        return assignment
+
+    def _first_fit(self, demands: list, headroom: List[float]) -> List[int]:
+        tree = _MaxSegmentTree(headroom)
+        assignment: List[int] = []
+
+        for demand, ue in demands:
+            i = tree.first_at_least(demand)
+            if i == -1:
+                i = tree.argmax()
+                if self.verbose:
+                    print(f"UE IP {ue.get_ip_addr()} / Expected Bandwidth {demand} / Outbound UPF bandwidth warning")
+
+            headroom[i] -= demand
+            tree.update(i, headroom[i])
+            assignment.append(i)
+
+        return assignment
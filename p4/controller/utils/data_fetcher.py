@@ -1,9 +1,9 @@
 import json
-import pytz
-from datetime import datetime
+import time
 from enum import Enum
-from requests import Response, get
-from typing import List
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Tuple
 
 class UPFID(Enum):
     UPF01 = 0
@@ -38,42 +38,97 @@ UPF_N6_DEVICES: List[str] = [
     "enp3s0",
 ]
 
+PROMETHEUS_QUERY_URL: str = "http://192.168.132.47:9090/api/v1/query"
+NODE_EXPORTER_PORT: int = 9100
+
+
+class TelemetryClient:
+    def __init__(self, url: str = PROMETHEUS_QUERY_URL, timeout: float = 2, pool_size: int = 16):
+        self.url = url
+        self.timeout = timeout
+        self.session = Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+
+    def query(self, promql: str) -> List[dict]:
+        resp: Response = self.session.get(self.url, params={
+            "query": promql,
+            "time": f'{int(time.time())}'
+        }, timeout=self.timeout)
+
+        resp_json = json.loads(resp.text)
+        return resp_json["data"]["result"]
+
+    def query_rates(self, metric: str, targets: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        # One query for every (instance, device) pair; the regex may match a few extra
+        # combinations, so anything that was not asked for is dropped here. A target without a
+        # series is left out rather than read as 0, an unscraped UPF is not an idle one
+        if len(targets) == 0:
+            return {}
+
+        instances = "|".join(sorted(set(f"{instance}:{NODE_EXPORTER_PORT}" for (instance, _) in targets)))
+        devices = "|".join(sorted(set(device for (_, device) in targets)))
+        result = self.query(f'rate({metric}{{instance=~"{instances}", device=~"{devices}"}}[1s])*8*1.07')
+
+        wanted = set(targets)
+        rates: Dict[Tuple[str, str], float] = {}
+        for sample in result:
+            instance = sample["metric"]["instance"].rsplit(":", 1)[0]
+            key = (instance, sample["metric"]["device"])
+            if key in wanted:
+                rates[key] = float(sample["value"][1])
+
+        return rates
+
+    def fetch_tunnel_loads_in_bytes(self) -> Dict[Tuple[UPFID, Tunnel], float]:
+        n3_rates = self.query_rates("node_network_receive_bytes_total", list(zip(UPF_IPS, UPF_N3_DEVICES)))
+        n6_rates = self.query_rates("node_network_transmit_bytes_total", list(zip(UPF_IPS, UPF_N6_DEVICES)))
+        loads: Dict[Tuple[UPFID, Tunnel], float] = {}
+
+        # Missing loads stay out, the cache entries of those UPFs turn stale instead
+        for upf in UPFID:
+            n3_key = (UPF_IPS[upf.value], UPF_N3_DEVICES[upf.value])
+            n6_key = (UPF_IPS[upf.value], UPF_N6_DEVICES[upf.value])
+            if n3_key in n3_rates:
+                loads[(upf, Tunnel.N3)] = n3_rates[n3_key]
+            if n6_key in n6_rates:
+                loads[(upf, Tunnel.N6)] = n6_rates[n6_key]
+
+        return loads
+
+    def fetch_ue_sending_rates(self, ues: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        return self.query_rates("node_network_transmit_bytes_total", ues)
+
+
+_default_client: TelemetryClient = None
+
+def get_telemetry_client() -> TelemetryClient:
+    global _default_client
+
+    if _default_client is None:
+        _default_client = TelemetryClient()
+    return _default_client
+
 def fetch_tunnel_load_in_bytes(upf: UPFID, tunnel: Tunnel):
     ip: str = UPF_IPS[upf.value]
-    query_type: str = ""
     
     if tunnel == Tunnel.N3:
-        device = UPF_N3_DEVICES[upf.value]
-        query_type = "node_network_receive_bytes_total"
+        target = (ip, UPF_N3_DEVICES[upf.value])
+        rates = get_telemetry_client().query_rates("node_network_receive_bytes_total", [target])
     else:
-        device = UPF_N6_DEVICES[upf.value]
-        query_type = "node_network_transmit_bytes_total"
-        
-    resp: Response = get("http://192.168.132.47:9090/api/v1/query", params= {
-        "query": f'rate({query_type}{{device="{device}", instance="{ip}:9100"}}[1s])*8*1.07',
-        "time": f'{int(datetime.now(pytz.timezone("Asia/Taipei")).timestamp())}'
-    })
-    
-    resp_json = json.loads(resp.text)
+        target = (ip, UPF_N6_DEVICES[upf.value])
+        rates = get_telemetry_client().query_rates("node_network_transmit_bytes_total", [target])
 
-    return float(resp_json["data"]["result"][0]["value"][1])
+    if target not in rates:
+        raise KeyError(f"No {tunnel.name} load series for UPF {upf.name} ({ip})")
+    return rates[target]
 
 def fetch_ue_sending_rate(instance: str, device: str):
-    resp: Response = get("http://192.168.132.47:9090/api/v1/query", params= {
-        "query": f'rate(node_network_transmit_bytes_total{{instance="{instance}:9100", device="{device}"}}[1s])*8*1.07',
-        "time": f'{int(datetime.now(pytz.timezone("Asia/Taipei")).timestamp())}'
-    })
-    
-    resp_json = json.loads(resp.text)
-    print(resp_json)
-
-    if(len(resp_json["data"]["result"]) == 0):
-        return 0
-
-    return float(resp_json["data"]["result"][0]["value"][1])
+    # None for a UE without a series, it is unknown rather than idle
+    return get_telemetry_client().fetch_ue_sending_rates([(instance, device)]).get((instance, device))
 
 def fetch_ue_speed(index: int):
-    resp: Response = get(f"http://192.168.132.47:7789/ue-data/{index}")
+    client = get_telemetry_client()
+    resp: Response = client.session.get(f"http://192.168.132.47:7789/ue-data/{index}", timeout=client.timeout)
     return int(resp.text)
 
 def fetch_tunnel_load_in_percentage(upf: UPFID, tunnel: Tunnel) -> float:
@@ -0,0 +1,35 @@
+import logging
+import os
+from typing import Any
+
+LOG_LEVEL_ENV: str = "CONTROLLER_LOG_LEVEL"
+
+_configured = False
+
+
+def _format_value(value: Any) -> str:
+    text = str(value)
+    return f'"{text}"' if " " in text or text == "" else text
+
+
+def get_logger(name: str) -> logging.Logger:
+    global _configured
+
+    if not _configured:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"))
+        root = logging.getLogger("controller")
+        root.addHandler(handler)
+        root.setLevel(os.environ.get(LOG_LEVEL_ENV, "INFO").upper())
+        root.propagate = False
+        _configured = True
+
+    return logging.getLogger(f"controller.{name}")
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    # Formatting the fields is the expensive part, skip it when the level is off
+    if not logger.isEnabledFor(level):
+        return
+
+    logger.log(level, " ".join([f"event={event}"] + [f"{key}={_format_value(value)}" for (key, value) in fields.items()]))
@@ -0,0 +1,26 @@
+from typing import Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, disable_created_metrics, start_http_server
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Only the controller's own series, no process or platform collectors, and no _created series
+REGISTRY = CollectorRegistry()
+disable_created_metrics()
+
+SWITCH_TABLE_WRITES = Counter("controller_switch_table_writes_total", "Table entries written to the switch", ("table", "op"), registry=REGISTRY)
+SWITCH_TABLE_WRITE_SECONDS = Histogram("controller_switch_table_write_seconds", "Latency of one table write RPC", ("table", "op"), buckets=DEFAULT_BUCKETS, registry=REGISTRY)
+SWITCH_SUPPRESSED_WRITES = Counter("controller_switch_suppressed_writes_total", "Table writes skipped because the shadow already matched", ("table",), registry=REGISTRY)
+SWITCH_TRANSACTIONS = Counter("controller_switch_transactions_total", "Table write transactions by outcome", ("result",), registry=REGISTRY)
+SWITCH_RPC_ERRORS = Counter("controller_switch_rpc_errors_total", "Failed switch RPCs", ("transport", "op"), registry=REGISTRY)
+SWITCH_REGISTER_READ_SECONDS = Histogram("controller_switch_register_read_seconds", "Latency of register reads", ("register", "op"), buckets=DEFAULT_BUCKETS, registry=REGISTRY)
+PHASE_SECONDS = Histogram("controller_phase_seconds", "Duration of control loop phases", ("phase",), buckets=DEFAULT_BUCKETS, registry=REGISTRY)
+PHASE_OVERRUNS = Counter("controller_phase_overruns_total", "Control loop phases that ran past their deadline", ("phase",), registry=REGISTRY)
+UPF_UE_COUNT = Gauge("controller_upf_ue_count", "UEs bound to each UPF", ("upf",), registry=REGISTRY)
+UPF_LOAD_MBPS = Gauge("controller_upf_load_mbps", "Expected load bound to each UPF", ("upf",), registry=REGISTRY)
+ALLOCATOR_SECONDS = Histogram("controller_allocator_seconds", "Allocator runtime per rebalance", ("method",), buckets=DEFAULT_BUCKETS, registry=REGISTRY)
+
+
+def start_metrics_server(port: int = 9200, host: str = "0.0.0.0", registry: CollectorRegistry = REGISTRY):
+    # Serves /metrics from a daemon thread, returns (server, thread)
+    return start_http_server(port, addr=host, registry=registry)
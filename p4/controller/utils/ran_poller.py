@@ -0,0 +1,54 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from model.ran import RAN
+from utils.log import get_logger, log_event
+from utils.uemgr import UEMgr
+
+log = get_logger("ran_poller")
+
+@dataclass
+class RANDiff:
+    added: List[dict] = field(default_factory=list)
+    removed: List[dict] = field(default_factory=list)
+    error: Exception = None
+
+
+class RANPoller:
+    def __init__(self, rans: List[RAN], uemgr: UEMgr, timeout: float = 1.0):
+        self.rans = rans
+        self.uemgr = uemgr
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(rans)), thread_name_prefix="ran-poller")
+
+    def _fetch(self, ran: RAN) -> RANDiff:
+        try:
+            added, removed = ran.fetch_up_ues(self.timeout)
+        except Exception as e:
+            # A gNB that does not answer keeps its last snapshot
+            log_event(log, logging.WARNING, "ran_poll_failed", gnb=ran.get_ip_addr(), error=e)
+            return RANDiff(error=e)
+        return RANDiff(added, removed)
+
+    def poll(self) -> Dict[str, RANDiff]:
+        futures = dict((ran.get_ip_addr(), self.executor.submit(self._fetch, ran)) for ran in self.rans)
+        diffs = dict((ran_ip, future.result()) for (ran_ip, future) in futures.items())
+
+        # Removals first, a UE that moved between gNBs is then registered on the new one
+        for ran_ip, diff in diffs.items():
+            for ue in diff.removed:
+                self.uemgr.unregister_ue_device_and_instance(ue["ip"], ran_ip)
+
+        for ran_ip, diff in diffs.items():
+            for ue in diff.added:
+                try:
+                    self.uemgr.register_ue_device_and_instance(ue["ip"], ue["device"], ran_ip)
+                except KeyError:
+                    log_event(log, logging.WARNING, "ran_ue_outside_pools", gnb=ran_ip, ip=ue["ip"])
+
+        return diffs
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,197 @@
+import threading
+from enum import Enum
+from typing import Callable, Dict, Hashable, List
+
+import numpy as np
+
+from model.ue import UE
+
+DEFAULT_DEPTH = 120
+
+
+class Estimate(Enum):
+    EWMA = 1
+    PERCENTILE = 2
+    PEAK = 3
+
+
+class RateHistory:
+    # One row per series (a UE, a UPF), one column per record() call, the last depth columns kept.
+    # Memory is capacity x depth however long the controller runs; a new series past capacity
+    # takes the row of the one that has gone longest without a sample. A row sampled in the same
+    # record() is never taken, new series that find no other row wait for a later one.
+    def __init__(self, capacity: int, depth: int = DEFAULT_DEPTH, alpha: float = 0.3, percentile: float = 95.0, peak_horizon: int = 10):
+        self.capacity = capacity
+        self.depth = depth
+        self.alpha = alpha
+        self.percentile = percentile
+        self.peak_horizon = min(peak_horizon, depth)
+        self.lock = threading.Lock()
+
+        # NaN is "no sample", so a young or silent series does not read as idle
+        self.values = np.full((capacity, depth), np.nan, dtype=np.float32)
+        self.ewma = np.full(capacity, np.nan, dtype=np.float32)
+        self.last_seen = np.full(capacity, -1, dtype=np.int64)
+        self.head = 0
+        self.ticks = 0
+        self.dropped = 0
+
+        self.slot_of: Dict[Hashable, int] = {}
+        self.key_of: Dict[int, Hashable] = {}
+        # Estimates for every row at once, rebuilt on the first read after a record()
+        self.estimates: Dict[Estimate, np.ndarray] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.slot_of
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _slot(self, key: Hashable) -> int:
+        slot = self.slot_of.get(key)
+        if slot is not None:
+            return slot
+
+        if len(self.slot_of) < self.capacity:
+            slot = len(self.slot_of)
+        else:
+            slot = int(np.argmin(self.last_seen))
+            # Every row is already sampled in this record()
+            if self.last_seen[slot] >= self.ticks:
+                return None
+            del self.slot_of[self.key_of.pop(slot)]
+
+        self.values[slot] = np.nan
+        self.ewma[slot] = np.nan
+        # Claimed now, so a second new key in the same record() cannot take this row as well
+        self.last_seen[slot] = self.ticks
+        self.slot_of[key] = slot
+        self.key_of[slot] = key
+        return slot
+
+    def forget(self, key: Hashable):
+        with self.lock:
+            slot = self.slot_of.pop(key, None)
+            if slot is None:
+                return
+
+            # The last row moves into the hole so the rows in use stay packed at the front
+            last = len(self.slot_of)
+            if slot != last:
+                moved = self.key_of.pop(last)
+                self.values[slot] = self.values[last]
+                self.ewma[slot] = self.ewma[last]
+                self.last_seen[slot] = self.last_seen[last]
+                self.slot_of[moved] = slot
+                self.key_of[slot] = moved
+            else:
+                self.key_of.pop(slot)
+
+            self.values[last] = np.nan
+            self.ewma[last] = np.nan
+            self.last_seen[last] = -1
+            self.estimates = {}
+
+    def record(self, rates: Dict[Hashable, float]):
+        # One tick for every series, the ones missing from rates get no sample for it
+        with self.lock:
+            # Series already known are claimed first, a new one must not evict a row sampled in this call
+            known = [self.slot_of.get(key) for key in rates.keys()]
+            self.last_seen[[slot for slot in known if slot is not None]] = self.ticks
+
+            slots: List[int] = []
+            samples: List[float] = []
+            for key, slot, rate in zip(rates.keys(), known, rates.values()):
+                slot = slot if slot is not None else self._slot(key)
+                if slot is None:
+                    self.dropped += 1
+                    continue
+                slots.append(slot)
+                samples.append(rate)
+
+            slots = np.array(slots, dtype=np.int64)
+            samples = np.array(samples, dtype=np.float32)
+
+            self.values[:, self.head] = np.nan
+            self.values[slots, self.head] = samples
+
+            previous = self.ewma[slots]
+            self.ewma[slots] = np.where(np.isnan(previous), samples, self.alpha * samples + (1 - self.alpha) * previous)
+            self.last_seen[slots] = self.ticks
+
+            self.head = (self.head + 1) % self.depth
+            self.ticks += 1
+            self.estimates = {}
+
+    def _recent(self, rows: int, steps: int) -> np.ndarray:
+        columns = (self.head - 1 - np.arange(min(steps, self.depth))) % self.depth
+        return self.values[:rows, columns]
+
+    def _estimate(self, estimate: Estimate) -> np.ndarray:
+        cached = self.estimates.get(estimate)
+        if cached is not None:
+            return cached
+
+        rows = len(self.slot_of)
+        if estimate == Estimate.EWMA:
+            result = self.ewma[:rows].copy()
+        else:
+            recent = self._recent(rows, self.depth if estimate == Estimate.PERCENTILE else self.peak_horizon)
+            # All-NaN rows stay NaN, the caller's fallback covers them
+            valid = ~np.isnan(recent).all(axis=1)
+            result = np.full(rows, np.nan, dtype=np.float32)
+            if valid.any():
+                if estimate == Estimate.PERCENTILE:
+                    result[valid] = self._percentile(recent[valid])
+                else:
+                    result[valid] = np.nanmax(recent[valid], axis=1)
+
+        self.estimates[estimate] = result
+        return result
+
+    def _percentile(self, recent: np.ndarray) -> np.ndarray:
+        # np.nanpercentile loops over rows in Python; sorting puts NaN last, so each row's percentile
+        # is a linear interpolation between two of its first `count` sorted values
+        ordered = np.sort(recent, axis=1)
+        count = (~np.isnan(recent)).sum(axis=1)
+        position = (count - 1) * (self.percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, count - 1)
+
+        low_values = np.take_along_axis(ordered, lower[:, None], axis=1)[:, 0]
+        high_values = np.take_along_axis(ordered, upper[:, None], axis=1)[:, 0]
+        return low_values + (high_values - low_values) * (position - lower)
+
+    def get(self, key: Hashable, estimate: Estimate = Estimate.EWMA, default: float = None) -> float:
+        with self.lock:
+            slot = self.slot_of.get(key)
+            if slot is None:
+                return default
+
+            value = self._estimate(estimate)[slot]
+        return default if np.isnan(value) else float(value)
+
+    def get_all(self, estimate: Estimate = Estimate.EWMA) -> Dict[Hashable, float]:
+        with self.lock:
+            values = self._estimate(estimate)
+            return dict((key, float(values[slot])) for (key, slot) in self.slot_of.items() if not np.isnan(values[slot]))
+
+    def get_series(self, key: Hashable) -> List[float]:
+        # Oldest first, slots without a sample left out
+        with self.lock:
+            slot = self.slot_of.get(key)
+            if slot is None:
+                return []
+
+            series = self._recent(slot + 1, self.depth)[slot][::-1]
+        return [float(value) for value in series if not np.isnan(value)]
+
+    def demand_fn(self, estimate: Estimate = Estimate.EWMA, fallback: Callable[[UE], float] = None) -> Callable[[UE], float]:
+        # Keyed by TEID; UEs without history yet fall back, by default to their expected bandwidth
+        fallback = fallback if fallback is not None else UE.get_expected_bandwidth
+
+        def demand(ue: UE) -> float:
+            value = self.get(ue.get_teid(), estimate)
+            return value if value is not None else fallback(ue)
+
+        return demand
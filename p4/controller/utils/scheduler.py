@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Set
+
+from utils.log import get_logger, log_event
+from utils.metrics import PHASE_OVERRUNS, PHASE_SECONDS
+
+log = get_logger("scheduler")
+
+@dataclass
+class Phase:
+    name: str
+    fn: Callable[[], Any]
+    period: float = None
+    # A run past it is logged, and the next run waits a full period from the end of the late one
+    deadline: float = None
+    triggers: List[str] = field(default_factory=list)
+    # Phases that share state with this one and must never run at the same time
+    conflicts: List[str] = field(default_factory=list)
+
+@dataclass
+class PhaseStats:
+    runs: int = 0
+    errors: int = 0
+    overruns: int = 0
+    skipped: int = 0
+    last_duration: float = 0.0
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+    durations: Deque[float] = field(default_factory=lambda: deque(maxlen=256))
+
+    def get_mean_duration(self) -> float:
+        return self.total_duration / self.runs if self.runs > 0 else 0.0
+
+
+class ControlLoopScheduler:
+    def __init__(self, max_workers: int = 4):
+        self.phases: Dict[str, Phase] = {}
+        self.stats: Dict[str, PhaseStats] = {}
+        self.next_run: Dict[str, float] = {}
+        self.running: Dict[str, Future] = {}
+        self.pending_events: Set[str] = set()
+        self.deferred_events: Set[str] = set()
+        # Set when a phase finishes, so a finish between run_once() and the wait is not slept through
+        self.phase_finished = False
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="phase")
+        self.wakeup = threading.Condition()
+        self._stopped = False
+
+    def add_phase(self, name: str, fn: Callable[[], Any], period: float = None, deadline: float = None, triggers: List[str] = None, conflicts: List[str] = None):
+        self.phases[name] = Phase(name, fn, period, deadline if deadline is not None else period, triggers or [], conflicts or [])
+        self.stats[name] = PhaseStats()
+        self.next_run[name] = time.monotonic() if period is not None else float("inf")
+
+        for other in conflicts or []:
+            if other in self.phases and name not in self.phases[other].conflicts:
+                self.phases[other].conflicts.append(name)
+
+    def trigger(self, event: str):
+        with self.wakeup:
+            self.pending_events.add(event)
+            self.wakeup.notify()
+
+    def stop(self):
+        with self.wakeup:
+            self._stopped = True
+            self.wakeup.notify()
+
+    def _run_phase(self, phase: Phase):
+        start = time.monotonic()
+        stats = self.stats[phase.name]
+
+        try:
+            phase.fn()
+        except Exception as e:
+            stats.errors += 1
+            log_event(log, logging.ERROR, "phase_failed", phase=phase.name, error=e)
+        finally:
+            duration = time.monotonic() - start
+            stats.runs += 1
+            stats.last_duration = duration
+            stats.max_duration = max(stats.max_duration, duration)
+            stats.total_duration += duration
+            stats.durations.append(duration)
+            PHASE_SECONDS.labels(phase.name).observe(duration)
+            overran = phase.deadline is not None and duration > phase.deadline
+            if overran:
+                stats.overruns += 1
+                PHASE_OVERRUNS.labels(phase.name).inc()
+                log_event(log, logging.WARNING, "phase_overrun", phase=phase.name, seconds=round(duration, 4), deadline=phase.deadline)
+
+            with self.wakeup:
+                if overran and phase.period is not None:
+                    # Otherwise the late run is already due again and the phase runs back to back
+                    self.next_run[phase.name] = max(self.next_run[phase.name], time.monotonic() + phase.period)
+                self.running.pop(phase.name, None)
+                self.phase_finished = True
+                self.wakeup.notify()
+
+    def _is_blocked(self, phase: Phase) -> bool:
+        return phase.name in self.running or any(other in self.running for other in phase.conflicts)
+
+    def run_once(self) -> float:
+        now = time.monotonic()
+
+        with self.wakeup:
+            events = self.pending_events | self.deferred_events
+            self.pending_events = set()
+            self.deferred_events = set()
+            self.phase_finished = False
+
+        for name, phase in self.phases.items():
+            triggered = [event for event in phase.triggers if event in events]
+            due = now >= self.next_run[name]
+            if len(triggered) == 0 and not due:
+                continue
+
+            if name in self.running:
+                # Still busy from the last round, the tick is lost
+                if due:
+                    self.stats[name].skipped += 1
+                    self.next_run[name] = now + phase.period
+            elif self._is_blocked(phase):
+                # A conflicting phase is running; next_run stays due and its finish wakes us up
+                pass
+            else:
+                if phase.period is not None:
+                    self.next_run[name] = now + phase.period
+                with self.wakeup:
+                    self.running[name] = self.executor.submit(self._run_phase, phase)
+                continue
+
+            if len(triggered) > 0:
+                with self.wakeup:
+                    self.deferred_events.update(triggered)
+
+        # Blocked phases are due already, waiting on them would spin until the conflict finishes
+        with self.wakeup:
+            next_runs = [self.next_run[name] for (name, phase) in self.phases.items() if not self._is_blocked(phase)]
+        return min(next_runs, default=float("inf")) - time.monotonic()
+
+    def run_forever(self):
+        while True:
+            wait_time = self.run_once()
+
+            with self.wakeup:
+                if self._stopped:
+                    break
+                if len(self.pending_events) == 0 and not self.phase_finished:
+                    self.wakeup.wait(timeout=max(0.001, min(wait_time, 1.0)))
+                if self._stopped:
+                    break
+
+        self.executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, dict]:
+        return dict((name, {
+            "runs": stats.runs,
+            "errors": stats.errors,
+            "overruns": stats.overruns,
+            "skipped": stats.skipped,
+            "last_duration": stats.last_duration,
+            "mean_duration": stats.get_mean_duration(),
+            "max_duration": stats.max_duration,
+        }) for (name, stats) in self.stats.items())
@@ -0,0 +1,130 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, Tuple
+
+from utils.log import get_logger, log_event
+
+log = get_logger("state_journal")
+
+DEFAULT_COMPACT_EVERY = 10000
+
+OP_PUT = "put"
+OP_SET = "set"
+OP_DEL = "del"
+
+
+class StateJournal:
+    # Controller state as (kind, key) -> fields. Changes are appended to a journal table, and
+    # compact() folds the journal into the snapshot table in one transaction.
+    def __init__(self, path: str, compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        # SQLite work happens under its own lock, callers queueing changes never wait on a commit
+        self.db_lock = threading.Lock()
+        # Latest change per (kind, key) since the last flush, so a busy key costs one row per flush
+        self.pending: Dict[Tuple[str, str], Tuple[str, dict]] = {}
+        self.journal_rows = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS snapshot (kind TEXT NOT NULL, key TEXT NOT NULL, fields TEXT NOT NULL, PRIMARY KEY (kind, key))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS journal (seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, fields TEXT)")
+        self.journal_rows = self.conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    def _queue(self, op: str, kind: str, key: Hashable, fields: dict = None):
+        pending_key = (kind, json.dumps(key))
+
+        with self.lock:
+            previous = self.pending.get(pending_key)
+
+            if op == OP_PUT and previous is not None and previous[0] != OP_DEL:
+                op, fields = previous[0], dict(previous[1], **fields)
+            elif op == OP_PUT and previous is not None:
+                # put after delete starts the record over
+                op = OP_SET
+            self.pending[pending_key] = (op, fields)
+
+    def put(self, kind: str, key: Hashable, **fields):
+        self._queue(OP_PUT, kind, key, fields)
+
+    def set(self, kind: str, key: Hashable, **fields):
+        self._queue(OP_SET, kind, key, fields)
+
+    def delete(self, kind: str, key: Hashable):
+        self._queue(OP_DEL, kind, key)
+
+    def flush(self) -> int:
+        # Swapped under db_lock too, so two flushes cannot land their rows out of order
+        with self.db_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+
+            if len(pending) > 0:
+                rows = [(op, kind, key, json.dumps(fields) if fields is not None else None) for ((kind, key), (op, fields)) in pending.items()]
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT INTO journal (op, kind, key, fields) VALUES (?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+                self.journal_rows += len(rows)
+
+            if self.journal_rows >= self.compact_every:
+                self._compact()
+
+        return len(pending)
+
+    @staticmethod
+    def _apply(state: Dict[str, Dict[str, dict]], op: str, kind: str, key: str, fields: dict):
+        records = state.setdefault(kind, {})
+
+        if op == OP_DEL:
+            records.pop(key, None)
+        elif op == OP_SET or key not in records:
+            records[key] = fields
+        else:
+            records[key].update(fields)
+
+    def _read(self) -> Dict[str, Dict[str, dict]]:
+        state: Dict[str, Dict[str, dict]] = {}
+
+        for kind, key, fields in self.conn.execute("SELECT kind, key, fields FROM snapshot"):
+            state.setdefault(kind, {})[key] = json.loads(fields)
+        for op, kind, key, fields in self.conn.execute("SELECT op, kind, key, fields FROM journal ORDER BY seq"):
+            self._apply(state, op, kind, key, json.loads(fields) if fields is not None else None)
+
+        return state
+
+    def _compact(self):
+        start = time.perf_counter()
+        state = self._read()
+
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM snapshot")
+        self.conn.executemany("INSERT INTO snapshot (kind, key, fields) VALUES (?, ?, ?)", [
+            (kind, key, json.dumps(fields)) for (kind, records) in state.items() for (key, fields) in records.items()
+        ])
+        self.conn.execute("DELETE FROM journal")
+        self.conn.execute("COMMIT")
+
+        log_event(log, logging.INFO, "journal_compacted", journal_rows=self.journal_rows, records=sum(len(records) for records in state.values()), seconds=round(time.perf_counter() - start, 4))
+        self.journal_rows = 0
+
+    def compact(self):
+        self.flush()
+        with self.db_lock:
+            self._compact()
+
+    def load(self) -> Dict[str, Dict[Any, dict]]:
+        # kind -> key -> fields, keys decoded back to what put()/set()/delete() were given
+        with self.db_lock:
+            state = self._read()
+
+        return dict((kind, dict((json.loads(key), fields) for (key, fields) in records.items())) for (kind, records) in state.items())
+
+    def close(self):
+        self.flush()
+        with self.db_lock:
+            self.conn.close()
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+
+from core.switch_controller import SwitchController
+from model.ue import UE
+from utils.teid_space import TEIDSlotMap
+
+DEFAULT_COUNTER = "ue_teid_counter"
+DEFAULT_DEPTH = 16
+
+
+class TEIDCounterMonitor:
+    # Per-TEID byte/packet counters from the switch. Each sample() is one bulk counter read kept in a
+    # ring of the last depth samples; rates are taken over the samples inside window seconds.
+    # With a slot map the counter is indexed by slot instead of by TEID, see core.teid_manager.
+    def __init__(self, switch: SwitchController, counter_name: str = DEFAULT_COUNTER, depth: int = DEFAULT_DEPTH, window: float = 1.0, ttl: float = 3.0, slot_map: TEIDSlotMap = None):
+        self.switch = switch
+        self.slot_map = slot_map
+        self.counter_name = counter_name
+        self.depth = depth
+        self.window = window
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+        self.times = np.zeros(depth)
+        # (depth, counter size), allocated on the first sample once the size is known
+        self.byte_ring: np.ndarray = None
+        self.packet_ring: np.ndarray = None
+        self.head = 0
+        self.samples = 0
+
+        self.byte_rates = np.zeros(0)
+        self.packet_rates = np.zeros(0)
+        self.sampled_at: float = None
+
+    def sample(self, now: float = None) -> int:
+        byte_counts, packet_counts = self.switch.dump_counter(self.counter_name)
+        now = now if now is not None else time.monotonic()
+        byte_counts = np.frombuffer(byte_counts, dtype=np.uint64)
+        packet_counts = np.frombuffer(packet_counts, dtype=np.uint64)
+
+        with self.lock:
+            if self.byte_ring is None or self.byte_ring.shape[1] != len(byte_counts):
+                self.byte_ring = np.zeros((self.depth, len(byte_counts)), dtype=np.uint64)
+                self.packet_ring = np.zeros((self.depth, len(packet_counts)), dtype=np.uint64)
+                self.samples = 0
+
+            self.times[self.head] = now
+            self.byte_ring[self.head] = byte_counts
+            self.packet_ring[self.head] = packet_counts
+            self.head = (self.head + 1) % self.depth
+            self.samples = min(self.samples + 1, self.depth)
+            self.sampled_at = now
+
+            if self.samples >= 2:
+                self._update_rates(now)
+
+        return len(byte_counts)
+
+    def _update_rates(self, now: float):
+        newest = (self.head - 1) % self.depth
+        # Oldest sample still inside the window, or the one before the newest if they all fell out
+        oldest = (newest - 1) % self.depth
+        for back in range(self.samples - 1, 0, -1):
+            index = (newest - back) % self.depth
+            if self.times[index] >= now - self.window:
+                oldest = index
+                break
+
+        elapsed = self.times[newest] - self.times[oldest]
+        if elapsed <= 0:
+            return
+
+        # A counter that went backwards was cleared, it counts as no traffic rather than a negative rate
+        byte_delta = self.byte_ring[newest].astype(np.int64) - self.byte_ring[oldest].astype(np.int64)
+        packet_delta = self.packet_ring[newest].astype(np.int64) - self.packet_ring[oldest].astype(np.int64)
+        self.byte_rates = np.maximum(byte_delta, 0) / elapsed
+        self.packet_rates = np.maximum(packet_delta, 0) / elapsed
+
+    def _index(self, teid: int) -> int:
+        if self.slot_map is None:
+            return teid
+        slot = self.slot_map.get(teid)
+        return slot if slot is not None else -1
+
+    def has(self, teid: int) -> bool:
+        return 0 <= self._index(teid) < len(self.byte_rates)
+
+    def forget(self, teid: int):
+        # Flattens the index's history to its newest sample, whoever gets the index next starts at no traffic
+        with self.lock:
+            index = self._index(teid)
+            if not 0 <= index < len(self.byte_rates):
+                return
+
+            newest = (self.head - 1) % self.depth
+            self.byte_ring[:, index] = self.byte_ring[newest, index]
+            self.packet_ring[:, index] = self.packet_ring[newest, index]
+            self.byte_rates[index] = 0
+            self.packet_rates[index] = 0
+
+    def is_stale(self) -> bool:
+        return self.sampled_at is None or time.monotonic() - self.sampled_at > self.ttl
+
+    def get_rate(self, teid: int) -> float:
+        # Bytes per second; node_exporter rates are bits per second, see RateCache.get_ue_rate
+        return float(self.byte_rates[self._index(teid)]) if self.has(teid) else 0.0
+
+    def get_packet_rate(self, teid: int) -> float:
+        return float(self.packet_rates[self._index(teid)]) if self.has(teid) else 0.0
+
+    def get_rates(self) -> np.ndarray:
+        # Indexed like the counter, by slot when there is a slot map
+        return self.byte_rates
+
+    def get_mbps(self, teid: int) -> float:
+        return self.get_rate(teid) * 8 / 1e6
+
+    def demand_mbps(self, ue: UE) -> float:
+        # For the allocator's demand_fn; UEs the counters cannot speak for keep their expected bandwidth
+        if self.is_stale() or not self.has(ue.get_teid()):
+            return ue.get_expected_bandwidth()
+        return self.get_mbps(ue.get_teid())
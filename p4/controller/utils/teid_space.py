@@ -0,0 +1,69 @@
+import heapq
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+TEID_BITS = 32
+NO_TEID = -1
+
+
+class TEIDSlotMap:
+    # Live TEIDs packed into [0, size) so registers and counters sized for the live sessions, not
+    # for the 32-bit TEID space, can be indexed by slot. Holding a slot is what makes a TEID live;
+    # memory is one dict entry per live TEID plus the slot array. Freed slots are reused lowest first.
+    def __init__(self, size: int):
+        self.size = size
+        self.slot_of: Dict[int, int] = {}
+        # slot -> TEID, NO_TEID when free; lets a whole counter read map back to TEIDs at once
+        self.teids = np.full(size, NO_TEID, dtype=np.int64)
+        # Min-heap of free slots; a slot claimed out of order stays in it and is skipped when popped
+        self.free: List[int] = list(range(size))
+
+    def __contains__(self, teid: int) -> bool:
+        return teid in self.slot_of
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.slot_of.keys())
+
+    def get(self, teid: int) -> int:
+        return self.slot_of.get(teid)
+
+    def get_teid(self, slot: int) -> int:
+        return int(self.teids[slot])
+
+    def is_full(self) -> bool:
+        return len(self.slot_of) >= self.size
+
+    def assign(self, teid: int, slot: int = None) -> int:
+        current = self.slot_of.get(teid)
+        if current is not None:
+            return current
+        if not 0 <= teid < (1 << TEID_BITS):
+            raise ValueError(f"TEID {teid} is outside the 32-bit TEID space")
+
+        if slot is None:
+            if self.is_full():
+                raise KeyError(f"No free slot for TEID {teid}")
+            slot = heapq.heappop(self.free)
+            while self.teids[slot] != NO_TEID:
+                slot = heapq.heappop(self.free)
+        elif self.teids[slot] != NO_TEID:
+            # Slots read back from the switch keep their index
+            raise KeyError(f"Slot {slot} already holds TEID {self.teids[slot]}")
+
+        self.slot_of[teid] = slot
+        self.teids[slot] = teid
+        return slot
+
+    def release(self, teid: int) -> int:
+        slot = self.slot_of.pop(teid, None)
+        if slot is None:
+            return None
+
+        self.teids[slot] = NO_TEID
+        # Lowest slot first keeps the used slots packed at the front
+        heapq.heappush(self.free, slot)
+        return slot
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Set, Tuple
+
+from utils.data_fetcher import TelemetryClient, Tunnel, UPFID, get_telemetry_client
+from utils.log import get_logger, log_event
+
+log = get_logger("telemetry_collector")
+
+@dataclass
+class CachedRate:
+    value: float
+    updated_at: float
+
+
+class RateCache:
+    def __init__(self, ttl: float = 3.0):
+        self.ttl = ttl
+        self.rates: Dict[Hashable, CachedRate] = {}
+        self.wanted_ues: Set[Tuple[str, str]] = set()
+        self.lock = threading.Lock()
+        # utils.teid_counters.TEIDCounterMonitor, when installed it answers for every TEID it covers
+        self.teid_counters = None
+
+    def put(self, key: Hashable, value: float, now: float = None):
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            self.rates[key] = CachedRate(value, now)
+
+    def get(self, key: Hashable, default: float = None) -> float:
+        # None for a key without a series yet, so a rate nobody has seen does not read as idle
+        cached = self.rates.get(key)
+        return cached.value if cached is not None else default
+
+    def is_stale(self, key: Hashable) -> bool:
+        cached = self.rates.get(key)
+        return cached is None or time.monotonic() - cached.updated_at > self.ttl
+
+    def get_upf_rate(self, upf: UPFID, tunnel: Tunnel) -> float:
+        return self.get((upf, tunnel))
+
+    def install_teid_counters(self, teid_counters):
+        self.teid_counters = teid_counters
+
+    def _counts_teid(self, teid: int) -> bool:
+        return teid is not None and self.teid_counters is not None and self.teid_counters.has(teid)
+
+    def is_ue_rate_stale(self, instance: str, device: str, teid: int = None) -> bool:
+        if self._counts_teid(teid):
+            return self.teid_counters.is_stale()
+        return self.is_stale((instance, device))
+
+    def get_ue_rate(self, instance: str, device: str, teid: int = None) -> float:
+        # Switch counters need no scrape and no per-UE query, a UE they cover is never tracked here.
+        # Bits per second either way, the counters count bytes
+        if self._counts_teid(teid):
+            return self.teid_counters.get_rate(teid) * 8
+
+        key = (instance, device)
+
+        # First read of a UE only asks the collector to start tracking it
+        if key not in self.rates:
+            with self.lock:
+                self.wanted_ues.add(key)
+        return self.get(key)
+
+    def get_wanted_ues(self):
+        with self.lock:
+            return list(self.wanted_ues)
+
+
+class TelemetryCollector:
+    def __init__(self, cache: RateCache, client: TelemetryClient = None, interval: float = 1.0):
+        self.cache = cache
+        self.client = client if client is not None else get_telemetry_client()
+        self.interval = interval
+        self.refresh_count = 0
+        self.error_count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def track_ue(self, instance: str, device: str):
+        with self.cache.lock:
+            self.cache.wanted_ues.add((instance, device))
+
+    def refresh(self):
+        now = time.monotonic()
+
+        for key, value in self.client.fetch_tunnel_loads_in_bytes().items():
+            self.cache.put(key, value, now)
+
+        for key, value in self.client.fetch_ue_sending_rates(self.cache.get_wanted_ues()).items():
+            self.cache.put(key, value, now)
+
+        self.refresh_count += 1
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                # Entries keep their old timestamp and turn stale on their own
+                self.error_count += 1
+                log_event(log, logging.WARNING, "telemetry_refresh_failed", error=e)
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_rate_cache: RateCache = None
+
+def install_rate_cache(cache: RateCache):
+    global _rate_cache
+    _rate_cache = cache
+
+def get_rate_cache() -> RateCache:
+    return _rate_cache
@@ -0,0 +1,120 @@
+import logging
+from queue import Empty, Queue
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from core.digest_listener import DigestListener
+from core.switch_controller import SwitchController
+from model.ue import UE
+from utils.log import get_logger, log_event
+from utils.uemgr import UEMgr
+
+log = get_logger("ue_discovery")
+
+DEFAULT_LEARN = "ue_teid_digest"
+DEFAULT_REGISTER = "ue_ip_reg"
+
+
+class UEDiscovery:
+    # (TEID, UE IP) pairs from the switch into UEMgr; subclasses decide where the pairs come from
+    def __init__(self, uemgr: UEMgr):
+        self.uemgr = uemgr
+        self.known_teids: Dict[int, int] = {}
+
+    def mark_known(self, teid: int, ip_hex: int):
+        self.known_teids[teid] = ip_hex
+
+    def forget(self, teid: int, ip_hex: int):
+        # Learned again from the next read, unless the TEID already belongs to another UE
+        if self.known_teids.get(teid) == ip_hex:
+            del self.known_teids[teid]
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def _discover(self, pairs: Iterable[Tuple[int, int]]) -> List[UE]:
+        new_ues: List[UE] = []
+
+        for teid, ip_hex in pairs:
+            # The data plane keeps reporting the same flow until the entry ages out
+            if ip_hex == 0 or self.known_teids.get(teid) == ip_hex:
+                continue
+
+            # Only a UE that could be built counts as known, anything else is tried again next time
+            try:
+                self.uemgr.register_ue_teid(ip_hex, teid)
+                ue = self.uemgr.get_ue(ip_hex)
+            except KeyError:
+                log_event(log, logging.WARNING, "discovery_unknown_ue", ip=ip_hex, teid=teid)
+                continue
+            except RuntimeError as e:
+                log_event(log, logging.WARNING, "discovery_ue_not_ready", ip=ip_hex, teid=teid, error=e)
+                continue
+
+            self.known_teids[teid] = ip_hex
+            new_ues.append(ue)
+
+        return new_ues
+
+    def poll(self) -> List[UE]:
+        raise NotImplementedError
+
+
+class DigestUEDiscovery(UEDiscovery):
+    def __init__(self, switch: SwitchController, uemgr: UEMgr, learn_name: str = DEFAULT_LEARN, teid_field: str = "teid", ip_field: str = "ue_ip"):
+        super().__init__(uemgr)
+        self.teid_field = teid_field
+        self.ip_field = ip_field
+        # The listener thread only enqueues; UEMgr is touched from the caller's thread in poll()
+        self.pending: Queue = Queue()
+        self.listener = DigestListener(switch, learn_name, self._on_digest)
+
+    def _on_digest(self, digests: List[dict]):
+        for digest in digests:
+            self.pending.put((digest[self.teid_field], digest[self.ip_field]))
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        self.listener.stop()
+
+    def _drain(self) -> Iterable[Tuple[int, int]]:
+        while True:
+            try:
+                yield self.pending.get_nowait()
+            except Empty:
+                return
+
+    def poll(self) -> List[UE]:
+        return self._discover(self._drain())
+
+
+class RegisterUEDiscovery(UEDiscovery):
+    # The UE IP register indexed by TEID, read whole on every poll. For programs that emit no digest.
+    def __init__(self, switch: SwitchController, uemgr: UEMgr, register_name: str = DEFAULT_REGISTER, teid_step: int = 2):
+        super().__init__(uemgr)
+        self.switch = switch
+        self.register_name = register_name
+        # Uplink TEIDs only, as the register was always read: every teid_step-th index from teid_step on
+        self.teid_step = teid_step
+
+    def poll(self) -> List[UE]:
+        ue_ips = np.frombuffer(self.switch.dump_register(self.register_name), dtype=np.uint32)
+        teids = np.flatnonzero(ue_ips)
+        teids = teids[(teids >= self.teid_step) & (teids % self.teid_step == 0)]
+        return self._discover((int(teid), int(ue_ips[teid])) for teid in teids)
+
+
+def make_ue_discovery(switch: SwitchController, uemgr: UEMgr, learn_name: str = DEFAULT_LEARN, register_name: str = DEFAULT_REGISTER) -> UEDiscovery:
+    # Digests when the program defines the learn, the register otherwise
+    if switch.bfrt_cache.has_learn(learn_name):
+        log_event(log, logging.INFO, "discovery_mode", mode="digest", learn=learn_name)
+        return DigestUEDiscovery(switch, uemgr, learn_name)
+
+    log_event(log, logging.INFO, "discovery_mode", mode="register", register=register_name)
+    return RegisterUEDiscovery(switch, uemgr, register_name)
@@ -0,0 +1,165 @@
+from typing import Callable, Dict, Iterator, List
+
+from model.ue import UE
+from utils.LLF import Migration
+from utils.state_journal import StateJournal
+
+
+class UERegistry:
+    def __init__(self, demand_fn: Callable[[UE], float] = None, journal: StateJournal = None):
+        self.journal = journal
+        self.demand_fn = demand_fn if demand_fn is not None else UE.get_expected_bandwidth
+        self.by_teid: Dict[int, UE] = {}
+        self.by_ip: Dict[int, UE] = {}
+        self.by_upf: Dict[str, Dict[int, UE]] = {}
+        self.upf_load: Dict[str, float] = {}
+        # What the indexes were built with; UE objects may be rebound behind our back by the allocator
+        self.binding: Dict[int, str] = {}
+        self.demand: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.by_teid)
+
+    def __contains__(self, teid: int) -> bool:
+        return teid in self.by_teid
+
+    def __iter__(self) -> Iterator[UE]:
+        return iter(self.by_teid.values())
+
+    def get_ues(self) -> List[UE]:
+        return list(self.by_teid.values())
+
+    def get_by_teid(self, teid: int) -> UE:
+        return self.by_teid.get(teid)
+
+    def get_by_ip(self, ip_addr: int) -> UE:
+        return self.by_ip.get(ip_addr)
+
+    def get_ues_of_upf(self, upf_ip: str) -> List[UE]:
+        return list(self.by_upf.get(upf_ip, {}).values())
+
+    def get_upf_load(self, upf_ip: str) -> float:
+        return self.upf_load.get(upf_ip, 0.0)
+
+    def get_ue_count_of_upf(self, upf_ip: str) -> int:
+        return len(self.by_upf.get(upf_ip, {}))
+
+    def _bind(self, teid: int, upf_ip: str):
+        self.binding[teid] = upf_ip
+
+        if upf_ip is not None:
+            self.by_upf.setdefault(upf_ip, {})[teid] = self.by_teid[teid]
+            self.upf_load[upf_ip] = self.upf_load.get(upf_ip, 0.0) + self.demand[teid]
+
+    def _unbind(self, teid: int):
+        upf_ip = self.binding.pop(teid, None)
+
+        if upf_ip is not None:
+            self.by_upf[upf_ip].pop(teid, None)
+            self.upf_load[upf_ip] -= self.demand[teid]
+
+    def displaced_by(self, ue: UE) -> List[UE]:
+        # The records insert(ue) would replace
+        displaced: List[UE] = []
+        existing = self.by_teid.get(ue.get_teid())
+        if existing is not None and existing != ue:
+            displaced.append(existing)
+        previous = self.by_ip.get(ue.get_ip_addr())
+        if previous is not None and previous.get_teid() != ue.get_teid():
+            displaced.append(previous)
+        return displaced
+
+    def insert(self, ue: UE) -> bool:
+        existing = self.by_teid.get(ue.get_teid())
+
+        if existing is not None and existing == ue:
+            return False
+
+        # A TEID handed to another UE, or a UE that came back with a new TEID, replaces the old record
+        if existing is not None:
+            self.remove(existing.get_teid())
+        previous = self.by_ip.get(ue.get_ip_addr())
+        if previous is not None:
+            self.remove(previous.get_teid())
+
+        self._insert(ue)
+        if self.journal is not None:
+            self.journal.set("binding", ue.get_teid(), ip=ue.get_ip_addr(), instance=ue.get_instance(), device=ue.get_device(), expected_bandwidth=ue.get_expected_bandwidth(), binding_upf=ue.get_binding_upf())
+        return True
+
+    def _insert(self, ue: UE):
+        teid = ue.get_teid()
+        self.by_teid[teid] = ue
+        self.by_ip[ue.get_ip_addr()] = ue
+        self.demand[teid] = self.demand_fn(ue)
+        self._bind(teid, ue.get_binding_upf())
+
+    def remove(self, teid: int) -> UE:
+        ue = self.by_teid.get(teid)
+
+        if ue is None:
+            return None
+
+        self._unbind(teid)
+        self.demand.pop(teid, None)
+        del self.by_teid[teid]
+        if self.by_ip.get(ue.get_ip_addr()) is ue:
+            del self.by_ip[ue.get_ip_addr()]
+        if self.journal is not None:
+            self.journal.delete("binding", teid)
+        return ue
+
+    def rebind(self, teid: int, upf_ip: str):
+        ue = self.by_teid[teid]
+        ue.set_binding_upf(upf_ip)
+
+        if self.binding.get(teid) != upf_ip:
+            self._unbind(teid)
+            self._bind(teid, upf_ip)
+            if self.journal is not None:
+                self.journal.put("binding", teid, binding_upf=upf_ip)
+
+    def update_demand(self, teid: int):
+        ue = self.by_teid.get(teid)
+        # Removed since the caller listed it
+        if ue is None:
+            return
+
+        upf_ip = self.binding.get(teid)
+        demand = self.demand_fn(ue)
+
+        if upf_ip is not None:
+            self.upf_load[upf_ip] += demand - self.demand[teid]
+        self.demand[teid] = demand
+
+    def update_expected_bandwidth(self, ip_addr: int, expected_bandwidth: float) -> bool:
+        ue = self.by_ip.get(ip_addr)
+        if ue is None or ue.get_expected_bandwidth() == expected_bandwidth:
+            return False
+
+        ue.set_expected_bandwidth(expected_bandwidth)
+        self.update_demand(ue.get_teid())
+        if self.journal is not None:
+            self.journal.put("binding", ue.get_teid(), expected_bandwidth=expected_bandwidth)
+        return True
+
+    def apply_migrations(self, migrations: List[Migration]):
+        for migration in migrations:
+            if migration.teid in self.by_teid:
+                self.rebind(migration.teid, migration.new_upf)
+
+    def restore(self, records: Dict[int, dict], switch_bindings: Dict[int, str] = None) -> List[UE]:
+        # What the switch actually routes a TEID to wins over the journal, which may be a flush behind
+        switch_bindings = switch_bindings if switch_bindings is not None else {}
+        restored: List[UE] = []
+
+        for teid, fields in records.items():
+            ue = UE(teid, fields["ip"], fields.get("instance", ""), fields.get("device", ""), fields.get("expected_bandwidth", 0))
+            ue.set_binding_upf(switch_bindings.get(teid, fields.get("binding_upf")))
+            self._insert(ue)
+            restored.append(ue)
+
+            if self.journal is not None and ue.get_binding_upf() != fields.get("binding_upf"):
+                self.journal.put("binding", teid, binding_upf=ue.get_binding_upf())
+
+        return restored
@@ -1,35 +1,167 @@
+import ipaddress
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from queue import Empty, Queue
+from typing import Dict, List, Tuple
+
 from utils.hex_converter import ip_to_hex
 from utils.data_fetcher import fetch_ue_speed
+from utils.log import get_logger, log_event
+from utils.state_journal import StateJournal
 from model.ue import UE
 
+log = get_logger("uemgr")
+
+DEFAULT_UE_POOLS: List[str] = ["10.10.216.32/27"]
+
+
+class UERecord:
+    __slots__ = ("ip", "index", "teid", "throughput", "device", "instance", "speed_fetched_at", "speed_future")
+
+    def __init__(self, ip: int, index: int):
+        self.ip = ip
+        self.index = index
+        self.teid = None
+        self.throughput = 0
+        self.device = ""
+        self.instance = ""
+        self.speed_fetched_at = None
+        self.speed_future: Future = None
+
+
 class UEMgr:
-    def __init__(self):
-        self.ue_data = {}
-        
-        for i in range(12):
-            self.ue_data[ip_to_hex("10.10.216.33") + i] = {
-                "ip": ip_to_hex("10.10.216.33") + i,
-                "teid": None,
-                "throughput": fetch_ue_speed(i),
-                "device": "",
-                "instance": ""
-            }
+    def __init__(self, pools: List[str] = None, speed_refresh_interval: float = 300, max_workers: int = 8, journal: StateJournal = None):
+        self.ue_data: Dict[int, UERecord] = {}
+        self.journal = journal
+        self.speed_refresh_interval = speed_refresh_interval
+        # (hex IP, throughput) of every finished fetch; UEs handed out before it finished see it through poll_speed_updates()
+        self.speed_updates: Queue = Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ue-speed")
+
+        # (first host, last host, index of the first host); /ue-data/{index} counts hosts across pools in order
+        self.pools: List[Tuple[int, int, int]] = []
+        index = 0
+        for pool in pools if pools is not None else DEFAULT_UE_POOLS:
+            network = ipaddress.ip_network(pool)
+            first_host = next(network.hosts())
+            host_count = network.num_addresses - 2 if network.num_addresses > 2 else network.num_addresses
+            self.pools.append((ip_to_hex(str(first_host)), ip_to_hex(str(first_host)) + host_count - 1, index))
+            index += host_count
+
+    def _pool_index(self, hex_ip: int) -> int:
+        for first, last, base in self.pools:
+            if first <= hex_ip <= last:
+                return base + hex_ip - first
+        return None
+
+    def _get_record(self, hex_ip: int, fetch_speed: bool = True) -> UERecord:
+        record = self.ue_data.get(hex_ip)
+
+        if record is None:
+            index = self._pool_index(hex_ip)
+            if index is None:
+                raise KeyError(hex_ip)
+            record = UERecord(hex_ip, index)
+            self.ue_data[hex_ip] = record
+            if fetch_speed:
+                self._fetch_speed(record)
+
+        return record
+
+    def _fetch_speed(self, record: UERecord):
+        if record.speed_future is not None and not record.speed_future.done():
+            return
+
+        def done(future: Future):
+            try:
+                record.throughput = future.result()
+                record.speed_fetched_at = time.monotonic()
+                self.speed_updates.put((record.ip, record.throughput))
+            except Exception as e:
+                log_event(log, logging.WARNING, "ue_speed_fetch_failed", index=record.index, error=e)
+
+        record.speed_future = self.executor.submit(fetch_ue_speed, record.index)
+        record.speed_future.add_done_callback(done)
+
+    def refresh_speeds(self):
+        now = time.monotonic()
+
+        # Discovery adds records from another phase
+        for record in list(self.ue_data.values()):
+            if record.speed_fetched_at is None or now - record.speed_fetched_at > self.speed_refresh_interval:
+                self._fetch_speed(record)
+
+    def poll_speed_updates(self) -> Dict[int, float]:
+        updates: Dict[int, float] = {}
+
+        while True:
+            try:
+                hex_ip, throughput = self.speed_updates.get_nowait()
+            except Empty:
+                break
+            updates[hex_ip] = throughput
+
+        return updates
+
+    def wait_for_speeds(self, timeout: float = None):
+        wait([record.speed_future for record in list(self.ue_data.values()) if record.speed_future is not None], timeout=timeout)
     
     def register_ue_device_and_instance(self, hex_ip, device, instance):
-        self.ue_data[hex_ip]["device"] = device
-        self.ue_data[hex_ip]["instance"] = instance
+        record = self._get_record(hex_ip)
+
+        if self.journal is not None and (record.device, record.instance) != (device, instance):
+            self.journal.put("ue", hex_ip, device=device, instance=instance)
+        record.device = device
+        record.instance = instance
+            
+    def unregister_ue_device_and_instance(self, hex_ip, instance):
+        record = self.ue_data.get(hex_ip)
+
+        if record is not None and record.instance == instance:
+            record.device = ""
+            record.instance = ""
+            if self.journal is not None:
+                self.journal.put("ue", hex_ip, device="", instance="")
             
     def register_ue_teid(self, hex_ip, teid):
-        self.ue_data[hex_ip]["teid"] = teid
+        record = self._get_record(hex_ip)
+
+        if self.journal is not None and record.teid != teid:
+            self.journal.put("ue", hex_ip, teid=teid)
+        record.teid = teid
+
+    def restore(self, records: Dict[int, dict]) -> int:
+        # Journaled records come back as they were; their speeds are left to the next refresh_speeds()
+        restored = 0
+
+        for hex_ip, fields in records.items():
+            try:
+                record = self._get_record(hex_ip, fetch_speed=False)
+            except KeyError:
+                log_event(log, logging.WARNING, "ue_restore_dropped", ip=hex_ip, reason="outside_pools")
+                continue
+
+            record.teid = fields.get("teid", record.teid)
+            record.device = fields.get("device", record.device)
+            record.instance = fields.get("instance", record.instance)
+            restored += 1
+
+        return restored
             
     def get_ue(self, hex_ip) -> UE:
-        if self.ue_data[hex_ip]["teid"] == 0:
+        record = self._get_record(hex_ip)
+
+        if record.teid == 0:
             raise RuntimeError("UE is not ready yet!")
         
         return UE(
-            self.ue_data[hex_ip]["teid"],
+            record.teid,
             hex_ip,
-            self.ue_data[hex_ip]["instance"],
-            self.ue_data[hex_ip]["device"],
-            self.ue_data[hex_ip]["throughput"],
-        )
\ No newline at end of file
+            record.instance,
+            record.device,
+            record.throughput,
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False)